@@ -1,3 +1,8 @@
+from typing import Tuple
+
+import numpy as np
+
+
 class SortedDict(dict):
     def __iter__(self):
         return iter(sorted(super(SortedDict, self).__iter__()))
@@ -13,3 +18,163 @@ class SortedDict(dict):
 
     def values(self):
         return [self[k] for k in self]
+
+
+class SortedTimeline:
+    """A timeline of events stored as sorted (by time) numpy columns: the event
+    times, values and number of samples. Blocks are inserted by bisect (range
+    splice), appending after the last event is amortized (the columns grow by
+    doubling). As a dict keyed by time, an event replaces an event at the same time.
+    Events without a value (e.g. reads) have a nan value.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.__t = np.empty(capacity, dtype=np.float64)
+        self.__values = np.empty(capacity, dtype=np.float64)
+        self.__samples = np.empty(capacity, dtype=np.int64)
+        self.__size = 0
+
+    def __len__(self) -> int:
+        return self.__size
+
+    @property
+    def t(self) -> np.ndarray:
+        """The event times (sorted, read only view)"""
+        return self.__view(self.__t)
+
+    @property
+    def values(self) -> np.ndarray:
+        """The event values (read only view)"""
+        return self.__view(self.__values)
+
+    @property
+    def samples(self) -> np.ndarray:
+        """The event number of samples (read only view)"""
+        return self.__view(self.__samples)
+
+    def __view(self, column: np.ndarray) -> np.ndarray:
+        view = column[: self.__size]
+        view.flags.writeable = False
+        return view
+
+    def bounds(self, from_t: float, to_t: float) -> Tuple[int, int]:
+        """The index range [start, end) of the events in [from_t, to_t] (inclusive)"""
+        t = self.__t[: self.__size]
+        return (
+            int(np.searchsorted(t, from_t, side="left")),
+            int(np.searchsorted(t, to_t, side="right")),
+        )
+
+    def window(
+        self, from_t: float, to_t: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The events in [from_t, to_t), as (t, values, samples) views"""
+        t = self.__t[: self.__size]
+        start = int(np.searchsorted(t, from_t, side="left"))
+        end = int(np.searchsorted(t, to_t, side="left"))
+        return self.t[start:end], self.values[start:end], self.samples[start:end]
+
+    def next_index(self, t: float) -> int:
+        """The index of the first event after t, -1 if none"""
+        idx = int(np.searchsorted(self.__t[: self.__size], t, side="right"))
+        return idx if idx < self.__size else -1
+
+    def previous_index(self, t: float, inclusive: bool = False) -> int:
+        """The index of the last event before t (or at t if inclusive), -1 if none"""
+        side = "right" if inclusive else "left"
+        return int(np.searchsorted(self.__t[: self.__size], t, side=side)) - 1
+
+    def __reserve(self, size: int):
+        capacity = len(self.__t)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        for name in ["t", "values", "samples"]:
+            attr = f"_SortedTimeline__{name}"
+            column = getattr(self, attr)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[: self.__size] = column[: self.__size]
+            setattr(self, attr, grown)
+
+    def __splice(self, start: int, end: int, t, values, samples):
+        """Replaces the events [start, end) with the block"""
+        n = len(t)
+        size = self.__size + n - (end - start)
+        self.__reserve(size)
+        for column, block in [
+            (self.__t, t),
+            (self.__values, values),
+            (self.__samples, samples),
+        ]:
+            if n != end - start:
+                column[start + n : size] = column[end : self.__size]
+            column[start : start + n] = block
+        self.__size = size
+
+    def delete(self, from_t: float, to_t: float) -> int:
+        """Deletes the events in [from_t, to_t] (inclusive), returns the number deleted"""
+        start, end = self.bounds(from_t, to_t)
+        self.__splice(start, end, [], [], [])
+        return end - start
+
+    def insert(
+        self,
+        t: np.ndarray,
+        values: np.ndarray = None,
+        samples: np.ndarray = None,
+        overwrite: bool = True,
+    ):
+        """Inserts a block of events
+
+        Args:
+            t (np.ndarray): The event times.
+            values (np.ndarray, optional): The event values. Defaults to None (nan).
+            samples (np.ndarray, optional): The event number of samples. Defaults to
+                None (1).
+            overwrite (bool, optional): Delete the existing events in the block time
+                range [min(t), max(t)] first. Defaults to True.
+        """
+        t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+        n = len(t)
+        if n == 0:
+            return
+        values = np.broadcast_to(
+            np.asarray(np.nan if values is None else values, dtype=np.float64), n
+        )
+        samples = np.broadcast_to(
+            np.asarray(1 if samples is None else samples, dtype=np.int64), n
+        )
+
+        if n > 1 and np.any(t[1:] <= t[:-1]):
+            # Sort the block, the last event of a time wins.
+            order = np.argsort(t, kind="stable")
+            t, values, samples = t[order], values[order], samples[order]
+            last = np.r_[t[1:] != t[:-1], True]
+            t, values, samples = t[last], values[last], samples[last]
+            n = len(t)
+
+        if overwrite:
+            start, end = self.bounds(t[0], t[-1])
+            self.__splice(start, end, t, values, samples)
+            return
+
+        # Merge, replacing the events at equal times.
+        current = self.__t[: self.__size]
+        start, end = self.bounds(t[0], t[-1])
+        if start == end:
+            self.__splice(start, end, t, values, samples)
+            return
+        existing = current[start:end]
+        keep = ~np.isin(existing, t, assume_unique=True)
+        merged_t = np.concatenate([existing[keep], t])
+        order = np.argsort(merged_t, kind="stable")
+        self.__splice(
+            start,
+            end,
+            merged_t[order],
+            np.concatenate([self.__values[start:end][keep], values])[order],
+            np.concatenate([self.__samples[start:end][keep], samples])[order],
+        )
+
+    def clear(self):
+        self.__size = 0
@@ -0,0 +1,570 @@
+import math
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from experiment_control.sequence import Sequence
+from experiment_control.sequence_channel import SequenceChannel
+from tabor.tabor_client.config import TaborDeviceConfig
+from tabor.tabor_client.data import tabor_to_dac_values
+
+
+class CompiledSegment:
+    def __init__(
+        self,
+        segment_id: int,
+        data: np.ndarray,
+        start: int = None,
+    ) -> None:
+        """A device segment
+
+        Args:
+            segment_id (int): The segment id.
+            data (np.ndarray): The segment DAC values.
+            start (int, optional): The first sample (in the channel timeline) of a data
+                segment, None for a (reused) hold segment. Defaults to None.
+        """
+        self.segment_id = segment_id
+        self.data = data
+        self.start = start
+
+    @property
+    def length(self) -> int:
+        return len(self.data)
+
+    @property
+    def is_hold(self) -> bool:
+        return self.start is None
+
+
+class CompiledTask:
+    def __init__(self, segment_id: int, loops: int = 1) -> None:
+        """A task table entry, plays the segment loops times"""
+        self.segment_id = segment_id
+        self.loops = loops
+
+    def __eq__(self, other: "CompiledTask") -> bool:
+        return (
+            isinstance(other, CompiledTask)
+            and self.segment_id == other.segment_id
+            and self.loops == other.loops
+        )
+
+    def __repr__(self) -> str:
+        return f"CompiledTask({self.segment_id}, loops={self.loops})"
+
+
+class CompiledChannel:
+    def __init__(
+        self,
+        name: str,
+        physical_address: str | Any,
+        samples: int,
+    ) -> None:
+        """The compiled output of a sequence channel, its segments and task table
+
+        Args:
+            name (str): The sequence channel name.
+            physical_address (str | Any): The device channel.
+            samples (int): The total number of samples.
+        """
+        self.name = name
+        self.physical_address = physical_address
+        self.samples = samples
+        self.segments: Dict[int, CompiledSegment] = {}
+        """The segments, by segment id"""
+        self.tasks: List[CompiledTask] = []
+        """The task table (played in order)"""
+        self.version: int = 0
+        """The sequence channel version compiled"""
+
+    @property
+    def nbytes(self) -> int:
+        """The total size of the segments data"""
+        return sum(s.data.nbytes for s in self.segments.values())
+
+    def expand(self) -> np.ndarray:
+        """Returns the DAC values played by the task table (materialized)"""
+        if len(self.tasks) == 0:
+            return np.zeros(0)
+        return np.concatenate(
+            [np.tile(self.segments[t.segment_id].data, t.loops) for t in self.tasks]
+        )
+
+    def task_table_commands(self) -> List[str]:
+        """The task table commands, the last task ends the sequence"""
+        cmnd_list = [
+            f":INST:CHAN:SEL {self.physical_address}",
+            f":TASK:COMP:LENG {len(self.tasks)}",
+        ]
+        for idx, task in enumerate(self.tasks):
+            cmnd_list += self.task_commands(idx)
+        cmnd_list.append(":TASK:COMP:WRIT 1")
+        return cmnd_list
+
+    def task_commands(self, idx: int) -> List[str]:
+        """The commands of a single task table entry (0 based)"""
+        task = self.tasks[idx]
+        return [
+            f":TASK:COMP:SEL {idx + 1}",
+            ":TASK:COMP:TYPE SING",
+            f":TASK:COMP:SEGM {task.segment_id}",
+            f":TASK:COMP:LOOP {task.loops}",
+            f":TASK:COMP:NEXT1 {idx + 2 if idx + 1 < len(self.tasks) else 0}",
+        ]
+
+
+class CompiledDevice:
+    def __init__(
+        self,
+        name: str,
+        config: TaborDeviceConfig,
+        samples: int,
+    ) -> None:
+        """The compiled output of a device (all its channels play the same number
+        of samples)"""
+        self.name = name
+        self.config = config
+        self.samples = samples
+        self.channels: Dict[str, CompiledChannel] = {}
+        """The compiled channels, by sequence channel name"""
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.config.freq
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.channels.values())
+
+
+class CompiledSequence:
+    def __init__(self) -> None:
+        self.devices: Dict[str, CompiledDevice] = {}
+        """The compiled devices, by device name"""
+
+    @property
+    def duration(self) -> float:
+        return max([d.duration for d in self.devices.values()], default=0.0)
+
+
+class ChannelUploadPlan:
+    def __init__(self, channel: CompiledChannel) -> None:
+        """The changes to upload for a compiled channel
+
+        Args:
+            channel (CompiledChannel): The compiled channel.
+        """
+        self.channel = channel
+        self.segments: List[CompiledSegment] = []
+        """The segments to write"""
+        self.deleted: List[int] = []
+        """The segment ids no longer used"""
+        self.tasks: List[int] = []
+        """The (0 based) task entries to write"""
+        self.rewrite_tasks = False
+        """If true, the task table length changed and it is written in full"""
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.data.nbytes for s in self.segments)
+
+    @property
+    def is_empty(self) -> bool:
+        return (
+            len(self.segments) == 0 and len(self.deleted) == 0 and len(self.tasks) == 0
+        )
+
+    def task_table_commands(self) -> List[str]:
+        """The task table commands, the full table or the changed entries"""
+        if self.rewrite_tasks:
+            return self.channel.task_table_commands()
+        if len(self.tasks) == 0:
+            return []
+        cmnd_list = [f":INST:CHAN:SEL {self.channel.physical_address}"]
+        for idx in self.tasks:
+            cmnd_list += self.channel.task_commands(idx)
+        cmnd_list.append(":TASK:COMP:WRIT 1")
+        return cmnd_list
+
+
+class SequenceUploadPlan:
+    def __init__(self, compiled: CompiledSequence) -> None:
+        """The changes to upload for a compiled sequence"""
+        self.compiled = compiled
+        self.devices: Dict[str, Dict[str, ChannelUploadPlan]] = {}
+        """The channel plans, by device name and channel name"""
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            c.nbytes for channels in self.devices.values() for c in channels.values()
+        )
+
+    @property
+    def segments(self) -> int:
+        """The number of segments to write"""
+        return sum(
+            len(c.segments)
+            for channels in self.devices.values()
+            for c in channels.values()
+        )
+
+
+class SequenceCompiler:
+    def __init__(
+        self,
+        devices: Dict[str, TaborDeviceConfig],
+        interpolation: str = "hold",
+        idle_value: float = 0.0,
+        block_samples: int = None,
+        max_loops: int = 2**20,
+        max_segment_samples: int = 2**22,
+    ) -> None:
+        """Compiles the sequence channels to device segments and task tables. The
+        channel events (t, value) are resampled on the device clock (hold or linear
+        interpolation) in blocks of block_samples. Runs of constant blocks are played
+        by a single (reused) hold segment of one block with a loop count, the other
+        blocks are rasterized into data segments. Events without a value (reads)
+        are ignored.
+
+        Args:
+            devices (Dict[str, TaborDeviceConfig]): The device configs, by device name
+                (SequenceChannel.device_name).
+            interpolation (str, optional): The interpolation between events, "hold" or
+                "linear". Defaults to "hold".
+            idle_value (float, optional): The value before the first event. Defaults to 0.0.
+            block_samples (int, optional): The block (and hold segment) length. Defaults
+                to the device min segment length (rounded to the segment step).
+            max_loops (int, optional): The max loops of a task. Defaults to 2**20.
+            max_segment_samples (int, optional): The max data segment length. Defaults
+                to 2**22 (or the device memory bank if smaller).
+        """
+        assert interpolation in ["hold", "linear"], ValueError(
+            "interpolation must be hold or linear"
+        )
+        self.devices = devices
+        self.interpolation = interpolation
+        self.idle_value = idle_value
+        self.block_samples = block_samples
+        self.max_loops = max_loops
+        self.max_segment_samples = max_segment_samples
+
+    def get_block_samples(self, config: TaborDeviceConfig) -> int:
+        step = config.segment_min_size_step
+        block = max(self.block_samples or config.segment_min_length, step)
+        return int(math.ceil(block / step) * step)
+
+    def get_max_segment_samples(self, config: TaborDeviceConfig) -> int:
+        block = self.get_block_samples(config)
+        max_samples = self.max_segment_samples
+        if config.segment_max_length is not None:
+            max_samples = min(max_samples, config.segment_max_length)
+        return max(block, max_samples // block * block)
+
+    def device_channels(self, sequence: Sequence, device_name: str):
+        return [c for c in sequence.channels.values() if c.device_name == device_name]
+
+    def device_samples(self, sequence: Sequence, device_name: str) -> int:
+        """The device sequence length (samples), a whole number of blocks covering
+        the last event of its channels"""
+        config = self.devices[device_name]
+        end = 0.0
+        for channel in self.device_channels(sequence, device_name):
+            t = channel.timeline.t
+            if len(t) > 0:
+                end = max(end, t[-1])
+        block = self.get_block_samples(config)
+        samples = math.floor(end * config.freq) + 1
+        return int(math.ceil(samples / block) * block)
+
+    def compile(
+        self,
+        sequence: Sequence,
+        previous: CompiledSequence = None,
+    ) -> CompiledSequence:
+        """Compiles the sequence, if a previous compile of the sequence is given
+        only the changed regions are rasterized (see recompile)"""
+        compiled = CompiledSequence()
+        for device_name in self.devices:
+            compiled.devices[device_name] = self.compile_device(
+                sequence,
+                device_name,
+                previous=(
+                    None if previous is None else previous.devices.get(device_name)
+                ),
+            )
+        return compiled
+
+    def recompile(
+        self,
+        sequence: Sequence,
+        previous: CompiledSequence,
+    ) -> Tuple[CompiledSequence, SequenceUploadPlan]:
+        """Recompiles an edited sequence. Data segments outside the regions changed
+        since the previous compile (SequenceChannel.changes_since) keep their DAC
+        buffers and segment ids, hold segments are reused by value.
+
+        Returns:
+            Tuple[CompiledSequence, SequenceUploadPlan]: The compiled sequence and the
+                segments and task entries to upload (relative to previous).
+        """
+        compiled = self.compile(sequence, previous=previous)
+        return compiled, self.upload_plan(compiled, previous)
+
+    def upload_plan(
+        self,
+        compiled: CompiledSequence,
+        previous: CompiledSequence = None,
+    ) -> SequenceUploadPlan:
+        """The upload plan of compiled relative to previous (uploaded), everything
+        if previous is None"""
+        plan = SequenceUploadPlan(compiled)
+        for device_name, device in compiled.devices.items():
+            prev_device = (
+                None if previous is None else previous.devices.get(device_name)
+            )
+            plan.devices[device_name] = {}
+            for name, channel in device.channels.items():
+                prev = None
+                if prev_device is not None:
+                    prev = prev_device.channels.get(name)
+                plan.devices[device_name][name] = self.channel_upload_plan(
+                    channel, prev
+                )
+        return plan
+
+    def channel_upload_plan(
+        self, channel: CompiledChannel, previous: CompiledChannel = None
+    ) -> ChannelUploadPlan:
+        plan = ChannelUploadPlan(channel)
+        prev_segments = {} if previous is None else previous.segments
+        prev_tasks = [] if previous is None else previous.tasks
+        plan.segments = [
+            seg
+            for seg_id, seg in channel.segments.items()
+            if prev_segments.get(seg_id) is not seg
+        ]
+        plan.deleted = [
+            seg_id for seg_id in prev_segments if seg_id not in channel.segments
+        ]
+        plan.rewrite_tasks = len(prev_tasks) != len(channel.tasks)
+        plan.tasks = [
+            idx
+            for idx, task in enumerate(channel.tasks)
+            if plan.rewrite_tasks or task != prev_tasks[idx]
+        ]
+        return plan
+
+    def compile_device(
+        self,
+        sequence: Sequence,
+        device_name: str,
+        previous: CompiledDevice = None,
+    ) -> CompiledDevice:
+        config = self.devices[device_name]
+        device = CompiledDevice(
+            device_name, config, self.device_samples(sequence, device_name)
+        )
+
+        entries: Dict[str, List[Tuple[CompiledSegment, int]]] = {}
+        for channel in self.device_channels(sequence, device_name):
+            prev = None if previous is None else previous.channels.get(channel.name)
+            entries[channel.name] = self.compile_channel(
+                channel, config, device.samples, previous=prev
+            )
+
+        # Assign the (lowest free) segment ids to the new segments, device wide. The
+        # previous ids are not reassigned, so a plan never deletes a written id.
+        used = set(
+            seg.segment_id
+            for channel_entries in entries.values()
+            for seg, _ in channel_entries
+            if seg.segment_id is not None
+        )
+        if previous is not None:
+            for prev in previous.channels.values():
+                used.update(prev.segments.keys())
+        next_id = 1
+        for channel in self.device_channels(sequence, device_name):
+            compiled = CompiledChannel(
+                channel.name, channel.physical_address, device.samples
+            )
+            compiled.version = channel.version
+            for seg, loops in entries[channel.name]:
+                if seg.segment_id is None:
+                    while next_id in used:
+                        next_id += 1
+                    seg.segment_id = next_id
+                    used.add(next_id)
+                compiled.segments[seg.segment_id] = seg
+                compiled.tasks.append(CompiledTask(seg.segment_id, loops))
+            device.channels[channel.name] = compiled
+        return device
+
+    # region Channel compile
+
+    def channel_points(
+        self, channel: SequenceChannel, config: TaborDeviceConfig
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """The channel output events, as (sample index, value). Events are placed
+        at the first sample at or after their time, the last event of a sample wins."""
+        timeline = channel.timeline
+        written = ~np.isnan(timeline.values)
+        idx = np.ceil(timeline.t[written] * config.freq - 1e-6).astype(np.int64)
+        values = timeline.values[written]
+        if len(idx) > 1:
+            last = np.r_[idx[1:] != idx[:-1], True]
+            idx, values = idx[last], values[last]
+        return idx, values
+
+    def dirty_samples(
+        self,
+        channel: SequenceChannel,
+        config: TaborDeviceConfig,
+        version: int,
+    ) -> np.ndarray:
+        """The sample ranges (n x 2, [start, end)) changed since the version. A change
+        affects the samples from the write before it to the write after it (reads
+        do not change the output)."""
+        timeline = channel.timeline
+        t = timeline.t[~np.isnan(timeline.values)]
+        changes = np.asarray(channel.changes_since(version), dtype=np.float64)
+        if len(changes) == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        if len(t) == 0:
+            # All the writes were deleted, everything changed.
+            return np.array([[0, 2**62]], dtype=np.int64)
+        before = np.searchsorted(t, changes[:, 0], side="left") - 1
+        after = np.searchsorted(t, changes[:, 1], side="right")
+        start = np.where(before >= 0, t[np.maximum(before, 0)], 0.0)
+        end = np.where(after < len(t), t[np.minimum(after, len(t) - 1)], np.inf)
+        return np.stack(
+            [
+                np.floor(start * config.freq),
+                np.minimum(np.ceil(end * config.freq) + 1, 2**62),
+            ],
+            axis=1,
+        ).astype(np.int64)
+
+    def classify_blocks(
+        self,
+        idx: np.ndarray,
+        values: np.ndarray,
+        blocks: np.ndarray,
+        block: int,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns for each block (by number) if it is constant and its first value"""
+        # The values with the idle value first (index 0 = before the first event)
+        extended = np.r_[self.idle_value, values]
+        changes = np.r_[0, np.cumsum(extended[1:] != extended[:-1])]
+
+        starts = blocks * block
+        lo = np.searchsorted(idx, starts, side="right")
+        if self.interpolation == "hold":
+            hi = np.searchsorted(idx, starts + block - 1, side="right")
+        else:
+            hi = np.minimum(
+                np.searchsorted(idx, starts + block - 1, side="left") + 1,
+                len(values),
+            )
+            hi = np.maximum(hi, lo)
+        return changes[hi] == changes[lo], extended[lo]
+
+    def rasterize(
+        self, idx: np.ndarray, values: np.ndarray, start: int, end: int
+    ) -> np.ndarray:
+        """The channel values of the samples [start, end)"""
+        samples = np.arange(start, end)
+        if self.interpolation == "linear" and len(idx) > 0:
+            return np.interp(samples, idx, values, left=self.idle_value)
+        extended = np.r_[self.idle_value, values]
+        return extended[np.searchsorted(idx, samples, side="right")]
+
+    def block_runs(
+        self, constant: np.ndarray, block_values: np.ndarray
+    ) -> List[Tuple[int, int]]:
+        """Splits the blocks into runs of the same hold value or of data blocks,
+        as (first block, end block)"""
+        if len(constant) == 0:
+            return []
+        boundary = np.r_[
+            True,
+            (constant[1:] != constant[:-1])
+            | (constant[1:] & (block_values[1:] != block_values[:-1])),
+        ]
+        starts = np.flatnonzero(boundary)
+        ends = np.r_[starts[1:], len(constant)]
+        return list(zip(starts.tolist(), ends.tolist()))
+
+    def compile_channel(
+        self,
+        channel: SequenceChannel,
+        config: TaborDeviceConfig,
+        samples: int,
+        previous: CompiledChannel = None,
+    ) -> List[Tuple[CompiledSegment, int]]:
+        """Compiles a channel to its task entries, (segment, loops). Segments of
+        the previous compile are reused (with their ids) where unchanged, new
+        segments have no id (None).
+
+        Args:
+            channel (SequenceChannel): The channel.
+            config (TaborDeviceConfig): The device config.
+            samples (int): The device sequence length.
+            previous (CompiledChannel, optional): The previous compile of the channel.
+                Defaults to None.
+        """
+        block = self.get_block_samples(config)
+        max_segment = self.get_max_segment_samples(config)
+
+        idx, values = self.channel_points(channel, config)
+        constant, block_values = self.classify_blocks(
+            idx, values, np.arange(samples // block), block
+        )
+
+        holds: Dict[int, CompiledSegment] = {}
+        """The hold segments, by DAC value"""
+        reusable: Dict[int, CompiledSegment] = {}
+        """The previous data segments, by start sample"""
+        dirty = np.zeros((0, 2), dtype=np.int64)
+        if previous is not None:
+            dirty = self.dirty_samples(channel, config, previous.version)
+            for seg in previous.segments.values():
+                if seg.is_hold:
+                    holds[int(seg.data[0])] = seg
+                else:
+                    reusable[seg.start] = seg
+
+        entries: List[Tuple[CompiledSegment, int]] = []
+        for first, end in self.block_runs(constant, block_values):
+            if constant[first]:
+                dac = tabor_to_dac_values(block_values[first : first + 1], config)
+                key = int(dac[0])
+                if key not in holds:
+                    holds[key] = CompiledSegment(
+                        None, np.full(block, dac[0], dtype=dac.dtype)
+                    )
+                loops = end - first
+                while loops > 0:
+                    entries.append((holds[key], min(loops, self.max_loops)))
+                    loops -= self.max_loops
+                continue
+
+            for start in range(first * block, end * block, max_segment):
+                stop = min(start + max_segment, end * block)
+                seg = reusable.get(start, None)
+                if (
+                    seg is None
+                    or seg.length != stop - start
+                    or np.any((dirty[:, 0] < stop) & (dirty[:, 1] > start))
+                ):
+                    dac = tabor_to_dac_values(
+                        self.rasterize(idx, values, start, stop), config
+                    )
+                    seg = CompiledSegment(None, dac, start)
+                entries.append((seg, 1))
+
+        return entries
+
+    # endregion
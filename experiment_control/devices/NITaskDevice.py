@@ -1,9 +1,25 @@
+from typing import Any
+
 from experiment_control.interfaces import DeviceInterface
+from tabor.tabor_client.config import TaborDeviceConfig
+
+
+class NITaskDeviceConfig(TaborDeviceConfig):
+    """The output config of an NI task (analog output), to compile sequences
+    for the task sample clock"""
+
+    model = "NI"
+    freq = float(1e6)
+    dac_is_16_bit = True
+    min_voltage_out = -10.0
+    max_voltage_out = 10.0
+    segment_min_length = 2
+    segment_min_size_step = 1
 
 
 class NITaskDevice(DeviceInterface):
-    def on_prepare():
+    def on_prepare(self, sequence: Any):
         pass
 
-    def on_execute():
+    def on_execute(self):
         pass
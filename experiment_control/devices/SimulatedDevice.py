@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from experiment_control.compiler import (
+    CompiledDevice,
+    CompiledSequence,
+    SequenceUploadPlan,
+)
+from experiment_control.interfaces import DeviceInterface
+
+
+class SimulatedDevice(DeviceInterface):
+    START_COMMAND = "START"
+
+    def __init__(
+        self,
+        name: str,
+        bandwidth: float = 100e6,
+        command_latency: float = 1e-3,
+        memory_bytes: int = None,
+        realtime: bool = True,
+    ) -> None:
+        """A simulated device that consumes a compiled sequence (or an upload plan).
+        The upload time is modeled by the command round trips (command_latency) and
+        the data transfer (bandwidth), the uploaded data must fit the device memory.
+
+        Args:
+            name (str): The device name (in the compiled sequence).
+            bandwidth (float, optional): The upload bandwidth (bytes/sec). Defaults to 100e6.
+            command_latency (float, optional): The command round trip (seconds). Defaults
+                to 1e-3.
+            memory_bytes (int, optional): The device memory, None for unlimited. Defaults
+                to None.
+            realtime (bool, optional): Sleep for the modeled times (for pipeline profiling),
+                otherwise only account them. Defaults to True.
+        """
+        self.name = name
+        self.bandwidth = bandwidth
+        self.command_latency = command_latency
+        self.memory_bytes = memory_bytes
+        self.realtime = realtime
+
+        self.elapsed = 0.0
+        """The modeled (simulated) busy time"""
+        self.commands: List[Tuple[float, str]] = []
+        """The command log, (simulated time, command)"""
+        self.executed_at: float = None
+        """The last execute time (time.monotonic)"""
+        self.device: CompiledDevice = None
+        """The compiled device (uploaded)"""
+        self.__lock = threading.Lock()
+
+    def to_compiled_device(self, sequence: Any) -> CompiledDevice:
+        """The compiled device of a CompiledSequence or SequenceUploadPlan"""
+        if isinstance(sequence, SequenceUploadPlan):
+            sequence = sequence.compiled
+        assert isinstance(sequence, CompiledSequence), Exception(
+            "The sequence must be a CompiledSequence or a SequenceUploadPlan"
+        )
+        assert self.name in sequence.devices, Exception(
+            f"Device {self.name} not found in the compiled sequence"
+        )
+        return sequence.devices[self.name]
+
+    def command(self, command: str, nbytes: int = 0):
+        """Accounts a command (one round trip) with nbytes of data"""
+        duration = self.command_latency + (len(command) + nbytes) / self.bandwidth
+        with self.__lock:
+            self.commands.append((self.elapsed, command))
+            self.elapsed += duration
+        if self.realtime:
+            time.sleep(duration)
+
+    def reset(self):
+        with self.__lock:
+            self.elapsed = 0.0
+            self.commands = []
+        self.device = None
+        self.executed_at = None
+
+    def on_execute(self):
+        self.executed_at = time.monotonic()
+        self.command(self.START_COMMAND)
+
+    def outputs(self) -> Dict[str, np.ndarray]:
+        """The values that would have been output, by channel name"""
+        assert self.device is not None, Exception("No sequence was prepared")
+        return {name: self.output(name) for name in self.device.channels}
+
+    def output(self, channel: str) -> np.ndarray:
+        """The values that would have been output on the channel"""
+        assert self.device is not None, Exception("No sequence was prepared")
+        return self.device.channels[channel].expand()
@@ -0,0 +1,70 @@
+from typing import Any
+
+import numpy as np
+
+from experiment_control.devices.NITaskDevice import NITaskDeviceConfig
+from experiment_control.devices.SimulatedDevice import SimulatedDevice
+
+
+class SimulatedNITaskDevice(SimulatedDevice):
+    START_COMMAND = "DAQmxStartTask"
+
+    def __init__(
+        self,
+        name: str,
+        config: NITaskDeviceConfig = None,
+        bandwidth: float = 20e6,
+        command_latency: float = 5e-3,
+        buffer_samples: int = None,
+        realtime: bool = True,
+    ) -> None:
+        """A simulated NI analog output task. The task has no segments or loops, the
+        compiled channels are written in full (float64 volts per sample) to the task
+        buffer.
+
+        Args:
+            name (str): The device name (in the compiled sequence).
+            config (NITaskDeviceConfig, optional): The task config. Defaults to
+                NITaskDeviceConfig().
+            bandwidth (float, optional): The buffer write bandwidth (bytes/sec).
+                Defaults to 20e6.
+            command_latency (float, optional): The driver call latency (seconds).
+                Defaults to 5e-3.
+            buffer_samples (int, optional): The max task buffer size (samples, all
+                channels). Defaults to None (unlimited).
+            realtime (bool, optional): Sleep for the modeled times. Defaults to True.
+        """
+        self.config = config or NITaskDeviceConfig()
+        self.buffer_samples = buffer_samples
+        super().__init__(
+            name,
+            bandwidth=bandwidth,
+            command_latency=command_latency,
+            memory_bytes=None if buffer_samples is None else buffer_samples * 8,
+            realtime=realtime,
+        )
+
+    def on_prepare(self, sequence: Any):
+        device = self.to_compiled_device(sequence)
+        assert device.config.freq <= self.config.freq, Exception(
+            f"{self.name}: sample rate {device.config.freq} exceeds {self.config.freq}"
+        )
+        samples = device.samples * len(device.channels)
+        assert self.buffer_samples is None or samples <= self.buffer_samples, Exception(
+            f"{self.name}: {samples} samples exceed the task buffer"
+            f" ({self.buffer_samples} samples)"
+        )
+
+        channels = ",".join(str(c.physical_address) for c in device.channels.values())
+        self.command(f"DAQmxCreateAOVoltageChan {channels}")
+        self.command(f"DAQmxCfgSampClkTiming {device.config.freq} {device.samples}")
+        self.command("DAQmxWriteAnalogF64", nbytes=samples * 8)
+        self.device = device
+
+    def output(self, channel: str) -> np.ndarray:
+        """The output voltages of the channel"""
+        config = self.device.config
+        dac = super().output(channel).astype(np.float64)
+        return config.min_voltage_out + dac * (
+            (config.max_voltage_out - config.min_voltage_out) / config.dac_range
+        )
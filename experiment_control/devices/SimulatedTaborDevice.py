@@ -0,0 +1,143 @@
+from typing import Any, Dict
+
+from experiment_control.compiler import (
+    ChannelUploadPlan,
+    CompiledDevice,
+    SequenceUploadPlan,
+)
+from experiment_control.devices.SimulatedDevice import SimulatedDevice
+from tabor.tabor_client.config import TABOR_DEFAULT_DEVICE_CONFIG, TaborDeviceConfig
+
+
+class SimulatedTaborDevice(SimulatedDevice):
+    START_COMMAND = ":TASK:SYNC"
+
+    def __init__(
+        self,
+        name: str,
+        config: TaborDeviceConfig = None,
+        bandwidth: float = 100e6,
+        command_latency: float = 1e-3,
+        memory_bytes: int = None,
+        realtime: bool = True,
+    ) -> None:
+        """A simulated Tabor AWG. Uploads the compiled segments and task tables (or
+        only the changes of an upload plan), validating the segment sizes and the
+        waveform memory of each memory bank.
+
+        Args:
+            name (str): The device name (in the compiled sequence).
+            config (TaborDeviceConfig, optional): The device config. Defaults to
+                TABOR_DEFAULT_DEVICE_CONFIG.
+            bandwidth (float, optional): The upload bandwidth (bytes/sec). Defaults to 100e6.
+            command_latency (float, optional): The command round trip (seconds). Defaults
+                to 1e-3.
+            memory_bytes (int, optional): The total waveform memory, None for unlimited
+                (the segments of each memory bank are checked against
+                config.bank_memory). Defaults to None.
+            realtime (bool, optional): Sleep for the modeled times. Defaults to True.
+        """
+        self.config = config or TABOR_DEFAULT_DEVICE_CONFIG
+        super().__init__(
+            name,
+            bandwidth=bandwidth,
+            command_latency=command_latency,
+            memory_bytes=memory_bytes,
+            realtime=realtime,
+        )
+        self.segments: Dict[int, int] = {}
+        """The resident segment sizes (bytes), by segment id"""
+        self.segment_banks: Dict[int, int] = {}
+        """The memory bank of the resident segments, by segment id"""
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(self.segments.values())
+
+    def reset(self):
+        super().reset()
+        self.segments = {}
+        self.segment_banks = {}
+
+    def on_prepare(self, sequence: Any):
+        device = self.to_compiled_device(sequence)
+        if isinstance(sequence, SequenceUploadPlan) and self.device is not None:
+            plans = sequence.devices[self.name]
+        else:
+            plans = self.full_upload_plans(device)
+            if len(self.segments) > 0:
+                self.command(":TRAC:DEL:ALL")
+                self.segments = {}
+                self.segment_banks = {}
+
+        self.validate(device, plans)
+        for plan in plans.values():
+            for segment_id in plan.deleted:
+                self.command(f":TRAC:DEL {segment_id}")
+                self.segments.pop(segment_id, None)
+                self.segment_banks.pop(segment_id, None)
+            bank = self.config.memory_bank(plan.channel.physical_address)
+            for segment in plan.segments:
+                self.command(
+                    f":INST:CHAN:SEL {plan.channel.physical_address};"
+                    f":TRAC:DEL {segment.segment_id};"
+                    f":TRAC:DEF {segment.segment_id}, {segment.length};"
+                    f":TRAC:SEL {segment.segment_id}"
+                )
+                self.command(":TRAC:DATA", nbytes=segment.data.nbytes)
+                self.segments[segment.segment_id] = segment.data.nbytes
+                self.segment_banks[segment.segment_id] = bank
+            commands = plan.task_table_commands()
+            if len(commands) > 0:
+                self.command(";".join(commands))
+        self.device = device
+
+    def full_upload_plans(self, device: CompiledDevice) -> Dict[str, ChannelUploadPlan]:
+        plans = {}
+        for name, channel in device.channels.items():
+            plan = ChannelUploadPlan(channel)
+            plan.segments = list(channel.segments.values())
+            plan.tasks = list(range(len(channel.tasks)))
+            plan.rewrite_tasks = True
+            plans[name] = plan
+        return plans
+
+    def validate(self, device: CompiledDevice, plans: Dict[str, ChannelUploadPlan]):
+        """Validates the upload as the device would (segment sizes, memory)"""
+        config = self.config
+        assert device.config.freq <= (config.max_freq or device.config.freq), Exception(
+            f"{self.name}: sampling rate {device.config.freq} exceeds {config.max_freq}"
+        )
+        segments = dict(self.segments)
+        segment_banks = dict(self.segment_banks)
+        for plan in plans.values():
+            for segment_id in plan.deleted:
+                segments.pop(segment_id, None)
+                segment_banks.pop(segment_id, None)
+            bank = config.memory_bank(plan.channel.physical_address)
+            for segment in plan.segments:
+                assert segment.length >= config.segment_min_length, Exception(
+                    f"{self.name}: segment {segment.segment_id} is shorter than"
+                    f" {config.segment_min_length} samples"
+                )
+                assert segment.length % config.segment_min_size_step == 0, Exception(
+                    f"{self.name}: segment {segment.segment_id} length is not a"
+                    f" multiple of {config.segment_min_size_step}"
+                )
+                segments[segment.segment_id] = segment.data.nbytes
+                segment_banks[segment.segment_id] = bank
+        used = sum(segments.values())
+        assert self.memory_bytes is None or used <= self.memory_bytes, Exception(
+            f"{self.name}: the segments ({used} bytes) exceed the waveform memory"
+            f" ({self.memory_bytes} bytes)"
+        )
+        if config.bank_memory:
+            bank_bytes: Dict[int, int] = {}
+            for segment_id, nbytes in segments.items():
+                bank = segment_banks[segment_id]
+                bank_bytes[bank] = bank_bytes.get(bank, 0) + nbytes
+            for bank, nbytes in bank_bytes.items():
+                assert nbytes <= config.bank_memory[bank], Exception(
+                    f"{self.name}: the segments ({nbytes} bytes) exceed the memory bank"
+                    f" of channel {bank} ({config.bank_memory[bank]} bytes)"
+                )
@@ -0,0 +1,14 @@
+class ExperimentException(Exception):
+    def __init__(self, *args: object, report=None) -> None:
+        """An experiment run exception
+
+        Args:
+            report (ExperimentReport, optional): The report of the failed run, with the
+                errors by device. Defaults to None.
+        """
+        super().__init__(*args)
+        self.report = report
+
+
+class ExperimentTimeoutException(ExperimentException):
+    pass
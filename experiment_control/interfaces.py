@@ -1,11 +1,16 @@
-from abc import abstractmethod
+from abc import ABC, abstractmethod
+from typing import Any
 
 
-class DeviceInterface:
+class DeviceInterface(ABC):
     @abstractmethod
-    def on_prepare():
+    def on_prepare(self, sequence: Any):
+        """Prepares the device to execute the sequence (e.g. upload), called
+        concurrently for all the experiment devices"""
         pass
 
     @abstractmethod
-    def on_execute():
+    def on_execute(self):
+        """Starts the prepared sequence, called (as close as possible) at the same
+        time for all the experiment devices"""
         pass
@@ -0,0 +1,193 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List
+
+from experiment_control.exceptions import (
+    ExperimentException,
+    ExperimentTimeoutException,
+)
+from experiment_control.interfaces import DeviceInterface
+
+
+class DeviceTiming:
+    def __init__(self, name: str) -> None:
+        """The timing (time.monotonic) of a device prepare and execute"""
+        self.name = name
+        self.prepare_start: float = None
+        self.prepare_end: float = None
+        self.execute_start: float = None
+        self.execute_end: float = None
+        self.error: Exception = None
+
+    @property
+    def prepare_time(self) -> float:
+        if self.prepare_end is None:
+            return None
+        return self.prepare_end - self.prepare_start
+
+    @property
+    def execute_time(self) -> float:
+        if self.execute_end is None:
+            return None
+        return self.execute_end - self.execute_start
+
+    def __repr__(self) -> str:
+        return (
+            f"DeviceTiming({self.name}, prepare={self.prepare_time},"
+            f" execute={self.execute_time}, error={self.error})"
+        )
+
+
+class ExperimentReport:
+    def __init__(self, names: List[str]) -> None:
+        self.devices: Dict[str, DeviceTiming] = {n: DeviceTiming(n) for n in names}
+        """The device timing, by device name"""
+        self.prepare_start: float = None
+        self.prepare_end: float = None
+
+    @property
+    def prepare_time(self) -> float:
+        """The total (wall) prepare time"""
+        if self.prepare_end is None:
+            return None
+        return self.prepare_end - self.prepare_start
+
+    @property
+    def execute_skew(self) -> float:
+        """The spread of the device execute start times"""
+        starts = [
+            d.execute_start
+            for d in self.devices.values()
+            if d.execute_start is not None
+        ]
+        if len(starts) == 0:
+            return None
+        return max(starts) - min(starts)
+
+    @property
+    def errors(self) -> Dict[str, Exception]:
+        return {n: d.error for n, d in self.devices.items() if d.error is not None}
+
+
+class ExperimentRunner:
+    def __init__(
+        self,
+        devices: Dict[str, DeviceInterface],
+        max_workers: int = None,
+        timeout: float = None,
+    ) -> None:
+        """Runs an experiment on a set of devices. All the devices are prepared
+        concurrently (thread pool), so the prepare takes as long as the slowest
+        device. The devices are then executed together, each from its own thread
+        released by a barrier, to minimize the start skew.
+
+        Args:
+            devices (Dict[str, DeviceInterface]): The devices, by name.
+            max_workers (int, optional): The max concurrent prepares. Defaults to
+                the number of devices.
+            timeout (float, optional): The prepare/execute timeout (seconds). Defaults
+                to None (no timeout).
+        """
+        assert len(devices) > 0, ValueError("At least one device is required")
+        self.devices = devices
+        self.max_workers = max_workers or len(devices)
+        self.timeout = timeout
+        self.report: ExperimentReport = None
+        """The last run report"""
+
+    def prepare(self, sequence: Any) -> ExperimentReport:
+        """Calls on_prepare(sequence) for all devices concurrently and waits for all
+        of them (up to the timeout). Raises if any device failed or timed out (see
+        report.errors)."""
+        report = ExperimentReport(list(self.devices.keys()))
+        self.report = report
+
+        def prepare_device(name: str):
+            timing = report.devices[name]
+            timing.prepare_start = time.monotonic()
+            try:
+                self.devices[name].on_prepare(sequence)
+            except Exception as ex:
+                if timing.error is None:
+                    timing.error = ex
+            timing.prepare_end = time.monotonic()
+
+        report.prepare_start = time.monotonic()
+        pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="experiment-prepare"
+        )
+        futures = {pool.submit(prepare_device, n): n for n in self.devices}
+        _, not_done = wait(futures, timeout=self.timeout)
+        # Do not wait for the devices that timed out (or never started)
+        pool.shutdown(wait=False, cancel_futures=True)
+        report.prepare_end = time.monotonic()
+
+        for future in not_done:
+            timing = report.devices[futures[future]]
+            if timing.error is None:
+                timing.error = ExperimentTimeoutException(
+                    f"Device {timing.name} prepare timed out after {self.timeout}s"
+                )
+
+        self.__raise_errors(report, "prepare")
+        return report
+
+    def execute(self) -> ExperimentReport:
+        """Calls on_execute for all devices, released together by a barrier"""
+        report = self.report or ExperimentReport(list(self.devices.keys()))
+        self.report = report
+        barrier = threading.Barrier(len(self.devices))
+
+        def execute_device(name: str):
+            timing = report.devices[name]
+            try:
+                barrier.wait(self.timeout)
+                timing.execute_start = time.monotonic()
+                self.devices[name].on_execute()
+            except Exception as ex:
+                if timing.error is None:
+                    timing.error = ex
+            timing.execute_end = time.monotonic()
+
+        threads = [
+            threading.Thread(
+                target=execute_device,
+                args=(name,),
+                name=f"experiment-execute-{name}",
+                daemon=True,
+            )
+            for name in self.devices
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        for thread in threads:
+            thread.join(
+                None if deadline is None else max(deadline - time.monotonic(), 0)
+            )
+
+        for name, thread in zip(self.devices, threads):
+            timing = report.devices[name]
+            if thread.is_alive() and timing.error is None:
+                timing.error = ExperimentTimeoutException(
+                    f"Device {name} execute timed out after {self.timeout}s"
+                )
+
+        self.__raise_errors(report, "execute")
+        return report
+
+    def run(self, sequence: Any) -> ExperimentReport:
+        """Prepares and executes the sequence"""
+        self.prepare(sequence)
+        return self.execute()
+
+    def __raise_errors(self, report: ExperimentReport, stage: str):
+        errors = report.errors
+        if len(errors) == 0:
+            return
+        error = next(iter(errors.values()))
+        raise ExperimentException(
+            f"Experiment {stage} failed for devices {list(errors.keys())}",
+            report=report,
+        ) from error
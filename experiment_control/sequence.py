@@ -1,6 +1,9 @@
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
 from experiment_control.interfaces import DeviceInterface
-from experiment_control.sequence_channel import SequenceChannel
+from experiment_control.sequence_channel import SequenceChannel, SequenceChannelEvent
 
 
 class SequenceOutput:
@@ -15,6 +18,79 @@ class SequenceEvent:
     pass
 
 
+class SequenceEventIndex:
+    def __init__(self, channels: Dict[str, SequenceChannel]) -> None:
+        """Range queries over the sequence channel events. The channel timelines
+        are sorted, so event queries are by bisect. The channel spans (first to
+        last event) are kept as sorted arrays, rebuilt when a channel changes.
+
+        Args:
+            channels (Dict[str, SequenceChannel]): The sequence channels.
+        """
+        self.channels = channels
+        self.__versions: tuple = None
+        self.__names: np.ndarray = None
+        self.__starts: np.ndarray = None
+        self.__ends: np.ndarray = None
+
+    def __len__(self) -> int:
+        return sum(len(c.timeline) for c in self.channels.values())
+
+    def __update_spans(self):
+        versions = tuple((n, c.version) for n, c in self.channels.items())
+        if versions == self.__versions:
+            return
+        spans = [(n, c.span) for n, c in self.channels.items() if c.span is not None]
+        starts = np.array([s[0] for _, s in spans], dtype=np.float64)
+        order = np.argsort(starts, kind="stable")
+        self.__names = np.array([n for n, _ in spans], dtype=object)[order]
+        self.__starts = starts[order]
+        self.__ends = np.array([s[1] for _, s in spans], dtype=np.float64)[order]
+        self.__versions = versions
+
+    def range(
+        self,
+        from_t: float,
+        to_t: float,
+        channels: List[str] = None,
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """The events in [from_t, to_t), by channel, as (t, values, samples) views.
+        Channels without events in the range are omitted."""
+        rslt = {}
+        for name in self.overlapping(from_t, to_t) if channels is None else channels:
+            t, values, samples = self.channels[name].timeline.window(from_t, to_t)
+            if len(t) > 0:
+                rslt[name] = (t, values, samples)
+        return rslt
+
+    def next(self, channel: str, t: float) -> SequenceChannelEvent:
+        """The first event of the channel after t, None if none"""
+        idx = self.channels[channel].timeline.next_index(t)
+        return None if idx < 0 else self.channels[channel].event_at(idx)
+
+    def previous(self, channel: str, t: float) -> SequenceChannelEvent:
+        """The last event of the channel before t, None if none"""
+        idx = self.channels[channel].timeline.previous_index(t)
+        return None if idx < 0 else self.channels[channel].event_at(idx)
+
+    def at(self, channel: str, t: float) -> SequenceChannelEvent:
+        """The event in effect at t (the last event at or before t), None if none"""
+        idx = self.channels[channel].timeline.previous_index(t, inclusive=True)
+        return None if idx < 0 else self.channels[channel].event_at(idx)
+
+    def active(self, t: float) -> List[str]:
+        """The channels active at t (t within the channel first and last events)"""
+        self.__update_spans()
+        count = np.searchsorted(self.__starts, t, side="right")
+        return self.__names[:count][self.__ends[:count] >= t].tolist()
+
+    def overlapping(self, from_t: float, to_t: float) -> List[str]:
+        """The channels with a span overlapping [from_t, to_t)"""
+        self.__update_spans()
+        count = np.searchsorted(self.__starts, to_t, side="left")
+        return self.__names[:count][self.__ends[:count] >= from_t].tolist()
+
+
 class Sequence:
     """Implements an experiment sequence to be executed. The sequence will
     than generate an output to be consumed by input and output channels.
@@ -22,17 +98,25 @@ class Sequence:
 
     def __init__(
         self,
+        frequency: float = None,
     ) -> None:
-        # NOTE: currently inefficient, need some kind of sorted list.
-        # future implementation
-        self.__events: List[SequenceEvent] = {}
-        """A list of events in this sequence"""
+        """
+        Args:
+            frequency (float, optional): The default write frequency (samples/sec).
+                Defaults to None.
+        """
+        self.frequency = frequency
+        """The default write frequency"""
+        self.channels: Dict[str, SequenceChannel] = {}
+        """The sequence channels, by name"""
+        self.__events = SequenceEventIndex(self.channels)
+        """The events index"""
         self.__t: float = 0
         """The current time"""
 
     @property
-    def events(self) -> Iterable:
-        """A list of events (unsorted)"""
+    def events(self) -> SequenceEventIndex:
+        """The sequence events (range queries over the channels)"""
         return self.__events
 
     @property
@@ -60,37 +144,75 @@ class Sequence:
         self.__t = t
 
     # endregion
+
+    # region Channels
+
+    def add_channel(
+        self,
+        name: str,
+        device_name: str,
+        physical_address: str | Any = None,
+    ) -> SequenceChannel:
+        assert name not in self.channels, ValueError(f"Channel {name} already exists")
+        self.channels[name] = SequenceChannel(
+            name=name,
+            device_name=device_name,
+            physical_address=physical_address,
+        )
+        return self.channels[name]
+
+    def __validate_channels(self, channel: str | List[str]) -> List[str]:
+        channel = [channel] if isinstance(channel, str) else list(channel)
+        missing = [c for c in channel if c not in self.channels]
+        assert len(missing) == 0, ValueError(f"Unknown channels: {missing}")
+        return channel
+
+    # endregion
+
+    # region Read and write
+
     def write(
         self,
         channel: str | List[str],
-        data: int | float | List[int | float],
+        data: int | float | List[int | float] | np.ndarray,
         frequency: float = None,
-        timedeltas: List[float] = None,
+        timedeltas: List[float] | np.ndarray = None,
         overwrite: bool = True,
     ):
-        self.__validate_channels(channel)
+        """Writes values to the channels, starting at the current time
+
+        Args:
+            channel (str | List[str]): The channel name(s).
+            data (int | float | List[int | float] | np.ndarray): The values.
+            frequency (float, optional): The values frequency. Defaults to the
+                sequence frequency.
+            timedeltas (List[float] | np.ndarray, optional): The time between each value
+                and the next (instead of frequency). Defaults to None.
+            overwrite (bool, optional): Delete the existing events in the written time
+                range. Defaults to True.
+        """
+        channel = self.__validate_channels(channel)
         frequency = frequency or self.frequency
 
         assert timedeltas is not None or frequency is not None, ValueError(
             "You must provide either a frequency or timedelats (no default frequency defined)"
         )
 
-        if not isinstance(data, list):
-            data = [data]
-
+        data = np.atleast_1d(np.asarray(data, dtype=np.float64))
         assert len(data) > 0, ValueError("You must send at least one value to write")
 
         if timedeltas is None:
             # Using frequency to determine the time offset in seconds
-            dt = 1 / frequency
-            timedeltas = [dt for _ in range(len(data))]
-
-        # Converted timedeltas to timestamps
-        timestamps = []
-        cur_t = 0
-        for dt in timedeltas:
-            timestamps.append(cur_t)
-            cur_t += dt
+            timestamps = self.t + np.arange(len(data)) / frequency
+        else:
+            timedeltas = np.asarray(timedeltas, dtype=np.float64)
+            assert len(timedeltas) == len(data), ValueError(
+                "The number of timedeltas must match the number of values"
+            )
+            timestamps = np.empty(len(data))
+            timestamps[0] = 0
+            np.cumsum(timedeltas[:-1], out=timestamps[1:])
+            timestamps += self.t
 
         # Writing to the channel.
         for c in channel:
@@ -105,7 +227,7 @@ class Sequence:
         channel: str | List[str],
         duration: float,
     ):
-        self.__validate_channels(channel)
+        channel = self.__validate_channels(channel)
 
         from_t = self.t
         to_t = self.t + duration
@@ -113,22 +235,35 @@ class Sequence:
         for c in channel:
             self.channels[c].delete_events(from_t, to_t)
 
-    def get_plot_data(self) -> Dict[str, tuple[float, float]]:
+    def get_plot_data(
+        self, from_t: float = None, to_t: float = None
+    ) -> Dict[str, tuple[float, float]]:
+        """The channels (t, values), in the window [from_t, to_t) if set"""
+        if from_t is None and to_t is None:
+            channels = list(self.channels.keys())
+        else:
+            channels = self.events.overlapping(
+                -np.inf if from_t is None else from_t,
+                np.inf if to_t is None else to_t,
+            )
         rslt = {}
-        for c in self.channels:
-            ts, vals = self.channels[c].get_plot_data()
+        for c in channels:
+            ts, vals = self.channels[c].get_plot_data(from_t, to_t)
             rslt[c] = {
                 "t": ts,
                 "v": vals,
             }
+        return rslt
 
-    def plot(self, *channel: str):
+    def plot(self, *channel: str, from_t: float = None, to_t: float = None):
         if len(channel) == 0:
             channel = list(self.channels.keys())
 
         import matplotlib.pyplot as plt
 
         plt.figure()
-        for c in self.channels:
-            ts, vals = self.channels[c].get_plot_data()
+        for c in channel:
+            ts, vals = self.channels[c].get_plot_data(from_t, to_t)
             plt.plot(ts, vals)
+
+    # endregion
@@ -1,5 +1,8 @@
-from typing import Any, List
-from experiment_control.collections import SortedDict
+from typing import Any, Iterator, List, Tuple
+
+import numpy as np
+
+from experiment_control.collections import SortedTimeline
 
 
 class SequenceChannelEvent:
@@ -21,11 +24,54 @@ class SequenceChannel:
         device_name: str,
         physical_address: str | Any,
     ) -> None:
-        self.__timeline: SortedDict = SortedDict()
+        self.__timeline: SortedTimeline = SortedTimeline()
+        self.__changes: List[Tuple[float, float]] = []
         self.name = name
         self.device_name = device_name
         self.physical_address = physical_address
 
+    @property
+    def timeline(self) -> SortedTimeline:
+        """The channel events, as sorted columns (t, values, samples)"""
+        return self.__timeline
+
+    @property
+    def version(self) -> int:
+        """The number of changes made to the channel"""
+        return len(self.__changes)
+
+    def changes_since(self, version: int = 0) -> List[Tuple[float, float]]:
+        """The time ranges [from_t, to_t] changed since the version"""
+        return self.__changes[version:]
+
+    def __changed(self, timestamps: np.ndarray):
+        if len(timestamps) > 0:
+            self.__changes.append(
+                (float(np.min(timestamps)), float(np.max(timestamps)))
+            )
+
+    @property
+    def span(self) -> Tuple[float, float]:
+        """The time of the first and last events, None if empty"""
+        t = self.__timeline.t
+        return None if len(t) == 0 else (float(t[0]), float(t[-1]))
+
+    def event_at(self, idx: int) -> SequenceChannelEvent:
+        """The event by (sorted) index"""
+        timeline = self.__timeline
+        value = timeline.values[idx]
+        return SequenceChannelEvent(
+            t=float(timeline.t[idx]),
+            value=None if np.isnan(value) else float(value),
+            number_of_samples=int(timeline.samples[idx]),
+        )
+
+    @property
+    def events(self) -> Iterator[SequenceChannelEvent]:
+        """The channel events (sorted by time)"""
+        for idx in range(len(self.__timeline)):
+            yield self.event_at(idx)
+
     def write_values(
         self,
         timestamps: List[float],
@@ -35,12 +81,8 @@ class SequenceChannel:
         assert len(timestamps) == len(values), Exception(
             "The number of values must match the number of timestamps"
         )
-        # Convert to events.
-        events = [
-            SequenceChannelEvent(t=timestamps[i], value=values[i])
-            for i in range(len(timestamps))
-        ]
-        return self.set_events(events=events, overwrite=overwrite)
+        self.__timeline.insert(timestamps, values=values, overwrite=overwrite)
+        self.__changed(timestamps)
 
     def read_values(
         self,
@@ -49,39 +91,34 @@ class SequenceChannel:
         overwrite: bool = True,
     ):
         if isinstance(number_of_samples, int):
-            number_of_samples = [number_of_samples for _ in range(timestamps)]
+            number_of_samples = np.full(len(timestamps), number_of_samples)
 
         assert len(timestamps) == len(number_of_samples), Exception(
             "The number of values must match the number of timestamps"
         )
-        events = [
-            SequenceChannelEvent(
-                t=timestamps[i], number_of_samples=number_of_samples[i]
-            )
-            for i in range(len(timestamps))
-        ]
-        return self.set_events(events=events, overwrite=overwrite)
+        self.__timeline.insert(
+            timestamps, samples=number_of_samples, overwrite=overwrite
+        )
+        self.__changed(timestamps)
 
     def set_events(self, events: List[SequenceChannelEvent], overwrite: bool = True):
-        # Deleting old.
-        if overwrite:
-            times = [e.t for e in events]
-            self.delete_events(min(times), max(times))
-
-        for e in events:
-            self.__timeline[e.t] = e
+        self.__timeline.insert(
+            [e.t for e in events],
+            values=[np.nan if e.value is None else e.value for e in events],
+            samples=[e.number_of_samples for e in events],
+            overwrite=overwrite,
+        )
+        self.__changed([e.t for e in events])
 
     def delete_events(self, from_t: float, to_t: float):
-        for k in self.__timeline.unsorted_keys():
-            if k > to_t or k < from_t:
-                continue
-            del self.__timeline[k]
-
-    def get_plot_data(self):
-        timestamps = []
-        values = []
-        e: SequenceChannelEvent = None
-        for e in self.__timeline.values():
-            timestamps.append(e.t)
-            values.append(e.value)
-        return timestamps, values
+        self.__timeline.delete(from_t, to_t)
+        self.__changes.append((from_t, to_t))
+
+    def get_plot_data(self, from_t: float = None, to_t: float = None):
+        """The (t, values) of the events in [from_t, to_t), all if not set"""
+        if from_t is None and to_t is None:
+            return self.__timeline.t, self.__timeline.values
+        t, values, _ = self.__timeline.window(
+            -np.inf if from_t is None else from_t, np.inf if to_t is None else to_t
+        )
+        return t, values
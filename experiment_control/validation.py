@@ -0,0 +1,338 @@
+from typing import Dict, List
+
+import numpy as np
+
+from experiment_control.compiler import CompiledSequence
+from experiment_control.sequence import Sequence
+from experiment_control.sequence_channel import SequenceChannel
+from tabor.tabor_client.config import TaborDeviceConfig
+
+
+class SequenceViolation:
+    def __init__(
+        self,
+        kind: str,
+        message: str,
+        channel: str = None,
+        device: str = None,
+        times: np.ndarray = None,
+        count: int = 1,
+    ) -> None:
+        """A sequence violation
+
+        Args:
+            kind (str): The violation kind, e.g. "voltage_range".
+            message (str): The description.
+            channel (str, optional): The sequence channel. Defaults to None.
+            device (str, optional): The device name. Defaults to None.
+            times (np.ndarray, optional): The times (seconds) of the first violating
+                locations. Defaults to None.
+            count (int, optional): The total number of violating locations. Defaults to 1.
+        """
+        self.kind = kind
+        self.message = message
+        self.channel = channel
+        self.device = device
+        self.times = np.zeros(0) if times is None else times
+        self.count = count
+
+    def __str__(self) -> str:
+        where = ", ".join(
+            f"{k}={v}"
+            for k, v in [("device", self.device), ("channel", self.channel)]
+            if v is not None
+        )
+        at = ""
+        if len(self.times) > 0:
+            at = f" at t={self.times.tolist()}" + (
+                "..." if self.count > len(self.times) else ""
+            )
+        return f"[{self.kind}] ({where}) {self.message}, {self.count} location(s){at}"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class SequenceValidationReport:
+    def __init__(self) -> None:
+        self.violations: List[SequenceViolation] = []
+
+    @property
+    def is_valid(self) -> bool:
+        return len(self.violations) == 0
+
+    def by_kind(self) -> Dict[str, List[SequenceViolation]]:
+        rslt: Dict[str, List[SequenceViolation]] = {}
+        for violation in self.violations:
+            rslt.setdefault(violation.kind, []).append(violation)
+        return rslt
+
+    def raise_errors(self):
+        """Raises an exception with all the violations, if any"""
+        assert self.is_valid, Exception(
+            "Invalid sequence:\n" + "\n".join(str(v) for v in self.violations)
+        )
+
+    def __str__(self) -> str:
+        if self.is_valid:
+            return "Sequence is valid"
+        return "\n".join(str(v) for v in self.violations)
+
+
+class SequenceValidator:
+    def __init__(
+        self,
+        devices: Dict[str, TaborDeviceConfig],
+        max_locations: int = 10,
+        max_tasks: int = 2**16,
+        max_loops: int = 2**20,
+    ) -> None:
+        """Validates a sequence (and its compiled output) against the device configs.
+        All the checks of a channel are vectorized over its timeline, the violations
+        are collected into a report (with the times of the first locations) instead
+        of raising on the first.
+
+        Args:
+            devices (Dict[str, TaborDeviceConfig]): The device configs, by device name.
+            max_locations (int, optional): The max locations (times) kept per violation.
+                Defaults to 10.
+            max_tasks (int, optional): The max task table length. Defaults to 2**16.
+            max_loops (int, optional): The max loops of a task. Defaults to 2**20.
+        """
+        self.devices = devices
+        self.max_locations = max_locations
+        self.max_tasks = max_tasks
+        self.max_loops = max_loops
+
+    def validate(
+        self,
+        sequence: Sequence,
+        compiled: CompiledSequence = None,
+    ) -> SequenceValidationReport:
+        """Validates the sequence timelines, and the compiled output if given"""
+        report = SequenceValidationReport()
+        for channel in sequence.channels.values():
+            self.validate_channel(channel, report)
+        self.validate_outputs(sequence, report)
+        if compiled is not None:
+            self.validate_compiled(compiled, report)
+        return report
+
+    def __add(
+        self,
+        report: SequenceValidationReport,
+        kind: str,
+        message: str,
+        channel: SequenceChannel,
+        mask: np.ndarray,
+        times: np.ndarray,
+    ):
+        count = int(np.count_nonzero(mask))
+        if count == 0:
+            return
+        report.violations.append(
+            SequenceViolation(
+                kind,
+                message,
+                channel=channel.name,
+                device=channel.device_name,
+                times=times[np.flatnonzero(mask)[: self.max_locations]],
+                count=count,
+            )
+        )
+
+    def validate_channel(
+        self, channel: SequenceChannel, report: SequenceValidationReport
+    ):
+        timeline = channel.timeline
+        t, values, samples = timeline.t, timeline.values, timeline.samples
+        config = self.devices.get(channel.device_name, None)
+        if config is None:
+            report.violations.append(
+                SequenceViolation(
+                    "unknown_device",
+                    f"No device config for {channel.device_name}",
+                    channel=channel.name,
+                    device=channel.device_name,
+                )
+            )
+            return
+        if (
+            config.channels is not None
+            and channel.physical_address not in config.channels
+        ):
+            report.violations.append(
+                SequenceViolation(
+                    "unknown_channel",
+                    f"Device channel {channel.physical_address} is not one of"
+                    f" {config.channels}",
+                    channel=channel.name,
+                    device=channel.device_name,
+                )
+            )
+
+        if len(t) == 0:
+            return
+
+        self.__add(report, "negative_time", "Events before t=0", channel, t < 0, t)
+
+        written = ~np.isnan(values)
+        self.__add(
+            report,
+            "invalid_value",
+            "Infinite values",
+            channel,
+            np.isinf(values),
+            t,
+        )
+        self.__add(
+            report,
+            "voltage_range",
+            f"Values outside [{config.min_voltage_out}, {config.max_voltage_out}]",
+            channel,
+            written
+            & ((values < config.min_voltage_out) | (values > config.max_voltage_out)),
+            t,
+        )
+
+        # Writes that fall on the same device sample (all but the last are lost)
+        write_t = t[written]
+        idx = np.ceil(write_t * config.freq - 1e-6).astype(np.int64)
+        self.__add(
+            report,
+            "overlapping_writes",
+            f"Writes closer than the device sample period ({1 / config.freq}s)",
+            channel,
+            np.r_[idx[1:] == idx[:-1], False],
+            write_t,
+        )
+
+        # Reads that start before the previous read ends
+        read_t = t[~written]
+        if len(read_t) > 1:
+            read_end = read_t + samples[~written] / config.freq
+            self.__add(
+                report,
+                "overlapping_reads",
+                "Reads that start before the previous read ends",
+                channel,
+                np.r_[False, read_t[1:] < read_end[:-1]],
+                read_t,
+            )
+
+    def validate_outputs(self, sequence: Sequence, report: SequenceValidationReport):
+        """Checks that no two channels write the same device output at the same time"""
+        outputs: Dict[tuple, List[SequenceChannel]] = {}
+        for channel in sequence.channels.values():
+            key = (channel.device_name, channel.physical_address)
+            outputs.setdefault(key, []).append(channel)
+
+        for (device, address), channels in outputs.items():
+            spans = [(c, c.span) for c in channels if c.span is not None]
+            if len(spans) < 2:
+                continue
+            starts = np.array([s[0] for _, s in spans])
+            ends = np.array([s[1] for _, s in spans])
+            order = np.argsort(starts)
+            starts, ends = starts[order], ends[order]
+            # A span overlaps if it starts before any previous span ends
+            overlap = np.r_[False, starts[1:] <= np.maximum.accumulate(ends)[:-1]]
+            if np.any(overlap):
+                names = [spans[i][0].name for i in order]
+                report.violations.append(
+                    SequenceViolation(
+                        "shared_output",
+                        f"Channels {names} write output {address} at the same time",
+                        device=device,
+                        times=starts[overlap][: self.max_locations],
+                        count=int(np.count_nonzero(overlap)),
+                    )
+                )
+
+    def validate_compiled(
+        self, compiled: CompiledSequence, report: SequenceValidationReport
+    ):
+        """Checks the compiled segments and task tables against the device limits"""
+        for device_name, device in compiled.devices.items():
+            config = self.devices.get(device_name, device.config)
+            max_length = config.segment_max_length
+            bank_bytes: Dict[int, int] = {}
+            for name, channel in device.channels.items():
+                segments = list(channel.segments.values())
+                if config.bank_memory:
+                    bank = config.memory_bank(channel.physical_address)
+                    bank_bytes[bank] = bank_bytes.get(bank, 0) + sum(
+                        s.data.nbytes for s in segments
+                    )
+                lengths = np.array([s.length for s in segments], dtype=np.int64)
+                starts = np.array(
+                    [np.nan if s.is_hold else s.start for s in segments],
+                    dtype=np.float64,
+                )
+                times = starts / config.freq
+
+                for kind, message, mask in [
+                    (
+                        "segment_min_length",
+                        f"Segments shorter than {config.segment_min_length} samples",
+                        lengths < config.segment_min_length,
+                    ),
+                    (
+                        "segment_granularity",
+                        f"Segment lengths not a multiple of {config.segment_min_size_step}",
+                        lengths % config.segment_min_size_step != 0,
+                    ),
+                    (
+                        "segment_max_length",
+                        f"Segments longer than the memory bank ({max_length} samples)",
+                        (
+                            np.zeros(len(lengths), dtype=bool)
+                            if max_length is None
+                            else lengths > max_length
+                        ),
+                    ),
+                ]:
+                    count = int(np.count_nonzero(mask))
+                    if count > 0:
+                        report.violations.append(
+                            SequenceViolation(
+                                kind,
+                                message,
+                                channel=name,
+                                device=device_name,
+                                times=times[mask][: self.max_locations],
+                                count=count,
+                            )
+                        )
+
+                loops = np.array([t.loops for t in channel.tasks], dtype=np.int64)
+                if len(channel.tasks) > self.max_tasks:
+                    report.violations.append(
+                        SequenceViolation(
+                            "task_table_length",
+                            f"{len(channel.tasks)} tasks exceed the max of {self.max_tasks}",
+                            channel=name,
+                            device=device_name,
+                        )
+                    )
+                if np.any(loops > self.max_loops):
+                    report.violations.append(
+                        SequenceViolation(
+                            "task_loops",
+                            f"Task loops exceed the max of {self.max_loops}",
+                            channel=name,
+                            device=device_name,
+                            count=int(np.count_nonzero(loops > self.max_loops)),
+                        )
+                    )
+
+            for bank, nbytes in bank_bytes.items():
+                if nbytes > config.bank_memory[bank]:
+                    report.violations.append(
+                        SequenceViolation(
+                            "memory",
+                            f"The segments ({nbytes} bytes) exceed the memory bank of"
+                            f" channel {bank} ({config.bank_memory[bank]} bytes)",
+                            device=device_name,
+                        )
+                    )
@@ -2,6 +2,8 @@ from tabor.tabor_client.exceptions import *  # noqa F401
 from tabor.tabor_client.consts import *  # noqa F401
 from tabor.tabor_client.config import *  # noqa F401
 from tabor.tabor_client.data import TaborWaveform, TaborDataSegment  # noqa F401
+from tabor.tabor_client.profile import TaborDeviceProfile  # noqa F401
+from tabor.tabor_client.profile import TaborDeviceProfileCache  # noqa F401
 from tabor.tabor_client.client import TaborClient  # noqa F401
 from tabor.tabor_client.log import log  # noqa F401
 from tabor.tabor_client.datafunc import TaborFunctionSegment
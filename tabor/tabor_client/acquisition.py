@@ -0,0 +1,213 @@
+import threading
+import time
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from tabor.tabor_client.client import TaborClient
+from tabor.tabor_client.log import log
+
+
+class TaborCounterRingBuffer:
+    def __init__(self, size: int, channels: int) -> None:
+        """A preallocated ring buffer of timestamped counter samples. A single writer
+        and any number of readers, each reader keeps its own cursor.
+
+        Args:
+            size (int): The max number of samples kept.
+            channels (int): The number of counter channels.
+        """
+        self.size = size
+        self.channels = channels
+        self.timestamps = np.zeros(size, dtype=np.float64)
+        self.counts = np.zeros((size, channels), dtype=np.int64)
+
+        self.__written = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def written(self) -> int:
+        """The total number of samples written (the write cursor)"""
+        return self.__written
+
+    def append(self, timestamps: np.ndarray, counts: np.ndarray):
+        """Appends a block of samples (timestamps: (n,), counts: (n, channels))"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        counts = np.asarray(counts, dtype=np.int64).reshape(-1, self.channels)
+        n = len(timestamps)
+        if n > self.size:
+            timestamps, counts = timestamps[-self.size :], counts[-self.size :]
+            with self.__lock:
+                self.__written += n - self.size
+            n = self.size
+
+        with self.__lock:
+            start = self.__written % self.size
+            first = min(n, self.size - start)
+            self.timestamps[start : start + first] = timestamps[:first]
+            self.counts[start : start + first] = counts[:first]
+            if first < n:
+                self.timestamps[: n - first] = timestamps[first:]
+                self.counts[: n - first] = counts[first:]
+            self.__written += n
+
+    def read(self, cursor: int = 0) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Reads the samples written since the cursor. If the cursor is older
+        than the buffer, the oldest samples available are returned.
+
+        Args:
+            cursor (int, optional): The read cursor (a previously returned cursor). Defaults to 0.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, int]: The timestamps, counts and the new cursor.
+        """
+        with self.__lock:
+            written = self.__written
+            cursor = max(cursor, written - self.size)
+            n = written - cursor
+            idx = np.arange(cursor, written) % self.size
+            return self.timestamps[idx], self.counts[idx], cursor + n
+
+    def latest(self, n: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the last n samples"""
+        timestamps, counts, _ = self.read(self.__written - n)
+        return timestamps, counts
+
+
+class TaborCounterAcquisition:
+    def __init__(
+        self,
+        client: TaborClient,
+        gate: float = 1e-3,
+        channels: List[int] = None,
+        buffer_size: int = 2**20,
+        trigger_level: float = 0.1,
+        drift_smoothing: float = 0.01,
+    ) -> None:
+        """A background counter acquisition. The pulse counter runs on a fixed internal
+        gate (hardware timed window), and each round trip reads the last window and
+        triggers the next. Windows are scheduled on a fixed (monotonic) time grid, so
+        the loop does not drift; windows missed by a late round trip are counted and
+        skipped. Timestamps are the grid times corrected by a smoothed estimate of the
+        offset between the grid and the measured trigger times.
+
+        Args:
+            client (TaborClient): The tabor client.
+            gate (float, optional): The counter gate (window) in seconds. Defaults to 1e-3.
+            channels (List[int], optional): The digitizer channels. Defaults to [1].
+            buffer_size (int, optional): The ring buffer size (samples). Defaults to 2**20.
+            trigger_level (float, optional): The counter trigger level. Defaults to 0.1.
+            drift_smoothing (float, optional): The smoothing factor (0-1) of the clock
+                offset estimate. Defaults to 0.01.
+        """
+        self.client = client
+        self.gate = gate
+        self.channels = channels or [1]
+        self.trigger_level = trigger_level
+        self.drift_smoothing = drift_smoothing
+        self.buffer = TaborCounterRingBuffer(buffer_size, len(self.channels))
+
+        self.missed = 0
+        """The number of gate windows missed"""
+        self.offset = 0.0
+        """The estimated offset (seconds) between the gate grid and the trigger times"""
+
+        self.__listeners: List[Callable[[np.ndarray, np.ndarray], None]] = []
+        self.__thread: threading.Thread = None
+        self.__stop = threading.Event()
+        self.__t0: float = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    @property
+    def t0(self) -> float:
+        """The acquisition start time (time.monotonic)"""
+        return self.__t0
+
+    def add_listener(self, listener: Callable[[np.ndarray, np.ndarray], None]):
+        """Adds a listener, called (from the acquisition thread) with each block
+        of (timestamps, counts) appended to the buffer"""
+        self.__listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[np.ndarray, np.ndarray], None]):
+        if listener in self.__listeners:
+            self.__listeners.remove(listener)
+
+    def start(self):
+        if self.is_running:
+            return self
+        self.client.counter_prepare(
+            self.gate,
+            *self.channels,
+            trigger_level=self.trigger_level,
+        )
+        self.__stop.clear()
+        self.__thread = threading.Thread(
+            target=self.__run,
+            name=f"tabor-counter-{self.client.resource_name}",
+            daemon=True,
+        )
+        self.__thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+            self.__thread = None
+
+    def read(self, cursor: int = 0):
+        """Reads the samples since the cursor, see TaborCounterRingBuffer.read"""
+        return self.buffer.read(cursor)
+
+    def __publish(self, timestamps: np.ndarray, counts: np.ndarray):
+        self.buffer.append(timestamps, counts)
+        for listener in self.__listeners:
+            try:
+                listener(timestamps, counts)
+            except Exception as ex:
+                log.error(f"Counter listener failed: {ex}")
+
+    def __run(self):
+        gate = self.gate
+        channels = np.asarray(self.channels) - 1
+
+        # First trigger starts the grid.
+        sent = time.monotonic()
+        self.client.counter_trigger()
+        self.__t0 = (sent + time.monotonic()) / 2
+        window = 0
+
+        while not self.__stop.is_set():
+            # Wait for the current window to end.
+            deadline = self.__t0 + (window + 1) * gate + max(self.offset, 0)
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+
+            try:
+                sent = time.monotonic()
+                counts = self.client.counter_read_and_trigger()
+                received = time.monotonic()
+            except Exception as ex:
+                log.error(f"Counter acquisition read failed: {ex}")
+                self.__stop.wait(gate)
+                continue
+
+            timestamp = self.__t0 + window * gate + self.offset
+            self.__publish(
+                np.array([timestamp]),
+                np.asarray(counts, dtype=np.int64)[channels].reshape(1, -1),
+            )
+
+            # The next window started when the trigger was received (approx.
+            # the round trip midpoint). Snap it to the grid, skipping missed windows.
+            triggered = (sent + received) / 2
+            next_window = max(window + 1, int((triggered - self.__t0) / gate))
+            self.missed += next_window - window - 1
+            window = next_window
+
+            error = triggered - (self.__t0 + window * gate)
+            self.offset += self.drift_smoothing * (error - self.offset)
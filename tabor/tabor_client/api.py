@@ -1,67 +1,381 @@
-from typing import Dict
-from fastapi import FastAPI
+import asyncio
+import io
+import itertools
+import uuid
+import numpy as np
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterator, List
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel
 from fastapi.responses import RedirectResponse, Response
+from starlette.requests import ClientDisconnect
 from tabor.tabor_client import TaborClient, TaborClientSocketException
+from tabor.tabor_client.broadcast import TaborCounterBroadcaster
+from tabor.tabor_client.consts import TABOR_API_HOSTS, TABOR_API_UPLOAD_TIMEOUT
+from tabor.tabor_client.exceptions import (
+    TaborClientWorkerBusyException,
+    TaborClientWorkerTimeoutException,
+)
+from tabor.tabor_client.log import log
+from tabor.tabor_client.worker import TaborClientWorker
 
-api = FastAPI()
+ACTIVE_WORKERS: Dict[str, TaborClientWorker] = {}
+ACTIVE_WORKERS_LOCK = asyncio.Lock()
+ACTIVE_UPLOADS: Dict[str, dict] = {}
+ACTIVE_COUNTERS: Dict[str, TaborCounterBroadcaster] = {}
+MAX_UPLOAD_RECORDS = 100
 
-ACTIVE_CLIENTS: Dict[str, TaborClient] = {}
 
+def parse_host(host: str):
+    """Parses a host:port string (port defaults to 5025)"""
+    parts = host.rsplit(":", 1)
+    return parts[0], int(parts[1]) if len(parts) > 1 else 5025
 
-def get_client(hostname: str = None, port: int = 5025):
+
+async def get_worker(hostname: str = None, port: int = 5025) -> TaborClientWorker:
+    """Returns the (started and connected) worker for an instrument"""
     connection_string = f"{hostname}:{port}"
-    client: TaborClient = ACTIVE_CLIENTS.get(connection_string, None)
-    if client is None:
-        client = TaborClient(host=hostname, port=port)
-        ACTIVE_CLIENTS[connection_string] = client
-        print("Created client: " + connection_string)
-    return client
+    async with ACTIVE_WORKERS_LOCK:
+        worker: TaborClientWorker = ACTIVE_WORKERS.get(connection_string, None)
+        if worker is None:
+            worker = TaborClientWorker(TaborClient(host=hostname, port=port))
+            ACTIVE_WORKERS[connection_string] = worker
+            log.info("Created client: " + connection_string)
+
+    if not worker.is_running:
+        await worker.start()
+    return worker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async def connect(host: str):
+        try:
+            await get_worker(*parse_host(host))
+        except Exception as ex:
+            log.error(f"Failed to connect to {host}: {ex}")
 
+    # Connecting the configured instruments eagerly.
+    await asyncio.gather(*[connect(h) for h in TABOR_API_HOSTS])
+    yield
+    await asyncio.gather(*[c.stop() for c in ACTIVE_COUNTERS.values()])
+    await asyncio.gather(*[w.stop() for w in ACTIVE_WORKERS.values()])
 
-def to_error_response(ex: TaborClientSocketException):
+
+api = FastAPI(lifespan=lifespan)
+
+
+def to_error_response(ex: Exception):
+    if isinstance(ex, TaborClientWorkerBusyException):
+        return Response(content=str(ex), status_code=503)
+    if isinstance(ex, TaborClientWorkerTimeoutException):
+        return Response(content=str(ex), status_code=504)
     return Response(
         content=f"{ex.message}:{ex.code}",
         status_code=502,
     )
 
 
+async def submit(hostname: str, port: int, func_name: str, *args, **kwargs):
+    try:
+        worker = await get_worker(hostname, port)
+        return await worker.submit(getattr(worker.client, func_name), *args, **kwargs)
+    except (
+        TaborClientSocketException,
+        TaborClientWorkerBusyException,
+        TaborClientWorkerTimeoutException,
+    ) as ex:
+        return to_error_response(ex)
+
+
 @api.get("/")
-def tabor_client_redirect_root():
+async def tabor_client_redirect_root():
     return RedirectResponse("/docs#")
 
 
 @api.get("/connect")
-def tabor_client_connect(hostname: str, port: int = 5025, query: str = "*IDN?"):
-    client = get_client(hostname, port)
-    try:
+async def tabor_client_connect(hostname: str, port: int = 5025, query: str = "*IDN?"):
+    def connect_and_query(client: TaborClient):
         client.connect()
         return client.query(query)
-    except TaborClientSocketException as ex:
+
+    try:
+        worker = await get_worker(hostname, port)
+        return await worker.submit(connect_and_query, worker.client)
+    except (
+        TaborClientSocketException,
+        TaborClientWorkerBusyException,
+        TaborClientWorkerTimeoutException,
+    ) as ex:
         return to_error_response(ex)
 
 
 @api.get("/query")
-def tabor_client_query(
+async def tabor_client_query(
     hostname: str,
     query: str,
     port: int = 5025,
 ):
-    try:
-        return get_client(hostname, port).query(query)
-    except TaborClientSocketException as ex:
-        return to_error_response(ex)
+    return await submit(hostname, port, "query", query)
 
 
 @api.get("/command")
-def tabor_client_command(
+async def tabor_client_command(
     hostname: str,
     command: str,
     port: int = 5025,
 ):
+    return await submit(hostname, port, "command", command)
+
+
+class TaborBatchRequest(BaseModel):
+    hostname: str
+    port: int = 5025
+    requests: List[str] = []
+    """The ordered requests, each may hold multiple ; separated requests"""
+    text: str = None
+    """Raw request text (appended after requests), e.g. a multi line script"""
+
+
+@api.post("/batch")
+async def tabor_client_batch(batch: TaborBatchRequest):
+    requests = list(batch.requests)
+    if batch.text:
+        requests.append(batch.text)
+    if len(requests) == 0:
+        return Response(content="No requests to send", status_code=400)
+    return await submit(batch.hostname, batch.port, "batch", *requests)
+
+
+def iterate_in_thread(
+    stream: AsyncIterator[bytes],
+    loop: asyncio.AbstractEventLoop,
+) -> Iterator[bytes]:
+    """Iterates an async stream from a worker thread, pulling one chunk at a time
+    from the event loop (the stream is consumed at the rate of the instrument)"""
+    while True:
+        try:
+            chunk = asyncio.run_coroutine_threadsafe(stream.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+        if len(chunk) > 0:
+            yield chunk
+
+
+async def read_npy_header(stream: AsyncIterator[bytes]):
+    """Reads the npy header from the start of the stream.
+
+    Returns:
+        Tuple[np.dtype, tuple, bytes]: The dtype, shape and the data bytes
+            read after the header.
+    """
+    buff = b""
+    while True:
+        try:
+            buff += await stream.__anext__()
+        except StopAsyncIteration:
+            raise ValueError("Invalid npy data, stream ended before the header")
+        if len(buff) < 10:
+            continue
+        # Header length is at bytes 8-10 (v1) or 8-12 (v2+)
+        header_len = 10 + int.from_bytes(buff[8:10], "little")
+        if buff[6] > 1:
+            header_len = 12 + int.from_bytes(buff[8:12], "little")
+        if len(buff) < header_len:
+            continue
+
+        raw = io.BytesIO(buff[:header_len])
+        version = np.lib.format.read_magic(raw)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(raw)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(raw)
+        return dtype, shape, buff[header_len:]
+
+
+def add_upload_record(record: dict):
+    ACTIVE_UPLOADS[record["upload_id"]] = record
+    while len(ACTIVE_UPLOADS) > MAX_UPLOAD_RECORDS:
+        del ACTIVE_UPLOADS[next(iter(ACTIVE_UPLOADS))]
+
+
+@api.post("/segment")
+async def tabor_client_upload_segment(
+    request: Request,
+    hostname: str,
+    channel: int,
+    segment_id: int,
+    port: int = 5025,
+    format: str = "raw",
+    upload_id: str = None,
+):
+    """Uploads a segment from the request body, raw DAC values (application/octet-stream,
+    U16 or U8 by the device DAC mode) or a 1D .npy array of DAC values (format=npy). The
+    body is streamed to the instrument without buffering."""
     try:
-        return get_client(hostname, port).command(command)
+        worker = await get_worker(hostname, port)
     except TaborClientSocketException as ex:
         return to_error_response(ex)
+    config = worker.client.device_config
+    sample_size = config.data_bits // 8
+
+    stream = request.stream()
+    head = b""
+    if format == "npy":
+        try:
+            dtype, shape, head = await read_npy_header(stream)
+        except ValueError as ex:
+            return Response(content=str(ex), status_code=400)
+        if dtype.itemsize != sample_size or dtype.kind not in "ui" or len(shape) != 1:
+            return Response(
+                content=f"Expected a 1D array of {config.data_bits} bit integers,"
+                f" got {dtype} {shape}",
+                status_code=400,
+            )
+        if dtype.byteorder == ">":
+            return Response(content="Expected little endian data", status_code=400)
+        num_samples = shape[0]
+    elif format == "raw":
+        if "content-length" not in request.headers:
+            return Response(content="Content-Length is required", status_code=411)
+        num_samples = int(request.headers["content-length"]) // sample_size
+    else:
+        return Response(content=f"Unknown format {format}", status_code=400)
+
+    record = {
+        "upload_id": upload_id or str(uuid.uuid4()),
+        "hostname": hostname,
+        "channel": channel,
+        "segment_id": segment_id,
+        "total": num_samples * sample_size,
+        "written": 0,
+        "done": False,
+        "error": None,
+    }
+    add_upload_record(record)
+
+    def progress(written: int):
+        record["written"] = written
+
+    loop = asyncio.get_running_loop()
+
+    def chunks():
+        received = 0
+        for chunk in itertools.chain([head], iterate_in_thread(stream, loop)):
+            received += len(chunk)
+            yield chunk
+        if received < record["total"]:
+            # Stop before the last (partial) block is written.
+            raise ValueError(
+                f"The request body ended after {received} of {record['total']} bytes"
+            )
+
+    try:
+        await worker.submit(
+            worker.client.write_segment_stream,
+            segment_id,
+            num_samples,
+            chunks(),
+            channel=channel,
+            progress=progress,
+            timeout=TABOR_API_UPLOAD_TIMEOUT,
+        )
+    except (
+        TaborClientSocketException,
+        TaborClientWorkerBusyException,
+        TaborClientWorkerTimeoutException,
+    ) as ex:
+        record["error"] = str(ex)
+        return to_error_response(ex)
+    except ClientDisconnect:
+        record["error"] = "Client disconnected"
+        log.warning(f"Upload {record['upload_id']} to {hostname} was disconnected")
+        return Response(content=record["error"], status_code=400)
+    except (AssertionError, ValueError) as ex:
+        record["error"] = str(ex)
+        return Response(content=str(ex), status_code=400)
+    finally:
+        record["done"] = True
+
+    log.info(
+        f"Uploaded segment {segment_id} to {hostname}:{channel} ({record['written']} bytes)"
+    )
+    return record
+
+
+@api.get("/segment/progress")
+async def tabor_client_upload_progress(upload_id: str):
+    record = ACTIVE_UPLOADS.get(upload_id, None)
+    if record is None:
+        return Response(content=f"Unknown upload {upload_id}", status_code=404)
+    return record
+
+
+@api.websocket("/counter/stream")
+async def tabor_client_counter_stream(
+    websocket: WebSocket,
+    hostname: str,
+    port: int = 5025,
+    dt: float = 0.1,
+    channels: str = "1",
+    buffer: int = 64,
+):
+    """Streams the counter readings of an instrument as binary frames (see
+    TaborCounterBroadcaster.FRAME_HEADER). All subscribers of an instrument share
+    a single acquisition loop; dt and channels (1 based, comma separated) are set by
+    the first subscriber. The stream parameters are sent (as json) before the first
+    frame."""
+    await websocket.accept()
+    try:
+        worker = await get_worker(hostname, port)
+    except TaborClientSocketException as ex:
+        await websocket.close(code=1011, reason=str(ex))
+        return
+
+    connection_string = f"{hostname}:{port}"
+    broadcaster = ACTIVE_COUNTERS.get(connection_string, None)
+    if broadcaster is None or not broadcaster.is_running:
+        broadcaster = TaborCounterBroadcaster(
+            worker,
+            dt=dt,
+            channels=[int(c) for c in channels.split(",") if c.strip()],
+        )
+        ACTIVE_COUNTERS[connection_string] = broadcaster
+
+    subscription = broadcaster.subscribe(maxsize=buffer)
+
+    async def send_frames():
+        while True:
+            await websocket.send_bytes(await subscription.get())
+
+    async def wait_disconnect():
+        # The client sends nothing, receive returns (the disconnect message) when
+        # the client goes away, even if no frames are being sent.
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sender: asyncio.Task = None
+    receiver: asyncio.Task = None
+    try:
+        await websocket.send_json(
+            {
+                "dt": broadcaster.dt,
+                "channels": broadcaster.channels,
+                "frame": "<dI timestamp, number of channels, followed by <i8 counts",
+            }
+        )
+        sender = asyncio.create_task(send_frames())
+        receiver = asyncio.create_task(wait_disconnect())
+        await asyncio.wait([sender, receiver], return_when=asyncio.FIRST_COMPLETED)
+        if sender.done():
+            sender.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in [sender, receiver]:
+            if task is not None:
+                task.cancel()
+        broadcaster.unsubscribe(subscription)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+import asyncio
+import struct
+import time
+from collections import deque
+from typing import List
+
+import numpy as np
+
+from tabor.tabor_client.log import log
+from tabor.tabor_client.worker import TaborClientWorker
+
+
+class TaborCounterSubscription:
+    def __init__(self, maxsize: int = 64) -> None:
+        """A bounded frame buffer of a single subscriber. When the subscriber
+        is slow, the oldest frames are dropped.
+
+        Args:
+            maxsize (int, optional): The max number of buffered frames. Defaults to 64.
+        """
+        self.__frames = deque(maxlen=maxsize)
+        self.__event = asyncio.Event()
+        self.dropped = 0
+        """The number of frames dropped"""
+
+    def push(self, frame: bytes):
+        if len(self.__frames) == self.__frames.maxlen:
+            self.dropped += 1
+        self.__frames.append(frame)
+        self.__event.set()
+
+    async def get(self) -> bytes:
+        while len(self.__frames) == 0:
+            self.__event.clear()
+            await self.__event.wait()
+        return self.__frames.popleft()
+
+
+class TaborCounterBroadcaster:
+    FRAME_HEADER = struct.Struct("<dI")
+    """Frame header, timestamp (unix, seconds) and the number of channels. The header
+    is followed by the counts as int64 (little endian)"""
+
+    def __init__(
+        self,
+        worker: TaborClientWorker,
+        dt: float = 0.1,
+        channels: List[int] = None,
+        trigger_level: float = 0.1,
+    ) -> None:
+        """Runs a single counter acquisition loop on an instrument and sends the
+        counts (as binary frames) to all subscribers. The loop runs while there
+        are subscribers.
+
+        Args:
+            worker (TaborClientWorker): The instrument worker.
+            dt (float, optional): The counter window (seconds). Defaults to 0.1.
+            channels (List[int], optional): The digitizer channels (1 based, CH<n>).
+                Defaults to [1].
+            trigger_level (float, optional): The counter trigger level. Defaults to 0.1.
+        """
+        self.worker = worker
+        self.dt = dt
+        self.channels = channels or [1]
+        self.trigger_level = trigger_level
+
+        self.__subscribers: List[TaborCounterSubscription] = []
+        self.__task: asyncio.Task = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.__task is not None and not self.__task.done()
+
+    @property
+    def subscribers(self) -> List[TaborCounterSubscription]:
+        return list(self.__subscribers)
+
+    @classmethod
+    def to_frame(cls, timestamp: float, counts: List[int]) -> bytes:
+        return (
+            cls.FRAME_HEADER.pack(timestamp, len(counts))
+            + np.asarray(counts, dtype="<i8").tobytes()
+        )
+
+    @classmethod
+    def from_frame(cls, frame: bytes):
+        """Parses a frame
+
+        Returns:
+            Tuple[float, np.ndarray]: The timestamp and the counts.
+        """
+        timestamp, count = cls.FRAME_HEADER.unpack_from(frame)
+        counts = np.frombuffer(
+            frame, dtype="<i8", count=count, offset=cls.FRAME_HEADER.size
+        )
+        return timestamp, counts
+
+    def subscribe(self, maxsize: int = 64) -> TaborCounterSubscription:
+        subscription = TaborCounterSubscription(maxsize=maxsize)
+        self.__subscribers.append(subscription)
+        if not self.is_running:
+            self.__task = asyncio.create_task(self.__run())
+        return subscription
+
+    def unsubscribe(self, subscription: TaborCounterSubscription):
+        if subscription in self.__subscribers:
+            self.__subscribers.remove(subscription)
+
+    async def stop(self):
+        self.__subscribers.clear()
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+    async def __run(self):
+        client = self.worker.client
+        prepared = False
+
+        while len(self.__subscribers) > 0:
+            try:
+                if not prepared:
+                    await self.worker.submit(
+                        client.counter_prepare,
+                        self.dt,
+                        *self.channels,
+                        trigger_level=self.trigger_level,
+                    )
+                    prepared = True
+                await self.worker.submit(client.counter_trigger)
+                await asyncio.sleep(self.dt)
+                counts = await self.worker.submit(client.counter_read, *self.channels)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                log.error(f"Counter read failed on {client.resource_name}: {ex}")
+                await asyncio.sleep(self.dt)
+                continue
+
+            frame = self.to_frame(time.time(), counts)
+            for subscription in self.__subscribers:
+                subscription.push(frame)
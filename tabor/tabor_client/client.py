@@ -1,6 +1,7 @@
 import enum
 import re
 from typing_extensions import deprecated
+import numpy as np
 import pyvisa
 import pyvisa.util
 import pyvisa.constants
@@ -10,18 +11,21 @@ from datetime import datetime
 from typing import Callable, Iterable, List, Union
 from pyvisa.resources.tcpip import TCPIPInstrument
 from pyvisa.util import BINARY_DATATYPES
-from tabor.tabor_client.config import (
-    TaborDefaultDeviceConfig,
-    TaborDeviceConfig,
-    TaborP9082DeviceConfig,
-)
+from tabor.tabor_client.config import TaborDeviceConfig
 
 from tabor.tabor_client.exceptions import (
     TaborClientException,
     TaborClientSocketException,
 )
-from tabor.tabor_client.data import TaborWaveform, TaborDataSegment
+from tabor.tabor_client.data import (
+    TaborWaveform,
+    TaborDataSegment,
+    tabor_align_marker_values,
+    tabor_pack_marker_values,
+)
+from tabor.tabor_client.lock import TaborClientLock, tabor_synchronized
 from tabor.tabor_client.log import log
+from tabor.tabor_client.profile import TaborDeviceProfile, TaborDeviceProfileCache
 
 
 class TaborClientRequestType(enum.Enum):
@@ -31,7 +35,7 @@ class TaborClientRequestType(enum.Enum):
 
 class TaborClientRequest:
     REQUEST_REGEXP = TABOR_REGEXP = (
-        r"\s*([*][a-zA-Z0-9]+)(\?*)\s*([;]|$)|\s*(([\:]\s*[a-zA-Z0-9]+)+(\?*))\s+([^;\n]+|)\s*([;]|$)"
+        r"\s*([*][a-zA-Z0-9]+)(\?*)\s*([;]|$)|\s*(([\:]\s*[a-zA-Z0-9]+)+(\?*))(?:[ \t]+([^;\n]*?))?\s*([;\n]|$)"
     )
 
     def __init__(
@@ -73,15 +77,15 @@ class TaborClientRequest:
         rslt: List[TaborClientRequest] = []
         for parsed in requests:
             request = parsed[0] or parsed[3]
-            request = re.sub(r"[^A-Z0-9:]", "", request)
+            request = re.sub(r"[^A-Z0-9:*]", "", request.upper())
+            params = []
+            if parsed[6]:
+                # This may have params
+                params = [parsed[6].strip()]
             rtype = TaborClientRequestType.command
             if parsed[1] == "?" or parsed[5] == "?":
                 rtype = TaborClientRequestType.query
                 request += "?"
-            params = []
-            if parsed[6]:
-                # This may have params
-                params = [parsed[6]]
             request = TaborClientRequest(
                 rtype=rtype,
                 request=request,
@@ -97,6 +101,35 @@ class TaborClientRequest:
         return self.rtype.value + " " + self.__str__()
 
 
+class TaborClientBatchResult(dict):
+    """The result of a single request in a batch"""
+
+    def __init__(
+        self,
+        request: TaborClientRequest,
+        response: str = None,
+        error: TaborClientSocketException = None,
+    ) -> None:
+        super().__init__()
+        self["request"] = request.as_string
+        self["rtype"] = request.rtype.value
+        self["response"] = response
+        self["error"] = None if error is None else error.message
+        self["code"] = 0 if error is None else error.code
+
+    @property
+    def response(self) -> str:
+        return self.get("response", None)
+
+    @property
+    def error(self) -> str:
+        return self.get("error", None)
+
+    @property
+    def code(self) -> int:
+        return self.get("code", 0)
+
+
 class TaborClient:
     def __init__(
         self,
@@ -108,6 +141,9 @@ class TaborClient:
         keep_command_and_query_record: bool = False,
         device_config: TaborDeviceConfig = None,
         reconnect_timeout: int = 1,
+        profile_cache: TaborDeviceProfileCache = None,
+        use_profile_cache: bool = False,
+        write_bytes_chunk: int = 2**22,
     ) -> None:
         self.resource_name = f"TCPIP0::{host}::{port}::SOCKET"
         self.resource_manager = pyvisa.ResourceManager("@py")
@@ -117,17 +153,35 @@ class TaborClient:
         self.timeout = timeout
         self.reconnect_timeout = reconnect_timeout
         self.read_bytes_chunk = read_bytes_chunk
+        self.write_bytes_chunk = write_bytes_chunk
         self.keep_command_and_query_record = keep_command_and_query_record
+        self.profile_cache = profile_cache or (
+            TaborDeviceProfileCache() if use_profile_cache else None
+        )
 
         self.__command_record: List[Tuple] = []
         self.__device_config = device_config
+        self.__profile: TaborDeviceProfile = None
         self.__channel_select_command = "INST:CHAN:SEL"
         self.__last_called = 0
+        self.__lock = TaborClientLock()
 
     def __del__(self):
         if self.__resource is not None:
             self.disconnect()
 
+    @property
+    def lock(self) -> TaborClientLock:
+        """The instrument request lock (FIFO, reentrant). All requests are sent while
+        holding the lock; hold it to run a multi-step sequence without interleaving
+        requests from other threads,
+
+        with client.lock:
+            client.write_segments(wav)
+            client.command(...)
+        """
+        return self.__lock
+
     @property
     def last_called(self):
         return datetime.fromtimestamp(self.__last_called)
@@ -140,6 +194,11 @@ class TaborClient:
     def device_config(self):
         return self.__device_config
 
+    @property
+    def profile(self) -> TaborDeviceProfile:
+        """The device capability profile (available after connect)"""
+        return self.__profile
+
     @property
     def resource(self) -> TCPIPInstrument:
         return self.__resource
@@ -178,37 +237,158 @@ class TaborClient:
         self.__resource.timeout = self.timeout
         return self.__resource
 
+    def __reset_resource(self):
+        """Reopens the instrument session, dropping any partially sent data"""
+        log.warning(f"Resetting the connection to {self.resource_name}")
+        try:
+            self.__create_http_resource()
+        except Exception as ex:
+            log.error(f"Failed to reopen {self.resource_name}: {ex}")
+            self.__resource = None
+
     def ping(self):
         start = datetime.now()
         model = self.query(":SYST:iNF:MODel?")
         dt = datetime.now() - start
         return dt, model
 
+    def __handshake(self, probe: bool = True, read_dac_mode: bool = True):
+        """Clears the error list and reads the device IDN, DAC mode, current frequency
+        and (if probe) the device profile values in a single round trip"""
+        queries = ["*CLS", "*IDN?"]
+        if probe:
+            queries += TaborDeviceProfile.PROBE_QUERIES
+        elif read_dac_mode:
+            queries += [TaborDeviceProfile.DAC_MODE_QUERY]
+        queries += [":FREQ:RAST?", ":SYST:ERR?"]
+
+        rsp = self.raw_query(*queries).split(self.seperator)
+        err = self.__parse_error_response(rsp[-1])
+        if err.code != 0:
+            raise err from TaborClientException("Error in connect handshake")
+
+        idn = rsp[0].strip()
+        freq = float(rsp[-2])
+        probe_rsp = []
+        dac_mode: str = None
+        if probe:
+            probe_rsp = rsp[1:-2]
+            dac_mode = probe_rsp[
+                TaborDeviceProfile.PROBE_QUERIES.index(
+                    TaborDeviceProfile.DAC_MODE_QUERY
+                )
+            ].strip()
+        elif read_dac_mode:
+            dac_mode = rsp[1].strip()
+        return idn, probe_rsp, dac_mode, freq
+
+    @tabor_synchronized
     def connect(self):
         self.__create_http_resource()
-        self.clear_error_list()
 
-        model = self.query(":SYST:iNF:MODel?")
+        cached: TaborDeviceProfile = None
+        if self.profile_cache is not None:
+            cached = self.profile_cache.get_by_resource(self.resource_name)
 
-        log.debug(
-            f"Connectd to Tabor model {model} @ {self.resource_name}, IDN: {self.query('*IDN?')}"
-        )
+        # Probing is skipped if we know the device at this resource.
+        probe = cached is None
+        probe_failed = False
+        try:
+            idn, probe_rsp, dac_mode, freq = self.__handshake(probe=probe)
+        except Exception as ex:
+            if not probe:
+                raise ex
+            # Not all the probe queries are supported by all models.
+            log.warning(f"Failed to probe {self.resource_name}: {ex}")
+            probe_failed = True
+            idn, probe_rsp, dac_mode, freq = self.__handshake(
+                probe=False, read_dac_mode=False
+            )
 
+        profile: TaborDeviceProfile = None
+        if cached is not None and cached.idn == idn:
+            profile = cached
+        elif len(probe_rsp) == 0 and self.profile_cache is not None:
+            # A different device at this resource.
+            profile = self.profile_cache.get(idn)
+
+        if profile is None or not profile.is_complete:
+            if not probe_failed:
+                try:
+                    profile = self.probe(idn, probe_rsp if len(probe_rsp) > 0 else None)
+                except Exception as ex:
+                    log.warning(f"Failed to probe {self.resource_name}: {ex}")
+                    probe_failed = True
+            if probe_failed:
+                log.warning(
+                    f"Using the model defaults for {self.resource_name}, IDN: {idn}"
+                )
+                profile = TaborDeviceProfile.from_idn(idn, dac_mode)
+        elif dac_mode is not None and (
+            profile.set_dac_mode(dac_mode) or profile is not cached
+        ):
+            # The DAC mode changed since the profile was cached, or a known device
+            # at a new resource.
+            self.profile_cache.set(profile, self.resource_name)
+
+        self.__profile = profile
         if self.device_config is None:
-            if "P9082" in model:
-                self.__device_config = TaborP9082DeviceConfig()
-            else:
-                self.__device_config = TaborDefaultDeviceConfig()
-            self.__device_config.model = model
+            self.__device_config = profile.to_device_config()
 
-        # Setting interaction frequency
-        self.command(f":FREQ:RAST {self.device_config.freq}")
         log.debug(
-            f"Interaction frequency set, and retrived as: {self.query(':FREQ:RAST?')}"
+            "Connected to Tabor model %s @ %s, IDN: %s",
+            profile.model,
+            self.resource_name,
+            idn,
         )
 
+        # Setting interaction frequency
+        if freq != float(self.device_config.freq):
+            self.command(f":FREQ:RAST {self.device_config.freq}")
+            log.debug("Interaction frequency set to %s", self.device_config.freq)
+
         return self
 
+    def __probe_query(self, *queries: str) -> List[str]:
+        """Queries and raises if any of the queries failed (e.g. not supported)"""
+        self.__assert_connected()
+        rsp = self.raw_query(*queries, ":SYST:ERR?").split(self.seperator)
+        err = self.__parse_error_response(rsp[-1])
+        if err.code != 0:
+            raise err from TaborClientException("Error in device probe")
+        return rsp[:-1]
+
+    @tabor_synchronized
+    def probe(
+        self,
+        idn: str = None,
+        probe_rsp: List[str] = None,
+    ) -> TaborDeviceProfile:
+        """Probes the device capabilities (model, options, DAC mode, frequency range,
+        channels and memory per bank) and updates the profile cache.
+
+        Args:
+            idn (str, optional): The device IDN, if already queried. Defaults to None.
+            probe_rsp (List[str], optional): The response to TaborDeviceProfile.PROBE_QUERIES,
+                if already queried. Defaults to None.
+        """
+        if idn is None or probe_rsp is None:
+            rsp = self.__probe_query("*IDN?", *TaborDeviceProfile.PROBE_QUERIES)
+            idn, probe_rsp = rsp[0], rsp[1:]
+
+        profile = TaborDeviceProfile.from_probe_response(idn, probe_rsp)
+        selected = int(self.__probe_query(":INST:CHAN?")[0].strip())
+        rsp = self.__probe_query(*profile.bank_memory_queries(restore_channel=selected))
+        profile.bank_memory = {
+            channel: profile.parse_memory_response(memory)
+            for channel, memory in zip(profile.memory_banks, rsp)
+        }
+
+        if self.profile_cache is not None:
+            self.profile_cache.set(profile, self.resource_name)
+        return profile
+
+    @tabor_synchronized
     def disconnect(self):
         self.__resource.close()
         self.__resource = None
@@ -218,6 +398,7 @@ class TaborClient:
             self.connect()
         if self.requires_reconnect:
             self.__create_http_resource()
+        self.__last_called = datetime.now().timestamp()
 
     def __clean_queries(self, queries: Iterable[str]):
         return [q.strip() for q in queries if q is not None and len(q.strip()) > 0]
@@ -225,10 +406,14 @@ class TaborClient:
     def __compose_query(self, *queries: str):
         return self.seperator.join(self.__clean_queries(queries))
 
+    def __is_error_response(self, rsp: str):
+        return re.match(r"^\s*-?\d+\s*,\s*\"?[a-zA-Z]", rsp) is not None
+
     def __parse_error_response(self, rsp):
-        [error_code, error_string] = re.split(r",\s*", rsp)
+        [error_code, error_string] = re.split(r",\s*", rsp, maxsplit=1)
         return TaborClientSocketException(error_string, code=error_code)
 
+    @tabor_synchronized
     def query(
         self,
         *queries: str,
@@ -250,12 +435,14 @@ class TaborClient:
             return rsp[0]
         return rsp
 
+    @tabor_synchronized
     def raw_query(self, *queries: str):
         for q in queries:
             self.__append_to_command_record(queries)
 
         return self.resource.query(self.__compose_query(*queries))
 
+    @tabor_synchronized
     def command(
         self,
         *queries: str,
@@ -309,6 +496,59 @@ class TaborClient:
                     parsed.append(r)
         return parsed
 
+    @tabor_synchronized
+    def batch(
+        self,
+        *requests: str | TaborClientRequest,
+    ) -> List[TaborClientBatchResult]:
+        """Sends a list of requests (queries and commands) as a single composed
+        message, with an error check after each request.
+
+        Args:
+            requests (str | TaborClientRequest): The requests. Strings are parsed
+                and may hold multiple requests.
+
+        Returns:
+            List[TaborClientBatchResult]: The response and error of each request, in order.
+        """
+        self.__assert_connected()
+        parsed = self.parse(*requests)
+        assert len(parsed) > 0, ValueError("At least one request must be sent")
+
+        compose = []
+        for rq in parsed:
+            compose += [rq.as_string, ":SYST:ERR?"]
+        rsp = self.raw_query(*compose).split(self.seperator)
+
+        # A failed query may not return a value, the error response
+        # is then found in the place of the value.
+        num_queries = sum(
+            1 for rq in parsed if rq.rtype == TaborClientRequestType.query
+        )
+        missing = len(parsed) + num_queries - len(rsp)
+
+        rslt: List[TaborClientBatchResult] = []
+        idx = 0
+        for rq in parsed:
+            response = None
+            if rq.rtype == TaborClientRequestType.query:
+                if missing > 0 and self.__is_error_response(rsp[idx]):
+                    missing -= 1
+                else:
+                    response = rsp[idx]
+                    idx += 1
+            err = self.__parse_error_response(rsp[idx]) if idx < len(rsp) else None
+            idx += 1
+            rslt.append(
+                TaborClientBatchResult(
+                    rq,
+                    response=response,
+                    error=err if err is not None and err.code != 0 else None,
+                )
+            )
+        return rslt
+
+    @tabor_synchronized
     def write_binary(
         self,
         command: str,
@@ -332,10 +572,85 @@ class TaborClient:
         if err.code != 0:
             raise err from TaborClientException("Error writing binary data")
 
-    def read_binary(
+    @tabor_synchronized
+    def write_binary_chunks(
         self,
         command: str,
-    ):
+        chunks: Iterable[Union[bytes, memoryview]],
+        chunk_size: int = None,
+        progress: Callable[[int], None] = None,
+    ) -> int:
+        """Writes a stream of binary data as a sequence of offset block writes,
+        `<command> <offset>,#<header><block>`, without holding the whole data in memory.
+
+        Args:
+            command (str): The binary write command, e.g. :TRAC:DATA
+            chunks (Iterable[Union[bytes, memoryview]]): The data chunks (any size).
+            chunk_size (int, optional): The block size (bytes) written to the device, the chunks
+                are re-buffered to this size. Defaults to write_bytes_chunk.
+            progress (Callable[[int], None], optional): Called with the number of bytes
+                written after each block. Defaults to None.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        self.__assert_connected()
+        chunk_size = chunk_size or self.write_bytes_chunk
+        buff = memoryview(bytearray(chunk_size))
+        filled = 0
+        offset = 0
+        sent = False
+
+        def write_block(block: memoryview):
+            nonlocal offset, sent
+            size = str(len(block))
+            header = f"{command} {offset},#{len(size)}{size}"
+            self.__append_to_command_record(header)
+            sent = True
+            self.resource.write_raw(header.encode("ascii"))
+            self.resource.write_raw(block)
+            self.resource.write_raw(b"\n")
+            offset += len(block)
+            if progress is not None:
+                progress(offset)
+
+        try:
+            for chunk in chunks:
+                chunk = memoryview(chunk).cast("B")
+                while len(chunk) > 0:
+                    if filled == 0 and len(chunk) >= chunk_size:
+                        # Nothing buffered, write directly from the chunk.
+                        write_block(chunk[:chunk_size])
+                        chunk = chunk[chunk_size:]
+                        continue
+                    n = min(chunk_size - filled, len(chunk))
+                    buff[filled : filled + n] = chunk[:n]
+                    filled += n
+                    chunk = chunk[n:]
+                    if filled == chunk_size:
+                        write_block(buff)
+                        filled = 0
+            if filled > 0:
+                write_block(buff[:filled])
+        except Exception as ex:
+            if sent:
+                # The device may be waiting for the rest of a block, and would read
+                # the next commands as block data.
+                self.__reset_resource()
+            raise ex from TaborClientException("Error while writing binary data")
+
+        rsp = self.raw_query("*OPC?", ":SYST:ERR?").split(self.seperator)
+        err = self.__parse_error_response(rsp[-1])
+        if err.code != 0:
+            raise err from TaborClientException("Error writing binary data")
+        return offset
+
+    def __read_binary_header(self, command: str) -> int:
+        """Sends the binary query and reads the block header, #<ndigits><size>
+
+        Returns:
+            int: The block size in bytes.
+        """
         self.__assert_connected()
         query = self.__compose_query(command)
 
@@ -353,18 +668,78 @@ class TaborClient:
             f"Expected bytes digits to be an number, but found {buff}"
         )
         num_bytes_digits = int(buff.decode("utf-8"))
-        num_bytes = int(
+        return int(
             self.resource.read_bytes(
                 num_bytes_digits,
                 chunk_size=1,
             ).decode("utf-8")
         )
 
+    def __read_binary_end(self):
+        # The block is terminated by a new line
+        buff = self.resource.read_bytes(1)
+        assert buff == b"\n", TaborClientException(
+            f"Expected bytes block to end with a new line, but found {buff}"
+        )
+
+    @tabor_synchronized
+    def read_binary(
+        self,
+        command: str,
+    ):
+        num_bytes = self.__read_binary_header(command)
+
         # reading bytes
         buff = self.resource.read_bytes(num_bytes, chunk_size=self.read_bytes_chunk)
+        self.__read_binary_end()
 
         return buff
 
+    @tabor_synchronized
+    def read_binary_into(
+        self,
+        command: str,
+        out: Union[np.ndarray, bytearray, memoryview],
+        chunk_size: int = None,
+    ) -> int:
+        """Reads a binary block response directly into a preallocated buffer. The block
+        is read in chunks, so no intermediate buffer of the full block size is created.
+
+        Args:
+            command (str): The binary query, e.g. :DIG:DATA:READ?
+            out (Union[np.ndarray, bytearray, memoryview]): The (C contiguous) buffer,
+                must have the exact size of the block.
+            chunk_size (int, optional): The read size (bytes). Defaults to write_bytes_chunk.
+
+        Returns:
+            int: The number of bytes read.
+        """
+        if isinstance(out, np.ndarray):
+            assert out.flags.c_contiguous, ValueError("out must be C contiguous")
+            out = out.reshape(-1).view(np.uint8)
+        buff = memoryview(out).cast("B")
+        chunk_size = chunk_size or self.write_bytes_chunk
+
+        num_bytes = self.__read_binary_header(command)
+        if num_bytes != len(buff):
+            # Drain the response to keep the connection usable.
+            self.resource.read_bytes(num_bytes, chunk_size=self.read_bytes_chunk)
+            self.__read_binary_end()
+            raise TaborClientException(
+                f"Expected a binary block of {len(buff)} bytes, but found {num_bytes}"
+            )
+
+        offset = 0
+        while offset < num_bytes:
+            n = min(chunk_size, num_bytes - offset)
+            buff[offset : offset + n] = self.resource.read_bytes(
+                n, chunk_size=self.read_bytes_chunk
+            )
+            offset += n
+        self.__read_binary_end()
+
+        return num_bytes
+
     # endregion
 
     # region Simple command methods
@@ -416,6 +791,7 @@ class TaborClient:
 
     # region waveforms and voltage out
 
+    @tabor_synchronized
     def write_segments(self, *segments: Union[TaborDataSegment, TaborWaveform]):
         assert all(
             isinstance(
@@ -436,6 +812,13 @@ class TaborClient:
                 device_config=self.device_config,
             )
 
+            max_length = self.device_config.segment_max_length
+            if max_length is not None and len(seg_dac_data) > max_length:
+                raise TaborClientException(
+                    f"Segment {seg.segment_id} of length {len(seg_dac_data)} exceeds the"
+                    f" device memory bank ({max_length} samples)"
+                )
+
             # To data values
             self.command(
                 f":TRAC:DEL {seg.segment_id}",
@@ -456,6 +839,117 @@ class TaborClient:
                 datatype=self.device_config.binary_data_type,
             )
 
+    @tabor_synchronized
+    def write_segment_stream(
+        self,
+        segment_id: int,
+        num_samples: int,
+        chunks: Iterable[Union[bytes, memoryview]],
+        channel: int = None,
+        progress: Callable[[int], None] = None,
+    ) -> int:
+        """Defines a segment and streams its DAC values (raw device data format,
+        U16 or U8 by the device config) without holding them in memory.
+
+        Args:
+            segment_id (int): The segment id.
+            num_samples (int): The segment length (in samples), must match the device
+                granularity and min length.
+            chunks (Iterable[Union[bytes, memoryview]]): The raw DAC data chunks.
+            channel (int, optional): Select this channel before defining the segment. Defaults to None.
+            progress (Callable[[int], None], optional): Called with the number of bytes
+                written after each block. Defaults to None.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        self.__assert_connected()
+        config = self.device_config
+        assert num_samples >= config.segment_min_length, ValueError(
+            f"Segment length must be at least {config.segment_min_length} samples"
+        )
+        assert num_samples % config.segment_min_size_step == 0, ValueError(
+            f"Segment length must be a multiple of {config.segment_min_size_step} samples"
+        )
+        max_length = config.segment_max_length
+        assert max_length is None or num_samples <= max_length, ValueError(
+            f"Segment length exceeds the device memory bank ({max_length} samples)"
+        )
+
+        self.command(
+            f":{self.__channel_select_command} {channel}" if channel else None,
+            f":TRAC:DEL {segment_id}",
+            f":TRAC:DEF {segment_id}, {num_samples}",
+            f":TRAC:SEL {segment_id}",
+            f":TRAC:FORM U{config.data_bits}",
+        )
+        written = self.write_binary_chunks(":TRAC:DATA", chunks, progress=progress)
+
+        expected = num_samples * config.data_bits // 8
+        assert written == expected, TaborClientException(
+            f"Segment {segment_id}: expected {expected} bytes of data, got {written}"
+        )
+        return written
+
+    @tabor_synchronized
+    def write_segment_table_stream(
+        self,
+        segment_id: int,
+        lengths: List[int],
+        chunks: Iterable[Union[bytes, memoryview]],
+        channel: int = None,
+        progress: Callable[[int], None] = None,
+    ) -> int:
+        """Defines consecutive segments (segment_id, segment_id + 1, ...) in a single
+        command (:TRAC:SEGM) and streams the DAC values of all of them in a single
+        transfer (:TRAC:MEM). The segments are allocated one after the other from the
+        start of the memory bank of the channel, overwriting any other segment data
+        in the bank.
+
+        Args:
+            segment_id (int): The first segment id.
+            lengths (List[int]): The segment lengths (in samples), must match the device
+                granularity and min length.
+            chunks (Iterable[Union[bytes, memoryview]]): The raw DAC data chunks of all
+                the segments, in order.
+            channel (int, optional): Select this channel before defining the segments.
+                Defaults to None.
+            progress (Callable[[int], None], optional): Called with the number of bytes
+                written after each block. Defaults to None.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        self.__assert_connected()
+        config = self.device_config
+        lengths = np.asarray(lengths, dtype=np.uint64)
+        assert len(lengths) > 0, ValueError("At least one segment is required")
+        assert np.all(lengths >= config.segment_min_length), ValueError(
+            f"Segment lengths must be at least {config.segment_min_length} samples"
+        )
+        assert np.all(lengths % config.segment_min_size_step == 0), ValueError(
+            f"Segment lengths must be a multiple of {config.segment_min_size_step} samples"
+        )
+        max_length = config.segment_max_length
+        assert max_length is None or int(lengths.sum()) <= max_length, ValueError(
+            f"The segments exceed the device memory bank ({max_length} samples)"
+        )
+
+        self.command(
+            f":{self.__channel_select_command} {channel}" if channel else None,
+            f":TRAC:FORM U{config.data_bits}",
+        )
+        self.write_binary(f":TRAC:SEGM {segment_id},", lengths.tolist(), datatype="Q")
+        written = self.write_binary_chunks(":TRAC:MEM", chunks, progress=progress)
+
+        expected = int(lengths.sum()) * config.data_bits // 8
+        assert written == expected, TaborClientException(
+            f"Segments {segment_id}-{segment_id + len(lengths) - 1}: expected"
+            f" {expected} bytes of data, got {written}"
+        )
+        return written
+
+    @tabor_synchronized
     def waveform_out(
         self,
         *wavs: Union[TaborWaveform, TaborDataSegment, List[float]],
@@ -526,18 +1020,78 @@ class TaborClient:
     def counter_trigger(self):
         return self.command(":DIG:PULS:TRIG:IMM")
 
+    @classmethod
+    def parse_counter_response(
+        cls,
+        rslt: Union[str, List[str]],
+        reads: int = None,
+    ) -> np.ndarray:
+        """Parses the response of one or more counter reads (:DIG:PULS:COUN?)
+
+        Args:
+            rslt (Union[str, List[str]]): The response or a list of responses.
+            reads (int, optional): The number of reads in the response. If set, returns
+                a 2D array (reads x channels). Defaults to None.
+
+        Returns:
+            np.ndarray: The counts.
+        """
+        text = rslt if isinstance(rslt, str) else ",".join(rslt)
+        if len(text.strip()) == 0:
+            raise TaborClientException("Failed to read counts, empty response")
+        # The counts may be separated by commas and/or whitespace (and end with a newline)
+        try:
+            counts = np.array(re.split(r"[,\s]+", text.strip()), dtype=np.int64)
+        except ValueError as ex:
+            raise TaborClientException(f"Failed to read counts: {text}") from ex
+        if counts.size % (reads or 1) != 0:
+            raise TaborClientException(f"Failed to read counts: {text}")
+        if reads is not None:
+            return counts.reshape(reads, -1)
+        return counts
+
     def counter_read(
         self,
         *channels: int,
-    ) -> List[int]:
-        rslt = self.query(":DIG:PULS:COUN?")
-        assert "," in rslt, Exception(f"Failed to read: {rslt}")
-        rslt = rslt.strip()
-        counts = [int(v) for v in re.split(r"[\s,]+", rslt)]
+    ) -> np.ndarray:
+        """Reads the counts of the last counter window
+
+        Args:
+            channels (int): The digitizer channels (1 based, as CH<n>). Defaults to
+                all channels.
+        """
+        counts = self.parse_counter_response(self.query(":DIG:PULS:COUN?"))
         if channels:
-            counts = [counts[c] for c in channels]
+            counts = counts[np.asarray(channels) - 1]
         return counts
 
+    def counter_read_many(
+        self,
+        reads: int,
+        *channels: int,
+    ) -> np.ndarray:
+        """Reads the counter multiple times in a single composed query
+
+        Args:
+            reads (int): The number of reads.
+            channels (int): The digitizer channels (1 based, as CH<n>). Defaults to
+                all channels.
+
+        Returns:
+            np.ndarray: The counts, (reads x channels).
+        """
+        rslt = self.query(*[":DIG:PULS:COUN?"] * reads, force_list=True)
+        counts = self.parse_counter_response(rslt, reads=reads)
+        if channels:
+            counts = counts[:, np.asarray(channels) - 1]
+        return counts
+
+    def counter_read_and_trigger(self) -> np.ndarray:
+        """Reads the counts of the last counter window and triggers the next
+        window, in a single round trip."""
+        rslt = self.query(":DIG:PULS:COUN?", ":DIG:PULS:TRIG:IMM", force_list=True)
+        return self.parse_counter_response(rslt[0])
+
     # endregion
 
     # region marker data
@@ -553,16 +1107,81 @@ class TaborClient:
 
     def marker_on(self, channel: int, marker: int):
         self.command(
-            self.marker_select(channel=channel, marker=marker, get_command=True),
+            *self.marker_select(channel=channel, marker=marker, get_command=True),
             ":MARK ON",
         )
 
     def marker_off(self, channel: int, marker: int):
         self.command(
-            self.marker_select(channel=channel, marker=marker, get_command=True),
+            *self.marker_select(channel=channel, marker=marker, get_command=True),
             ":MARK OFF",
         )
 
+    @tabor_synchronized
+    def write_marker_data(
+        self,
+        segment_id: int,
+        num_samples: int,
+        values: np.ndarray,
+        markers: Union[int, List[int]] = 1,
+        channel: int = None,
+        chunk_samples: int = 2**22,
+        progress: Callable[[int], None] = None,
+    ) -> int:
+        """Writes the marker data of a (defined) segment. The marker values are aligned
+        to the segment (see tabor_align_marker_values), packed (vectorized) and
+        streamed in chunks through the binary block path (:MARK:DATA).
+
+        Args:
+            segment_id (int): The paired waveform segment id.
+            num_samples (int): The segment length (in samples).
+            values (np.ndarray): The marker values per sample (num_samples,) or per
+                marker point, (markers x ...) for multiple markers.
+            markers (Union[int, List[int]], optional): The marker number(s). Defaults to 1.
+            channel (int, optional): Select this channel before writing. Defaults to None.
+            chunk_samples (int, optional): The number of segment samples packed per
+                chunk. Defaults to 2**22.
+            progress (Callable[[int], None], optional): Called with the number of bytes
+                written after each block. Defaults to None.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        config = self.device_config
+        markers = np.atleast_1d(markers)
+        values = np.asarray(values).reshape(len(markers), -1)
+        resolution = config.marker_resolution
+        step = resolution * config.markers_per_byte
+        assert num_samples % step == 0, ValueError(
+            f"The segment length must be a multiple of {step}"
+        )
+        assert values.shape[-1] in [num_samples, num_samples // resolution], ValueError(
+            f"Expected {num_samples} marker values (or {num_samples // resolution}"
+            f" points), found {values.shape[-1]}"
+        )
+        scale = 1 if values.shape[-1] == num_samples else resolution
+        chunk_samples = max(step, chunk_samples // step * step)
+
+        def chunks():
+            for start in range(0, num_samples, chunk_samples):
+                end = min(start + chunk_samples, num_samples)
+                points = tabor_align_marker_values(
+                    values[:, start // scale : end // scale], end - start, config
+                )
+                yield tabor_pack_marker_values(points, markers, config)
+
+        self.command(
+            f":{self.__channel_select_command} {channel}" if channel else None,
+            f":TRAC:SEL {segment_id}",
+        )
+        written = self.write_binary_chunks(":MARK:DATA", chunks(), progress=progress)
+
+        expected = num_samples // step
+        assert written == expected, TaborClientException(
+            f"Segment {segment_id}: expected {expected} bytes of marker data, got {written}"
+        )
+        return written
+
     # endregion
 
 
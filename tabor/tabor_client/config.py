@@ -1,3 +1,4 @@
+from typing import Dict, List
 from tabor.tabor_client.consts import (
     TABOR_SEGMENT_MIN_LENGTH,
     TABOR_SEGMENT_MIN_SIZE_STEP,
@@ -21,6 +22,18 @@ class TaborDeviceConfig:
     segment_min_length = TABOR_SEGMENT_MIN_LENGTH
     segment_min_size_step = TABOR_SEGMENT_MIN_SIZE_STEP
 
+    # DEVICE CAPABILITIES (None = unknown, set by the device probe)
+    min_freq: float = None
+    max_freq: float = None
+    channels: List[int] = None
+    """The usable channels at the configured frequency"""
+    channel_segment_ids: List[int] = None
+    """The default segment id per channel (channels sharing a memory bank get different ids)"""
+    bank_memory: Dict[int, int] = None
+    """The free waveform memory (bytes), by the first channel of each memory bank"""
+    sampling_modes: Dict[str, float] = None
+    """The DAC modes (M0=16 bit, M1=8 bit) and their max sampling frequency"""
+
     @property
     def data_bits(self) -> int:
         return 16 if self.dac_is_16_bit else 8
@@ -33,6 +46,30 @@ class TaborDeviceConfig:
     def binary_data_type(self) -> str:
         return "H" if self.dac_is_16_bit else "b"
 
+    @property
+    def marker_resolution(self) -> int:
+        """The number of waveform samples per marker point"""
+        return 2 if self.dac_is_16_bit else 4
+
+    @property
+    def markers_per_byte(self) -> int:
+        """The number of marker points (4 bit, one bit per marker) per data byte"""
+        return 1 if self.dac_is_16_bit else 2
+
+    @property
+    def segment_max_length(self) -> int:
+        """The max segment length (in samples) that fits a memory bank, None if unknown"""
+        if not self.bank_memory:
+            return None
+        return min(self.bank_memory.values()) * 8 // self.data_bits
+
+    def memory_bank(self, channel: int) -> int:
+        """The memory bank (its first channel) of a channel, None if bank_memory is unknown"""
+        if not self.bank_memory:
+            return None
+        banks = [b for b in sorted(self.bank_memory) if b <= int(channel)]
+        return banks[-1] if len(banks) > 0 else min(self.bank_memory)
+
     @classmethod
     def set_as_global_default(cls, config: "TaborDeviceConfig" = None):
         tabor_set_default_device_config(config or cls())
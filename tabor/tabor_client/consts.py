@@ -4,3 +4,25 @@ TABOR_SEGMENT_MIN_LENGTH = int(os.environ.get("TABOR_SEGMENT_MIN_LENGTH", 1024))
 TABOR_SEGMENT_MIN_SIZE_STEP = int(os.environ.get("TABOR_SEGMENT_MIN_SIZE_STEP", 32))
 TABOR_SEGMENT_VOLT_MIN = float(os.environ.get("TABOR_SEGMENT_VOLT_MIN", -10))
 TABOR_SEGMENT_VOLT_MAX = float(os.environ.get("TABOR_SEGMENT_VOLT_MAX", 10))
+TABOR_PROFILE_CACHE_PATH = os.environ.get(
+    "TABOR_PROFILE_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".tabor_client", "device_profiles.json"),
+)
+
+# API gateway
+TABOR_API_HOSTS = [
+    h.strip() for h in os.environ.get("TABOR_API_HOSTS", "").split(",") if h.strip()
+]
+TABOR_API_QUEUE_SIZE = int(os.environ.get("TABOR_API_QUEUE_SIZE", 64))
+TABOR_API_REQUEST_TIMEOUT = float(os.environ.get("TABOR_API_REQUEST_TIMEOUT", 30))
+TABOR_API_UPLOAD_TIMEOUT = float(os.environ.get("TABOR_API_UPLOAD_TIMEOUT", 3600))
+
+# Scan pattern cache
+TABOR_SCAN_CACHE_PATH = os.environ.get(
+    "TABOR_SCAN_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".tabor_client", "scan_patterns"),
+)
+TABOR_SCAN_CACHE_MAX_BYTES = int(
+    os.environ.get("TABOR_SCAN_CACHE_MAX_BYTES", 4 * 2**30)
+)
+TABOR_SCAN_CACHE_MAX_ENTRIES = int(os.environ.get("TABOR_SCAN_CACHE_MAX_ENTRIES", 8))
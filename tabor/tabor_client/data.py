@@ -1,5 +1,6 @@
 from enum import Enum
 import math
+import numpy as np
 from typing import List, Union
 from tabor.tabor_client.config import (
     TABOR_DEFAULT_DEVICE_CONFIG,
@@ -11,6 +12,108 @@ from tabor.tabor_client.consts import (
 )
 
 
+def tabor_to_dac_values(
+    values: np.ndarray,
+    device_config: TaborDeviceConfig = None,
+) -> np.ndarray:
+    """Converts voltage values to DAC values (vectorized), clipped to the
+    device voltage range.
+
+    Args:
+        values (np.ndarray): The voltage values.
+        device_config (TaborDeviceConfig, optional): The device config. Defaults
+            to TABOR_DEFAULT_DEVICE_CONFIG.
+
+    Returns:
+        np.ndarray: The DAC values, uint16 or uint8 by the DAC mode.
+    """
+    config = device_config or TABOR_DEFAULT_DEVICE_CONFIG
+    min_value = config.min_voltage_out
+    max_value = config.max_voltage_out
+    assert max_value >= min_value, ValueError(
+        "max_value must be larger or equal to min_value"
+    )
+    values = np.clip(np.asarray(values, dtype=np.float64), min_value, max_value)
+    dac = (values - min_value) * (config.dac_range / (max_value - min_value))
+    return dac.astype(np.uint16 if config.dac_is_16_bit else np.uint8)
+
+
+def tabor_align_marker_values(
+    values: np.ndarray,
+    num_samples: int,
+    device_config: TaborDeviceConfig = None,
+) -> np.ndarray:
+    """Aligns marker values to a waveform segment, returning the marker points (one
+    per marker_resolution samples). A point is high if any of its samples is high.
+
+    Args:
+        values (np.ndarray): The marker values, per waveform sample (..., num_samples)
+            or already per marker point (..., num_samples / marker_resolution).
+        num_samples (int): The paired waveform segment length.
+        device_config (TaborDeviceConfig, optional): The device config. Defaults
+            to TABOR_DEFAULT_DEVICE_CONFIG.
+
+    Returns:
+        np.ndarray: The marker points (bool), (..., num_samples / marker_resolution).
+    """
+    config = device_config or TABOR_DEFAULT_DEVICE_CONFIG
+    resolution = config.marker_resolution
+    assert num_samples % (resolution * config.markers_per_byte) == 0, ValueError(
+        f"The segment length must be a multiple of {resolution * config.markers_per_byte}"
+    )
+    values = np.asarray(values) > 0
+    points = num_samples // resolution
+    if values.shape[-1] == points:
+        return values
+    assert values.shape[-1] == num_samples, ValueError(
+        f"Expected {num_samples} marker values (or {points} points), "
+        f"found {values.shape[-1]}"
+    )
+    aligned = values[..., ::resolution].copy()
+    for offset in range(1, resolution):
+        aligned |= values[..., offset::resolution]
+    return aligned
+
+
+def tabor_pack_marker_values(
+    points: np.ndarray,
+    markers: Union[int, List[int]] = 1,
+    device_config: TaborDeviceConfig = None,
+) -> np.ndarray:
+    """Packs marker points to the device marker data (vectorized). Each point is 4
+    bits, marker m is bit (m - 1). In 8 bit DAC mode two points are packed per byte
+    (the first in the low nibble).
+
+    Args:
+        points (np.ndarray): The marker points (see tabor_align_marker_values), (points,)
+            for a single marker or (markers x points).
+        markers (Union[int, List[int]], optional): The marker number(s) (1-4) of the
+            points. Defaults to 1.
+        device_config (TaborDeviceConfig, optional): The device config. Defaults
+            to TABOR_DEFAULT_DEVICE_CONFIG.
+
+    Returns:
+        np.ndarray: The marker data bytes (uint8).
+    """
+    config = device_config or TABOR_DEFAULT_DEVICE_CONFIG
+    markers = np.atleast_1d(markers)
+    assert np.all((markers > 0) & (markers < 5)), ValueError(
+        f"Markers {markers} out of range, 1-4"
+    )
+    points = np.asarray(points).reshape(len(markers), -1)
+    assert points.shape[-1] % config.markers_per_byte == 0, ValueError(
+        f"The number of marker points must be a multiple of {config.markers_per_byte}"
+    )
+
+    nibbles = np.zeros(points.shape[-1], dtype=np.uint8)
+    for marker, values in zip(markers, points):
+        nibbles |= (values > 0).view(np.uint8) << np.uint8(marker - 1)
+
+    if config.markers_per_byte == 1:
+        return nibbles
+    return nibbles[0::2] | (nibbles[1::2] << np.uint8(4))
+
+
 class TaborDataSegment(dict):
     def __init__(
         self,
@@ -88,22 +191,32 @@ class TaborDataSegment(dict):
             seg_len += step_size - leftover
         return seg_len
 
-    def to_segment_values(self, values: List[float] = None):
+    def to_segment_values(
+        self,
+        values: List[float] = None,
+        device_config: TaborDeviceConfig = None,
+    ):
         """Returns the data values as tabor proper segment values
 
+        Args:
+            values (List[float], optional): The values to use. Defaults to the segment values.
+            device_config (TaborDeviceConfig, optional): The device config for the min length
+                and granularity. Defaults to the segment config.
+
         Returns:
             List[float] as numbers: The values converted to tabore
                 digestable range
         """
+        config = device_config or self.config
         vals = list(values or self.get_values())
         vals_len = len(vals)
 
-        if vals_len < self.config.segment_min_length:
-            vals_len = self.config.segment_min_length
+        if vals_len < config.segment_min_length:
+            vals_len = config.segment_min_length
 
         # Adjust to step size
         vals_len = self.ceil_to_segment_step_size(
-            vals_len, self.config.segment_min_size_step
+            vals_len, config.segment_min_size_step
         )
 
         # Add the padding
@@ -121,7 +234,7 @@ class TaborDataSegment(dict):
         device_config: TaborDeviceConfig = None,
         values: List[float] = None,
     ):
-        values = self.to_segment_values(values)
+        values = self.to_segment_values(values, device_config)
         if self.is_binary:
             return [1 if val > 0 else 0 for val in values]
 
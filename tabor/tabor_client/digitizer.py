@@ -0,0 +1,391 @@
+import time
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from tabor.tabor_client.client import TaborClient
+from tabor.tabor_client.exceptions import TaborClientException
+
+
+class TaborDigitizerStatus(dict):
+    """The acquisition status (:DIG:ACQ:STAT?)"""
+
+    def __init__(self, rsp: str) -> None:
+        super().__init__()
+        values = [int(float(v)) for v in rsp.strip().split(",")]
+        assert len(values) == 4, TaborClientException(
+            f"Invalid digitizer status response: {rsp}"
+        )
+        self["frame_done"] = values[0] == 1
+        self["all_frames_done"] = values[1] == 1
+        self["counter_busy"] = values[2] == 1
+        self["frames_count"] = values[3]
+
+    @property
+    def frame_done(self) -> bool:
+        return self.get("frame_done", False)
+
+    @property
+    def all_frames_done(self) -> bool:
+        return self.get("all_frames_done", False)
+
+    @property
+    def counter_busy(self) -> bool:
+        return self.get("counter_busy", False)
+
+    @property
+    def frames_count(self) -> int:
+        return self.get("frames_count", 0)
+
+
+class TaborDigitizer:
+    FRAME_HEADER_SIZE = 72
+    """The size (bytes) of the frame header, as read with :DIG:DATA:TYPE BOTH"""
+
+    FRAME_HEADER_DTYPE = np.dtype(
+        {
+            "names": [
+                "trigger_pos",
+                "gate_address",
+                "min_level",
+                "max_level",
+                "timestamp",
+            ],
+            "formats": ["<u4", "<u4", "<i4", "<i4", "<u8"],
+            "offsets": [0, 4, 8, 12, 16],
+            "itemsize": FRAME_HEADER_SIZE,
+        }
+    )
+    """The frame header, as in the Proteus vendor examples (32 bit fields, the min
+    and max ADC levels of the frame in separate fields, followed by the 64 bit
+    timestamp). The rest of the header holds the DSP decision results. Note the
+    programming manual (Rev 1.4, :DIG:DATA:TYPE) describes an older layout with
+    12 bit packed levels."""
+
+    SAMPLE_DTYPES = {"U16": "<u2", "F32": "<f4", "F64": "<f8"}
+
+    def __init__(
+        self,
+        client: TaborClient,
+        channels: List[int] = None,
+        frames: int = 1,
+        frame_length: int = 4800,
+        sampling_rate: float = None,
+        single_channel: bool = False,
+        voltage_range: str = "HIGH",
+        trigger_source: str = "CPU",
+        trigger_level: float = 0.0,
+        trigger_slope: str = "POS",
+        pretrigger: int = 0,
+        ddc_frequency: float = None,
+        ddc_decimation: int = 16,
+        data_format: str = "U16",
+        digitizer: int = None,
+    ) -> None:
+        """Frame acquisition with a proteus digitizer. The digitizer captures frames
+        (of frame_length samples) to the device memory, which are then read as binary
+        blocks (frame data followed by its header) directly into numpy arrays of
+        frame_dtype, i.e. frames["data"] and frames["header"] are views.
+
+        Args:
+            client (TaborClient): The tabor client.
+            channels (List[int], optional): The digitizer channels. Defaults to [1].
+            frames (int, optional): The number of frames in the device memory. Defaults to 1.
+            frame_length (int, optional): The frame length in samples, a multiple of 48
+                (dual channel) or 96 (single channel). Defaults to 4800.
+            sampling_rate (float, optional): The digitizer sampling rate (Sa/s). Defaults
+                to None (device setting).
+            single_channel (bool, optional): Use the single channel (double rate) mode.
+                Defaults to False.
+            voltage_range (str, optional): HIGH, MED or LOW. Defaults to "HIGH".
+            trigger_source (str, optional): CPU, EXT, CH1, CH2, TASK[n] ... Defaults to "CPU".
+            trigger_level (float, optional): The external trigger level (volts). Defaults to 0.0.
+            trigger_slope (str, optional): POS or NEG. Defaults to "POS".
+            pretrigger (int, optional): The pre trigger length (samples). Defaults to 0.
+            ddc_frequency (float, optional): If set, the data is down converted (complex mode)
+                with this carrier frequency. Defaults to None.
+            ddc_decimation (int, optional): The complex mode decimation (4 or 16). Defaults to 16.
+            data_format (str, optional): U16, F32 or F64 (real mode). Defaults to "U16".
+            digitizer (int, optional): The digitizer (module) to select. Defaults to None.
+        """
+        self.client = client
+        self.channels = channels or [1]
+        self.frames = frames
+        self.frame_length = frame_length
+        self.sampling_rate = sampling_rate
+        self.single_channel = single_channel
+        self.voltage_range = voltage_range
+        self.trigger_source = trigger_source
+        self.trigger_level = trigger_level
+        self.trigger_slope = trigger_slope
+        self.pretrigger = pretrigger
+        self.ddc_frequency = ddc_frequency
+        self.ddc_decimation = ddc_decimation
+        self.data_format = data_format
+        self.digitizer = digitizer
+
+        self.validate()
+
+    @property
+    def is_complex(self) -> bool:
+        return self.ddc_frequency is not None
+
+    @property
+    def granularity(self) -> int:
+        """The frame length (and pre trigger) granularity in samples"""
+        return 96 if self.single_channel else 48
+
+    @property
+    def samples_per_frame(self) -> int:
+        """The number of data samples read per frame"""
+        if self.is_complex:
+            return self.frame_length // self.ddc_decimation
+        return self.frame_length
+
+    @property
+    def sample_dtype(self) -> np.dtype:
+        if self.is_complex:
+            # I/Q packed in 32 bit words
+            return np.dtype("<u4")
+        return np.dtype(self.SAMPLE_DTYPES[self.data_format])
+
+    @property
+    def frame_dtype(self) -> np.dtype:
+        """A single frame as read from the device, data followed by the header"""
+        return np.dtype(
+            [
+                ("data", self.sample_dtype, (self.samples_per_frame,)),
+                ("header", self.FRAME_HEADER_DTYPE),
+            ]
+        )
+
+    def validate(self):
+        assert len(self.channels) > 0, ValueError("At least one channel is required")
+        assert not self.single_channel or self.channels == [1], ValueError(
+            "Only channel 1 can be used in single channel mode"
+        )
+        assert all(c in [1, 2] for c in self.channels), ValueError(
+            f"Invalid digitizer channels {self.channels}"
+        )
+        assert self.frames > 0, ValueError("frames must be > 0")
+        assert (
+            self.frame_length > 0 and self.frame_length % self.granularity == 0
+        ), ValueError(f"frame_length must be a multiple of {self.granularity}")
+        assert self.pretrigger % self.granularity == 0, ValueError(
+            f"pretrigger must be a multiple of {self.granularity}"
+        )
+        assert self.data_format in self.SAMPLE_DTYPES, ValueError(
+            f"data_format must be one of {list(self.SAMPLE_DTYPES.keys())}"
+        )
+        assert not self.is_complex or self.ddc_decimation in [4, 16], ValueError(
+            "ddc_decimation must be 4 or 16"
+        )
+
+    def __select_command(self) -> List[str]:
+        if self.digitizer is None:
+            return []
+        return [f":DIG DIG{self.digitizer}"]
+
+    def configure(self):
+        """Configures the digitizer and allocates the frames memory"""
+        self.validate()
+        cmnd_list = self.__select_command() + [
+            ":DIG:INIT OFF",
+            f":DIG:MODE {'SING' if self.single_channel else 'DUAL'}",
+        ]
+        if self.sampling_rate is not None:
+            cmnd_list.append(f":DIG:FREQ {self.sampling_rate}")
+
+        if self.is_complex:
+            cmnd_list += [":DIG:DDC:MODE COMP", f":DIG:DDC:DEC X{self.ddc_decimation}"]
+        else:
+            cmnd_list += [":DIG:DDC:MODE REAL", f":DIG:DATA:FORM {self.data_format}"]
+
+        for channel in self.channels:
+            cmnd_list += [
+                f":DIG:CHAN CH{channel}",
+                ":DIG:CHAN:STAT ENAB",
+                f":DIG:CHAN:RANG {self.voltage_range}",
+                f":DIG:TRIG:SOUR {self.trigger_source}",
+            ]
+            if self.is_complex:
+                cmnd_list.append(f":DIG:DDC:CFR{channel} {self.ddc_frequency}")
+
+        cmnd_list += [
+            ":DIG:TRIG:TYPE EDGE",
+            f":DIG:TRIG:LEV1 {self.trigger_level}",
+            f":DIG:TRIG:SLOP {self.trigger_slope}",
+            f":DIG:PRET {self.pretrigger}",
+            f":DIG:ACQ:DEF {self.frames},{self.frame_length}",
+        ]
+        return self.client.command(*cmnd_list)
+
+    def free(self):
+        """Frees the frames memory (shared with the AWG segments)"""
+        return self.client.command(*self.__select_command(), ":DIG:ACQ:FREE")
+
+    # region Capture
+
+    def arm(self, first: int = 1, count: int = None):
+        """Starts capturing frames [first, first + count) (1 based)
+
+        Args:
+            first (int, optional): The first frame. Defaults to 1.
+            count (int, optional): The number of frames. Defaults to all frames from first.
+        """
+        count = count or self.frames - first + 1
+        assert first >= 1 and first + count - 1 <= self.frames, ValueError(
+            f"Frames [{first}, {first + count}) out of range (1-{self.frames})"
+        )
+        return self.client.command(
+            *self.__select_command(),
+            ":DIG:INIT OFF",
+            f":DIG:ACQ:CAPT {first},{count}",
+            ":DIG:INIT ON",
+        )
+
+    def stop(self):
+        return self.client.command(*self.__select_command(), ":DIG:INIT OFF")
+
+    def trigger(self, count: int = 1):
+        """Triggers count frames (trigger_source=CPU), in a single command"""
+        return self.client.command(*self.__select_command(), *[":DIG:TRIG:IMM"] * count)
+
+    def status(self) -> TaborDigitizerStatus:
+        return TaborDigitizerStatus(
+            self.client.query(*self.__select_command(), ":DIG:ACQ:STAT?")
+        )
+
+    def wait(self, timeout: float = 10, interval: float = 1e-3) -> TaborDigitizerStatus:
+        """Waits for all the armed frames to be captured
+
+        Args:
+            timeout (float, optional): The timeout in seconds. Defaults to 10.
+            interval (float, optional): The status polling interval. Defaults to 1e-3.
+        """
+        start = time.monotonic()
+        while True:
+            status = self.status()
+            if status.all_frames_done:
+                return status
+            if time.monotonic() - start > timeout:
+                raise TaborClientException(
+                    f"Digitizer capture timed out after {timeout} [sec],"
+                    f" {status.frames_count} frames captured"
+                )
+            time.sleep(interval)
+
+    # endregion
+
+    # region Readout
+
+    def allocate(self, count: int = None) -> np.ndarray:
+        """Allocates a frames buffer, (channels x count) of frame_dtype"""
+        return np.empty((len(self.channels), count or self.frames), self.frame_dtype)
+
+    def read_frames(
+        self,
+        first: int = 1,
+        count: int = None,
+        out: np.ndarray = None,
+    ) -> np.ndarray:
+        """Reads captured frames [first, first + count) of all channels. The binary
+        blocks are read directly into the (preallocated) frames buffer.
+
+        Args:
+            first (int, optional): The first frame (1 based). Defaults to 1.
+            count (int, optional): The number of frames. Defaults to all frames from first.
+            out (np.ndarray, optional): The frames buffer (see allocate). Defaults to None.
+
+        Returns:
+            np.ndarray: The frames, (channels x count) of frame_dtype.
+        """
+        count = count or self.frames - first + 1
+        if out is None:
+            out = self.allocate(count)
+        assert out.dtype == self.frame_dtype and out.shape == (
+            len(self.channels),
+            count,
+        ), ValueError(
+            f"Expected a frames buffer of {(len(self.channels), count)} {self.frame_dtype}"
+        )
+
+        with self.client.lock:
+            for idx, channel in enumerate(self.channels):
+                self.client.command(
+                    *self.__select_command(),
+                    f":DIG:CHAN CH{channel}",
+                    ":DIG:DATA:SEL FRAM",
+                    ":DIG:DATA:TYPE BOTH",
+                    f":DIG:DATA:FRAM {first},{count}",
+                )
+                self.client.read_binary_into(":DIG:DATA:READ?", out[idx])
+        return out
+
+    def acquire(self, out: np.ndarray = None, timeout: float = 10) -> np.ndarray:
+        """Captures and reads all frames"""
+        self.arm()
+        if self.trigger_source == "CPU":
+            self.trigger(self.frames)
+        self.wait(timeout=timeout)
+        self.stop()
+        return self.read_frames(out=out)
+
+    def stream(
+        self,
+        blocks: int = None,
+        timeout: float = 10,
+    ) -> Iterator[np.ndarray]:
+        """Continuous acquisition, the device memory is split into two halves which are
+        captured and read alternately, so a block is read while the next block is
+        captured. The yielded buffers are reused, a block is valid until the next
+        block is requested.
+
+        Args:
+            blocks (int, optional): The number of blocks to read. Defaults to None (forever).
+            timeout (float, optional): The capture timeout of a block. Defaults to 10.
+
+        Yields:
+            np.ndarray: The frames of a block, (channels x frames // 2).
+        """
+        assert self.frames >= 2, ValueError("Streaming requires at least 2 frames")
+        half = self.frames // 2
+        ranges = [(1, half), (half + 1, half)]
+        buffers = [self.allocate(half), self.allocate(half)]
+
+        def capture(idx: int):
+            self.arm(*ranges[idx])
+            if self.trigger_source == "CPU":
+                self.trigger(half)
+
+        block = 0
+        capture(0)
+        try:
+            while blocks is None or block < blocks:
+                idx = block % 2
+                self.wait(timeout=timeout)
+                if blocks is None or block + 1 < blocks:
+                    # Capture the next block to the other half, while reading this one.
+                    capture(1 - idx)
+                yield self.read_frames(*ranges[idx], out=buffers[idx])
+                block += 1
+        finally:
+            self.stop()
+
+    @classmethod
+    def parse_headers(cls, headers: np.ndarray) -> Dict[str, np.ndarray]:
+        """Parses (vectorized) frame headers, e.g. frames["header"]
+
+        Returns:
+            Dict[str, np.ndarray]: trigger_pos, gate_address, min_level, max_level
+                and timestamp (device clock ticks).
+        """
+        return {
+            "trigger_pos": headers["trigger_pos"].astype(np.int64),
+            "gate_address": headers["gate_address"].astype(np.int64),
+            "min_level": headers["min_level"].astype(np.int64),
+            "max_level": headers["max_level"].astype(np.int64),
+            "timestamp": headers["timestamp"].astype(np.uint64),
+        }
+
+    # endregion
@@ -2,6 +2,14 @@ class TaborClientException(Exception):
     pass
 
 
+class TaborClientWorkerBusyException(TaborClientException):
+    pass
+
+
+class TaborClientWorkerTimeoutException(TaborClientException):
+    pass
+
+
 class TaborClientSocketException(TaborClientException):
     def __init__(
         self,
@@ -0,0 +1,89 @@
+import threading
+from collections import deque
+from functools import wraps
+
+
+class TaborClientLock:
+    """A reentrant lock that is granted in FIFO order (first come first served).
+
+    Used to serialize the requests to a single instrument. The lock can be
+    held across a multi-step sequence,
+
+    with client.lock:
+        client.command(...)
+        client.write_binary(...)
+    """
+
+    def __init__(self) -> None:
+        self.__cond = threading.Condition(threading.Lock())
+        self.__owner: int = None
+        self.__depth = 0
+        self.__waiting = deque()
+
+    @property
+    def is_locked(self) -> bool:
+        return self.__owner is not None
+
+    @property
+    def is_owned(self) -> bool:
+        """True if the lock is held by the current thread"""
+        return self.__owner == threading.get_ident()
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        me = threading.get_ident()
+        with self.__cond:
+            if self.__owner == me:
+                self.__depth += 1
+                return True
+
+            if self.__owner is None and len(self.__waiting) == 0:
+                self.__owner = me
+                self.__depth = 1
+                return True
+
+            if not blocking:
+                return False
+
+            self.__waiting.append(me)
+            acquired = self.__cond.wait_for(
+                lambda: self.__owner is None and self.__waiting[0] == me,
+                timeout=None if timeout < 0 else timeout,
+            )
+            if not acquired:
+                self.__waiting.remove(me)
+                # The next in line may now be first.
+                self.__cond.notify_all()
+                return False
+
+            self.__waiting.popleft()
+            self.__owner = me
+            self.__depth = 1
+            return True
+
+    def release(self):
+        with self.__cond:
+            assert self.__owner == threading.get_ident(), RuntimeError(
+                "Cannot release a lock that is not owned by the current thread"
+            )
+            self.__depth -= 1
+            if self.__depth == 0:
+                self.__owner = None
+                self.__cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+def tabor_synchronized(func):
+    """Decorator, runs the method while holding the object lock (self.lock)"""
+
+    @wraps(func)
+    def synchronized(self, *args, **kwargs):
+        with self.lock:
+            return func(self, *args, **kwargs)
+
+    return synchronized
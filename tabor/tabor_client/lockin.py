@@ -0,0 +1,165 @@
+from typing import Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from tabor.tabor_client.data import TaborDataSegment
+
+
+class TaborLockIn:
+    def __init__(
+        self,
+        frequency: float,
+        sampling_rate: float,
+        phase: float = 0.0,
+        decimation: int = 16,
+        cutoff: float = None,
+        taps: int = None,
+    ) -> None:
+        """A streaming digital lock-in. The input is mixed with the reference
+        cos(2 pi f t + phase), low pass filtered (windowed sinc FIR) and decimated,
+        only the decimated outputs are computed. The reference phase, the filter
+        history and the decimation offset are kept across blocks, so a continuous
+        stream can be processed in blocks of any size.
+
+        Args:
+            frequency (float): The reference frequency (Hz).
+            sampling_rate (float): The input sampling rate (Sa/s).
+            phase (float, optional): The reference phase (radians). Defaults to 0.0.
+            decimation (int, optional): The output decimation. Defaults to 16.
+            cutoff (float, optional): The low pass cutoff (Hz). Defaults to half the
+                output rate.
+            taps (int, optional): The number of FIR taps. Defaults to 8 * decimation + 1.
+        """
+        self.frequency = frequency
+        self.sampling_rate = sampling_rate
+        self.phase = phase
+        self.decimation = decimation
+        self.cutoff = cutoff or sampling_rate / decimation / 2
+        self.taps = taps or 8 * decimation + 1
+
+        assert 0 < self.cutoff < sampling_rate / 2, ValueError(
+            "cutoff must be between 0 and the nyquist frequency"
+        )
+        self.kernel = self.design_lowpass(self.cutoff / self.sampling_rate, self.taps)[
+            ::-1
+        ]
+
+        self.reset()
+
+    @classmethod
+    def design_lowpass(cls, cutoff: float, taps: int) -> np.ndarray:
+        """A hamming windowed sinc low pass with unit DC gain
+
+        Args:
+            cutoff (float): The cutoff frequency, normalized to the sampling rate.
+            taps (int): The number of taps.
+        """
+        n = np.arange(taps) - (taps - 1) / 2
+        kernel = np.sinc(2 * cutoff * n) * np.hamming(taps)
+        return kernel / kernel.sum()
+
+    @classmethod
+    def from_segment(
+        cls,
+        segment: TaborDataSegment,
+        sampling_rate: float,
+        delay: float = 0.0,
+        **kwargs,
+    ) -> "TaborLockIn":
+        """Creates a lock-in with the reference of a generated (looped) segment, the
+        frequency and phase of its strongest harmonic (the segment length is a whole
+        number of periods, so the harmonic falls on an fft bin).
+
+        Args:
+            segment (TaborDataSegment): The generated segment, e.g. TaborFunctionSegment.
+            sampling_rate (float): The digitizer sampling rate.
+            delay (float, optional): The delay (seconds) between the segment start and the
+                digitizer input start. Defaults to 0.0.
+        """
+        values = np.asarray(segment.get_values(), dtype=np.float64)
+        assert len(values) > 2, ValueError("The segment is too short")
+        spectrum = np.fft.rfft(values - values.mean())
+        harmonic = int(np.argmax(np.abs(spectrum[1:]))) + 1
+        frequency = harmonic * segment.config.freq / len(values)
+        phase = np.angle(spectrum[harmonic]) - 2 * np.pi * frequency * delay
+        return cls(frequency, sampling_rate, phase=phase, **kwargs)
+
+    @property
+    def output_rate(self) -> float:
+        return self.sampling_rate / self.decimation
+
+    def reset(self):
+        self.__cycle = 0.0
+        """The reference phase (in cycles) at the next input sample"""
+        self.__history: np.ndarray = None
+        """The last (taps - 1) mixed samples"""
+        self.__offset = 0
+        """The index (in the next block) of the next output sample"""
+        self.__samples = 0
+        """The total number of input samples"""
+
+    def mix(self, samples: np.ndarray) -> np.ndarray:
+        """Mixes a block with the reference (continuing the reference phase)"""
+        n = samples.shape[-1]
+        cycles = self.__cycle + np.arange(n) * (self.frequency / self.sampling_rate)
+        self.__cycle = (self.__cycle + n * self.frequency / self.sampling_rate) % 1
+        return samples * np.exp(-1j * (2 * np.pi * cycles + self.phase))
+
+    def process(self, samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Demodulates the next block of the stream
+
+        Args:
+            samples (np.ndarray): The block, (..., samples), e.g. (channels x samples).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: The output times (seconds from the
+                stream start), amplitude and phase (radians), (..., outputs).
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        mixed = self.mix(samples)
+
+        if self.__history is None:
+            self.__history = np.zeros(
+                (*mixed.shape[:-1], self.taps - 1), dtype=np.complex128
+            )
+        extended = np.concatenate([self.__history, mixed], axis=-1)
+        self.__history = extended[..., extended.shape[-1] - (self.taps - 1) :]
+
+        # Output sample i (block index) uses extended[i : i + taps]
+        windows = sliding_window_view(extended, self.taps, axis=-1)
+        windows = windows[..., self.__offset :: self.decimation, :]
+        filtered = windows @ self.kernel
+
+        outputs = filtered.shape[-1]
+        # The filter (linear phase) delays the output by (taps - 1) / 2 samples.
+        times = (
+            self.__samples
+            + self.__offset
+            + np.arange(outputs) * self.decimation
+            - (self.taps - 1) / 2
+        ) / self.sampling_rate
+        n = samples.shape[-1]
+        self.__offset = (self.__offset + outputs * self.decimation) - n
+        self.__samples += n
+
+        return times, 2 * np.abs(filtered), np.angle(filtered)
+
+    def process_frames(self, frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Demodulates independent (triggered) frames, each frame starts at the
+        reference phase and is averaged over its length. Does not change the stream
+        state.
+
+        Args:
+            frames (np.ndarray): The frames data, (..., frames, samples), e.g.
+                frames["data"] of TaborDigitizer.read_frames.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The amplitude and phase, (..., frames).
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        n = frames.shape[-1]
+        cycles = np.arange(n) * (self.frequency / self.sampling_rate)
+        reference = np.exp(-1j * (2 * np.pi * cycles + self.phase))
+        mean = (frames - frames.mean(axis=-1, keepdims=True)) @ reference / n
+        return 2 * np.abs(mean), np.angle(mean)
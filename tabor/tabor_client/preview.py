@@ -0,0 +1,255 @@
+import threading
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from tabor.tabor_client.log import log
+from tabor.tabor_client.scan import TaborScanImage
+
+
+class TaborLivePreview:
+    def __init__(
+        self,
+        frames: int = 8,
+        mode: str = "mean",
+        alpha: float = 0.25,
+        display_size: Tuple[int, int] = (256, 256),
+        max_rate: float = 10.0,
+    ) -> None:
+        """A live preview of scan images. Completed frames are kept in a ring of the
+        last frames and averaged incrementally (running mean over the ring, or
+        exponential). The display buffers, the min/max of the average over blocks of
+        pixels (so single bright pixels are not lost), are computed by a background
+        thread at up to max_rate and published to the listeners.
+
+        The frame update (called from the acquisition) only copies the frame into
+        the ring and updates the average, the display is computed outside of it (from
+        a snapshot of the average, so the binning does not block the update).
+
+        Args:
+            frames (int, optional): The number of frames in the ring (mean mode).
+                Defaults to 8.
+            mode (str, optional): The averaging, "mean" (over the ring) or "exp"
+                (exponential). Defaults to "mean".
+            alpha (float, optional): The exponential averaging weight of a new frame.
+                Defaults to 0.25.
+            display_size (Tuple[int, int], optional): The max display size (height, width).
+                Defaults to (256, 256).
+            max_rate (float, optional): The max display refresh rate (Hz). Defaults to 10.0.
+        """
+        assert mode in ["mean", "exp"], ValueError("mode must be mean or exp")
+        assert frames > 0, ValueError("frames must be positive")
+        assert 0 < alpha <= 1, ValueError("alpha must be in (0, 1]")
+        self.frames = frames
+        self.mode = mode
+        self.alpha = alpha
+        self.display_size = tuple(display_size)
+        self.max_rate = max_rate
+
+        self.frame: int = None
+        """The last frame number added"""
+        self.dropped = 0
+        """The number of refreshes skipped (frames added faster than max_rate)"""
+
+        self.__listeners: List[Callable[[int, np.ndarray, np.ndarray], None]] = []
+        self.__lock = threading.Lock()
+        self.__changed = threading.Event()
+        self.__stop = threading.Event()
+        self.__thread: threading.Thread = None
+        self.__shape: tuple = None
+        self.__display: Tuple[np.ndarray, np.ndarray] = None
+
+    # region Properties
+
+    @property
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    @property
+    def count(self) -> int:
+        """The number of frames in the average (mean mode)"""
+        return self.__filled if self.__shape is not None else 0
+
+    @property
+    def average(self) -> np.ndarray:
+        """A copy of the current average image, (height x width x channels)"""
+        with self.__lock:
+            return None if self.__shape is None else self.__average.copy()
+
+    @property
+    def display(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The last published display buffers (minimum, maximum), each
+        (display height x display width x channels)"""
+        return self.__display
+
+    # endregion
+
+    def add_listener(self, listener: Callable[[int, np.ndarray, np.ndarray], None]):
+        """Adds a listener, called (from the preview thread) with (frame, minimum,
+        maximum) on each refresh. The buffers are reused, copy to keep them."""
+        self.__listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[int, np.ndarray, np.ndarray], None]):
+        if listener in self.__listeners:
+            self.__listeners.remove(listener)
+
+    def reset(self):
+        with self.__lock:
+            self.__shape = None
+            self.frame = None
+
+    def __allocate(self, shape: tuple):
+        self.__shape = shape
+        self.__ring = np.zeros((self.frames, *shape))
+        self.__ring_valid = np.zeros((self.frames, *shape), dtype=bool)
+        self.__sums = np.zeros(shape)
+        self.__counts = np.zeros(shape, dtype=np.int64)
+        self.__average = np.full(shape, np.nan)
+        self.__snapshot = np.empty(shape)
+        self.__filled = 0
+        self.__next = 0
+
+        # The display blocks (reduceat starts) per axis
+        height, width = shape[:2]
+        self.__row_starts = self.__block_starts(height, self.display_size[0])
+        self.__col_starts = self.__block_starts(width, self.display_size[1])
+        display_shape = (len(self.__row_starts), len(self.__col_starts), *shape[2:])
+        self.__buffers = [
+            (np.empty(display_shape), np.empty(display_shape)) for _ in range(2)
+        ]
+        self.__front = 0
+
+    @classmethod
+    def __block_starts(cls, size: int, display: int) -> np.ndarray:
+        return np.arange(0, size, int(np.ceil(size / max(display, 1))))
+
+    def update(self, frame: int, image: np.ndarray):
+        """Adds a completed frame (e.g. a TaborScanImage listener)
+
+        Args:
+            frame (int): The frame number.
+            image (np.ndarray): The image (height x width [x channels]), nan where
+                there is no data.
+        """
+        image = np.asarray(image, dtype=np.float64)
+        if image.ndim == 2:
+            image = image[..., None]
+        with self.__lock:
+            if self.__shape != image.shape:
+                self.__allocate(image.shape)
+
+            valid = ~np.isnan(image)
+            if self.mode == "mean":
+                slot = self.__next
+                if self.__filled == self.frames:
+                    # Remove the oldest frame
+                    self.__sums -= self.__ring[slot]
+                    self.__counts -= self.__ring_valid[slot]
+                np.copyto(self.__ring[slot], np.where(valid, image, 0))
+                self.__ring_valid[slot] = valid
+                self.__sums += self.__ring[slot]
+                self.__counts += valid
+                self.__next = (slot + 1) % self.frames
+                self.__filled = min(self.__filled + 1, self.frames)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    np.divide(self.__sums, self.__counts, out=self.__average)
+            else:
+                empty = np.isnan(self.__average)
+                np.copyto(self.__average, image, where=valid & empty)
+                update = valid & ~empty
+                self.__average[update] += self.alpha * (
+                    image[update] - self.__average[update]
+                )
+                self.__filled = 1
+            self.frame = frame
+
+        if self.__changed.is_set():
+            self.dropped += 1
+        self.__changed.set()
+
+    def render(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Computes the display buffers (minimum, maximum) of the current average and
+        publishes them to the listeners. Called from the preview thread (not thread
+        safe with itself, the snapshot and display buffers are reused)."""
+        with self.__lock:
+            if self.__shape is None:
+                return None
+            self.__front = 1 - self.__front
+            minimum, maximum = self.__buffers[self.__front]
+            row_starts, col_starts = self.__row_starts, self.__col_starts
+            average = self.__snapshot
+            np.copyto(average, self.__average)
+            frame = self.frame
+
+        with np.errstate(invalid="ignore"):
+            np.fmin.reduceat(
+                np.fmin.reduceat(average, row_starts, axis=0),
+                col_starts,
+                axis=1,
+                out=minimum,
+            )
+            np.fmax.reduceat(
+                np.fmax.reduceat(average, row_starts, axis=0),
+                col_starts,
+                axis=1,
+                out=maximum,
+            )
+
+        self.__display = (minimum, maximum)
+        for listener in self.__listeners:
+            try:
+                listener(frame, minimum, maximum)
+            except Exception as ex:
+                log.error(f"Preview listener failed: {ex}")
+        return self.__display
+
+    # region Thread
+
+    def start(self):
+        if self.is_running:
+            return self
+        self.__stop.clear()
+        self.__thread = threading.Thread(
+            target=self.__run,
+            name="tabor-preview",
+            daemon=True,
+        )
+        self.__thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        self.__stop.set()
+        self.__changed.set()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+            self.__thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __run(self):
+        interval = 1 / self.max_rate
+        while not self.__stop.is_set():
+            self.__changed.wait()
+            if self.__stop.is_set():
+                return
+            self.__changed.clear()
+            try:
+                self.render()
+            except Exception as ex:
+                log.error(f"Preview render failed: {ex}")
+            # Cap the refresh rate
+            self.__stop.wait(interval)
+
+    # endregion
+
+    def attach(self, image: TaborScanImage):
+        """Adds the completed frames of a scan image"""
+        image.add_listener(self.update)
+        return self
+
+    def detach(self, image: TaborScanImage):
+        image.remove_listener(self.update)
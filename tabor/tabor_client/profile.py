@@ -0,0 +1,379 @@
+import json
+import os
+import re
+from typing import Dict, List, Tuple
+
+from tabor.tabor_client.config import (
+    TaborDefaultDeviceConfig,
+    TaborDeviceConfig,
+    TaborP9082DeviceConfig,
+)
+from tabor.tabor_client.consts import TABOR_PROFILE_CACHE_PATH
+from tabor.tabor_client.log import log
+
+
+def tabor_get_granularity(
+    model: str,
+    options: List[str],
+    dac_is_16_bit: bool = True,
+    allow_low_granularity: bool = False,
+) -> int:
+    """Returns the segment granularity (in samples) for a tabor model.
+    Ported from the vendor example (getGranularity).
+
+    Args:
+        model (str): The device model, e.g. P9484M
+        options (List[str]): The device options (*OPT?)
+        dac_is_16_bit (bool, optional): The DAC mode. Defaults to True.
+        allow_low_granularity (bool, optional): Use the low granularity of the
+            G1/G2 options. The vendor example currently disables this. Defaults to False.
+    """
+    low = allow_low_granularity and any(("G1" in o or "G2" in o) for o in options)
+
+    if "P948" in model and not dac_is_16_bit:
+        return 32 if low else 64
+    if "P908" in model:
+        return 32 if low else 64
+    return 16 if low else 32
+
+
+def tabor_get_channels(model: str, freq: float) -> Tuple[List[int], List[int]]:
+    """Returns the usable channels and their default segment ids for a tabor
+    model at a sampling frequency. Ported from the vendor example (GetChannels).
+
+    All models except the P908x share a memory bank between channel pairs, and
+    therefore the pair must use different segment ids.
+
+    Args:
+        model (str): The device model, e.g. P9484M
+        freq (float): The sampling frequency.
+
+    Returns:
+        Tuple[List[int], List[int]]: The channel list and the segment id list.
+    """
+    if "P908" in model:
+        count = int(model[4]) if len(model) > 4 and model[4].isdigit() else 2
+        return list(range(1, count + 1)), [1] * count
+
+    match = re.match(r"P(94|25|12)8(\d+)", model)
+    count = int(match.group(2)) if match else 2
+    if freq <= 2.5e9:
+        return list(range(1, count + 1)), [c % 2 + 1 for c in range(count)]
+    return list(range(1, count + 1, 2)), [1] * ((count + 1) // 2)
+
+
+def tabor_get_memory_banks(model: str, channels: int) -> List[int]:
+    """Returns the first channel of each waveform memory bank"""
+    if "P908" in model:
+        return list(range(1, channels + 1))
+    return list(range(1, channels + 1, 2))
+
+
+def tabor_get_memory_bank(model: str, channel: int) -> int:
+    """Returns the memory bank (its first channel) of a channel"""
+    channel = int(channel)
+    if "P908" in model:
+        return channel
+    return channel - (channel - 1) % 2
+
+
+class TaborDeviceProfile(dict):
+    """The capability profile of a tabor device. Collected in the connect
+    handshake and persisted (keyed by IDN) in the profile cache. The DAC mode can
+    be changed on the device and is therefore read on every connect."""
+
+    VERSION = 2
+
+    DAC_MODE_QUERY = ":SYST:INF:DAC?"
+
+    PROBE_QUERIES = [
+        ":SYST:INF:MOD?",
+        "*OPT?",
+        DAC_MODE_QUERY,
+        ":TRAC:FREE?",
+        ":FREQ:RAST? MIN",
+        ":FREQ:RAST? MAX",
+    ]
+
+    @property
+    def version(self) -> int:
+        return self.get("version", 1)
+
+    @version.setter
+    def version(self, val: int):
+        self["version"] = val
+
+    @property
+    def idn(self) -> str:
+        return self.get("idn", None)
+
+    @idn.setter
+    def idn(self, val: str):
+        self["idn"] = val
+
+    @property
+    def model(self) -> str:
+        return self.get("model", "any")
+
+    @model.setter
+    def model(self, val: str):
+        self["model"] = val
+
+    @property
+    def options(self) -> List[str]:
+        return self.get("options", [])
+
+    @options.setter
+    def options(self, val: List[str]):
+        self["options"] = list(val)
+
+    @property
+    def dac_is_16_bit(self) -> bool:
+        return self.get("dac_is_16_bit", True)
+
+    @dac_is_16_bit.setter
+    def dac_is_16_bit(self, val: bool):
+        self["dac_is_16_bit"] = val
+
+    def set_dac_mode(self, dac_mode: str) -> bool:
+        """Sets the DAC mode (the response to DAC_MODE_QUERY, M0 = 16 bit, M1 = 8 bit)
+        and the matching granularity. Returns True if the mode changed."""
+        dac_is_16_bit = dac_mode.strip().upper() != "M1"
+        changed = "dac_is_16_bit" not in self or dac_is_16_bit != self.dac_is_16_bit
+        self.dac_is_16_bit = dac_is_16_bit
+        self.granularity = tabor_get_granularity(
+            self.model,
+            self.options,
+            self.dac_is_16_bit,
+        )
+        return changed
+
+    @property
+    def granularity(self) -> int:
+        return self.get("granularity", None)
+
+    @granularity.setter
+    def granularity(self, val: int):
+        self["granularity"] = val
+
+    @property
+    def memory_size(self) -> int:
+        return self.get("memory_size", None)
+
+    @memory_size.setter
+    def memory_size(self, val: int):
+        self["memory_size"] = val
+
+    @property
+    def min_freq(self) -> float:
+        return self.get("min_freq", None)
+
+    @min_freq.setter
+    def min_freq(self, val: float):
+        self["min_freq"] = val
+
+    @property
+    def max_freq(self) -> float:
+        return self.get("max_freq", None)
+
+    @max_freq.setter
+    def max_freq(self, val: float):
+        self["max_freq"] = val
+
+    @property
+    def channel_count(self) -> int:
+        return self.get("channel_count", None)
+
+    @channel_count.setter
+    def channel_count(self, val: int):
+        self["channel_count"] = val
+
+    @property
+    def bank_memory(self) -> Dict[int, int]:
+        """The free memory by the first channel of each memory bank"""
+        return {int(k): v for k, v in self.get("bank_memory", {}).items()}
+
+    @bank_memory.setter
+    def bank_memory(self, val: Dict[int, int]):
+        self["bank_memory"] = {str(k): v for k, v in val.items()}
+
+    @property
+    def memory_banks(self) -> List[int]:
+        return tabor_get_memory_banks(self.model, self.channel_count or 0)
+
+    @property
+    def sampling_modes(self) -> Dict[str, float]:
+        """The DAC modes (M0=16 bit, M1=8 bit) and their max sampling frequency"""
+        max_freq = self.max_freq or 2.5e9
+        if "P908" in self.model:
+            return {"M1": max_freq}
+        if max_freq > 2.5e9:
+            return {"M0": 2.5e9, "M1": max_freq}
+        return {"M0": max_freq}
+
+    @property
+    def is_complete(self) -> bool:
+        """True if the profile holds all the probed values"""
+        return self.version == self.VERSION and len(self.bank_memory) > 0
+
+    @classmethod
+    def parse_memory_response(cls, rsp: str) -> int:
+        # The response may hold the biggest fragment and the total free memory.
+        memory = [int(float(v)) for v in re.split(r"[\s,]+", rsp.strip()) if v]
+        return max(memory) if memory else None
+
+    def bank_memory_queries(self, restore_channel: int = 1) -> List[str]:
+        """The queries reading the free memory of each memory bank
+
+        Args:
+            restore_channel (int, optional): The channel to select after the queries
+                (the selected channel before the probe). Defaults to 1.
+        """
+        queries = []
+        for channel in self.memory_banks:
+            queries += [f":INST:CHAN {channel}", ":TRAC:FREE?"]
+        return queries + [f":INST:CHAN {restore_channel}"]
+
+    @classmethod
+    def from_probe_response(cls, idn: str, rsp: List[str]) -> "TaborDeviceProfile":
+        """Creates the profile from the response to PROBE_QUERIES
+
+        Args:
+            idn (str): The device IDN (*IDN?)
+            rsp (List[str]): The responses, in the order of PROBE_QUERIES
+        """
+        assert len(rsp) == len(cls.PROBE_QUERIES), ValueError(
+            f"Expected {len(cls.PROBE_QUERIES)} probe responses, got {len(rsp)}"
+        )
+        [model, options, dac_mode, free_memory, min_freq, max_freq] = [
+            v.strip() for v in rsp
+        ]
+
+        profile = cls()
+        profile.version = cls.VERSION
+        profile.idn = idn.strip()
+        profile.model = model
+        profile.options = [o.strip() for o in options.split(",") if o.strip()]
+        profile.set_dac_mode(dac_mode)
+        profile.memory_size = cls.parse_memory_response(free_memory)
+        profile.min_freq = float(min_freq)
+        profile.max_freq = float(max_freq)
+        profile.channel_count = len(tabor_get_channels(model, 0)[0])
+        return profile
+
+    @classmethod
+    def from_idn(cls, idn: str, dac_mode: str = None) -> "TaborDeviceProfile":
+        """Creates a profile of the model (from the IDN) only, for devices that
+        could not be probed. Its device config is the model defaults.
+
+        Args:
+            idn (str): The device IDN (*IDN?), e.g. Tabor Electronics,P9484M,...
+            dac_mode (str, optional): The response to DAC_MODE_QUERY. Defaults to None.
+        """
+        profile = cls()
+        profile.idn = idn.strip()
+        parts = [p.strip() for p in idn.split(",")]
+        if len(parts) > 1 and parts[1]:
+            profile.model = parts[1]
+        if dac_mode:
+            profile.set_dac_mode(dac_mode)
+        return profile
+
+    def to_device_config(self) -> TaborDeviceConfig:
+        """Creates the device configuration matching this profile. The
+        frequency is the max frequency of the device DAC mode."""
+        if self.version != self.VERSION:
+            # Old (or not probed) profiles, fall back to the model defaults.
+            config = (
+                TaborP9082DeviceConfig()
+                if "P9082" in self.model
+                else TaborDefaultDeviceConfig()
+            )
+        else:
+            config = TaborDefaultDeviceConfig()
+            config.freq = self.sampling_modes.get(
+                "M0" if self.dac_is_16_bit else "M1",
+                config.freq,
+            )
+            config.min_freq = self.min_freq
+            config.max_freq = self.max_freq
+            config.channels, config.channel_segment_ids = tabor_get_channels(
+                self.model, config.freq
+            )
+            config.bank_memory = self.bank_memory or None
+            config.sampling_modes = self.sampling_modes
+
+        config.model = self.model
+        config.dac_is_16_bit = self.dac_is_16_bit
+        if self.granularity:
+            config.segment_min_size_step = self.granularity
+        return config
+
+
+class TaborDeviceProfileCache:
+    def __init__(self, path: str = TABOR_PROFILE_CACHE_PATH) -> None:
+        """A local file cache of device profiles, keyed by the device IDN.
+        The last IDN seen at each resource is kept as well, so that a reconnect
+        can pick the device profile before any query is sent.
+
+        Args:
+            path (str, optional): The cache file path. Defaults to TABOR_PROFILE_CACHE_PATH.
+        """
+        self.path = path
+        self.__profiles: Dict[str, TaborDeviceProfile] = None
+        self.__resources: Dict[str, str] = None
+
+    def __load(self):
+        if self.__profiles is not None:
+            return
+        self.__profiles = {}
+        self.__resources = {}
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, "r") as raw:
+                data = json.load(raw)
+            self.__profiles = {
+                k: TaborDeviceProfile(v) for k, v in data.get("profiles", {}).items()
+            }
+            self.__resources = dict(data.get("resources", {}))
+        except Exception as ex:
+            log.warning(f"Failed to load tabor device profiles from {self.path}: {ex}")
+
+    def save(self):
+        self.__load()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as raw:
+            json.dump(
+                {"profiles": self.__profiles, "resources": self.__resources},
+                raw,
+                indent=2,
+            )
+        os.replace(tmp_path, self.path)
+
+    def get(self, idn: str) -> TaborDeviceProfile:
+        self.__load()
+        return self.__profiles.get(idn.strip(), None)
+
+    def get_by_resource(self, resource_name: str) -> TaborDeviceProfile:
+        self.__load()
+        idn = self.__resources.get(resource_name, None)
+        return self.__profiles.get(idn, None) if idn else None
+
+    def set(self, profile: TaborDeviceProfile, resource_name: str = None):
+        """Adds (or replaces) a profile and saves the cache"""
+        self.__load()
+        self.__profiles[profile.idn] = profile
+        if resource_name:
+            self.__resources[resource_name] = profile.idn
+        try:
+            self.save()
+        except Exception as ex:
+            log.warning(f"Failed to save tabor device profiles to {self.path}: {ex}")
+
+    def clear(self):
+        self.__profiles = {}
+        self.__resources = {}
+        if os.path.isfile(self.path):
+            os.remove(self.path)
@@ -0,0 +1,712 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from tabor.tabor_client.acquisition import TaborCounterAcquisition
+from tabor.tabor_client.client import TaborClient
+from tabor.tabor_client.config import TABOR_DEFAULT_DEVICE_CONFIG, TaborDeviceConfig
+from tabor.tabor_client.consts import (
+    TABOR_SCAN_CACHE_MAX_BYTES,
+    TABOR_SCAN_CACHE_MAX_ENTRIES,
+    TABOR_SCAN_CACHE_PATH,
+)
+from tabor.tabor_client.data import tabor_to_dac_values
+from tabor.tabor_client.log import log
+from tabor.tabor_client.profile import tabor_get_memory_bank
+
+
+class TaborRasterScan:
+    def __init__(
+        self,
+        width: int = 512,
+        height: int = 512,
+        pixel_time: float = 10e-6,
+        x_range: Tuple[float, float] = (-1.0, 1.0),
+        y_range: Tuple[float, float] = (-1.0, 1.0),
+        flyback_time: float = None,
+        config: TaborDeviceConfig = None,
+    ) -> None:
+        """A raster scan geometry and its galvo waveforms. Each line starts with the
+        X flyback (during which Y steps to the line level) followed by the X ramp
+        over the line pixels.
+
+        Args:
+            width (int, optional): The number of pixels per line. Defaults to 512.
+            height (int, optional): The number of lines. Defaults to 512.
+            pixel_time (float, optional): The pixel dwell time (seconds). Defaults to 10e-6.
+            x_range (Tuple[float, float], optional): The X voltage range. Defaults to (-1.0, 1.0).
+            y_range (Tuple[float, float], optional): The Y voltage range. Defaults to (-1.0, 1.0).
+            flyback_time (float, optional): The min flyback time (seconds), the actual
+                flyback is extended to the line granularity. Defaults to 10% of the ramp.
+            config (TaborDeviceConfig, optional): The device config, must match the
+                config of the client playing the scan (client.device_config). Defaults
+                to TABOR_DEFAULT_DEVICE_CONFIG.
+        """
+        self.width = width
+        self.height = height
+        self.pixel_time = pixel_time
+        self.x_range = tuple(x_range)
+        self.y_range = tuple(y_range)
+        self.config = config or TABOR_DEFAULT_DEVICE_CONFIG
+        self.min_flyback_time = (
+            flyback_time if flyback_time is not None else 0.1 * width * pixel_time
+        )
+
+        assert width > 0 and height > 0, ValueError("width and height must be > 0")
+        assert self.samples_per_pixel > 0, ValueError(
+            "pixel_time is shorter than a sample"
+        )
+
+    @property
+    def freq(self) -> float:
+        return self.config.freq
+
+    @property
+    def samples_per_pixel(self) -> int:
+        return int(round(self.pixel_time * self.freq))
+
+    @property
+    def ramp_samples(self) -> int:
+        return self.width * self.samples_per_pixel
+
+    @property
+    def level_samples(self) -> int:
+        """The length of a Y level segment (looped over a line)"""
+        step = self.config.segment_min_size_step
+        return int(math.ceil(self.config.segment_min_length / step) * step)
+
+    @property
+    def line_samples(self) -> int:
+        """The line length (flyback + ramp), a multiple of level_samples"""
+        min_samples = self.ramp_samples + int(
+            math.ceil(self.min_flyback_time * self.freq)
+        )
+        return int(math.ceil(min_samples / self.level_samples) * self.level_samples)
+
+    @property
+    def flyback_samples(self) -> int:
+        return self.line_samples - self.ramp_samples
+
+    @property
+    def flyback_time(self) -> float:
+        return self.flyback_samples / self.freq
+
+    @property
+    def line_time(self) -> float:
+        return self.line_samples / self.freq
+
+    @property
+    def frame_time(self) -> float:
+        return self.line_time * self.height
+
+    def x_line(self) -> np.ndarray:
+        """The X waveform of a line (volts), cosine flyback then a linear ramp"""
+        x0, x1 = self.x_range
+        flyback = np.arange(self.flyback_samples) / self.flyback_samples
+        ramp = np.arange(self.ramp_samples) / self.ramp_samples
+        return np.concatenate(
+            [
+                x1 + (x0 - x1) * (1 - np.cos(np.pi * flyback)) / 2,
+                x0 + (x1 - x0) * ramp,
+            ]
+        )
+
+    def y_levels(self) -> np.ndarray:
+        """The Y level (volts) of each line"""
+        return np.linspace(*self.y_range, self.height)
+
+    def line_marker(self) -> np.ndarray:
+        """The line sync marker of a line (per sample), high during the ramp"""
+        marker = np.zeros(self.line_samples, dtype=bool)
+        marker[self.flyback_samples :] = True
+        return marker
+
+    def cache_key(self) -> str:
+        """A key of the scan geometry and the device (DAC) config"""
+        config = self.config
+        desc = {
+            "width": self.width,
+            "height": self.height,
+            "pixel_time": self.pixel_time,
+            "x_range": self.x_range,
+            "y_range": self.y_range,
+            "flyback_time": self.min_flyback_time,
+            "model": config.model,
+            "freq": config.freq,
+            "dac_is_16_bit": config.dac_is_16_bit,
+            "voltage_range": [config.min_voltage_out, config.max_voltage_out],
+            "segment_min_length": config.segment_min_length,
+            "segment_min_size_step": config.segment_min_size_step,
+        }
+        return hashlib.sha1(json.dumps(desc, sort_keys=True).encode()).hexdigest()
+
+    def pixel_index(self, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Maps times (seconds from the scan start) to pixels
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The frame number and the flat pixel index
+                (line * width + x), -1 for times outside the line ramps.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        frame = np.floor(times / self.frame_time).astype(np.int64)
+        in_frame = times - frame * self.frame_time
+        line = np.floor(in_frame / self.line_time).astype(np.int64)
+        x = np.floor(
+            (in_frame - line * self.line_time - self.flyback_time) / self.pixel_time
+        ).astype(np.int64)
+        valid = (x >= 0) & (x < self.width) & (line < self.height)
+        return frame, np.where(valid, line * self.width + x, -1)
+
+
+class TaborScanPattern:
+    def __init__(
+        self,
+        key: str,
+        line: np.ndarray,
+        levels: np.ndarray,
+        marker: np.ndarray,
+        level_samples: int,
+    ) -> None:
+        """A precomputed scan pattern, ready for upload
+
+        Args:
+            key (str): The pattern key (TaborRasterScan.cache_key).
+            line (np.ndarray): The X line DAC values.
+            levels (np.ndarray): The Y level DAC value per line.
+            marker (np.ndarray): The line marker, bits packed (np.packbits) per sample.
+            level_samples (int): The Y level segment length.
+        """
+        self.key = key
+        self.line = line
+        self.levels = levels
+        self.marker = marker
+        self.level_samples = level_samples
+
+    @classmethod
+    def from_scan(cls, scan: TaborRasterScan) -> "TaborScanPattern":
+        return cls(
+            scan.cache_key(),
+            tabor_to_dac_values(scan.x_line(), scan.config),
+            tabor_to_dac_values(scan.y_levels(), scan.config),
+            np.packbits(scan.line_marker()),
+            scan.level_samples,
+        )
+
+    @property
+    def marker_values(self) -> np.ndarray:
+        """The line marker per sample"""
+        return np.unpackbits(self.marker, count=len(self.line)).astype(bool)
+
+    @property
+    def nbytes(self) -> int:
+        return self.line.nbytes + self.levels.nbytes + self.marker.nbytes
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as raw:
+            np.savez(
+                raw,
+                line=self.line,
+                levels=self.levels,
+                marker=self.marker,
+                level_samples=self.level_samples,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, key: str, path: str) -> "TaborScanPattern":
+        with np.load(path) as data:
+            return cls(
+                key,
+                data["line"],
+                data["levels"],
+                data["marker"],
+                int(data["level_samples"]),
+            )
+
+
+class TaborScanPatternCache:
+    def __init__(
+        self,
+        path: str = TABOR_SCAN_CACHE_PATH,
+        max_entries: int = TABOR_SCAN_CACHE_MAX_ENTRIES,
+        max_bytes: int = TABOR_SCAN_CACHE_MAX_BYTES,
+    ) -> None:
+        """A cache of precomputed scan patterns, keyed by the scan geometry and
+        device config. Patterns are kept in memory (LRU, max_entries) and on disk
+        (LRU by access time, max_bytes). The cache also tracks the pattern resident
+        on each instrument (by resource and segment slot), so a repeated scan is
+        not uploaded again.
+
+        Args:
+            path (str, optional): The cache directory, None for memory only. Defaults to
+                TABOR_SCAN_CACHE_PATH.
+            max_entries (int, optional): The max patterns in memory. Defaults to
+                TABOR_SCAN_CACHE_MAX_ENTRIES.
+            max_bytes (int, optional): The max disk size. Defaults to TABOR_SCAN_CACHE_MAX_BYTES.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.__patterns: Dict[str, TaborScanPattern] = OrderedDict()
+        self.__resident: Dict[str, Dict[tuple, str]] = {}
+        self.__lock = threading.Lock()
+
+    def __file_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.npz")
+
+    def get(self, scan: TaborRasterScan) -> TaborScanPattern:
+        """Returns the scan pattern, from memory, disk or computed"""
+        key = scan.cache_key()
+        with self.__lock:
+            pattern = self.__patterns.get(key, None)
+            if pattern is not None:
+                self.__patterns.move_to_end(key)
+                return pattern
+
+        pattern = self.__load(key)
+        if pattern is None:
+            pattern = TaborScanPattern.from_scan(scan)
+            self.__save(pattern)
+
+        with self.__lock:
+            self.__patterns[key] = pattern
+            while len(self.__patterns) > self.max_entries:
+                self.__patterns.popitem(last=False)
+        return pattern
+
+    def __load(self, key: str) -> TaborScanPattern:
+        if self.path is None or not os.path.isfile(self.__file_path(key)):
+            return None
+        try:
+            pattern = TaborScanPattern.load(key, self.__file_path(key))
+            os.utime(self.__file_path(key))
+            return pattern
+        except Exception as ex:
+            log.warning(f"Failed to load scan pattern {key}: {ex}")
+            return None
+
+    def __save(self, pattern: TaborScanPattern):
+        if self.path is None:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            pattern.save(self.__file_path(pattern.key))
+            self.__evict()
+        except Exception as ex:
+            log.warning(f"Failed to save scan pattern {pattern.key}: {ex}")
+
+    def __evict(self):
+        files = [
+            os.path.join(self.path, name)
+            for name in os.listdir(self.path)
+            if name.endswith(".npz")
+        ]
+        files.sort(key=lambda f: os.stat(f).st_mtime, reverse=True)
+        # The most recent pattern is always kept.
+        total = 0
+        for file_path in files[1:]:
+            total += os.stat(file_path).st_size
+            if total > self.max_bytes:
+                os.remove(file_path)
+
+    def clear(self):
+        with self.__lock:
+            self.__patterns.clear()
+            self.__resident.clear()
+        if self.path is not None and os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(self.path, name))
+
+    # region Instrument residency
+
+    def is_resident(self, resource_name: str, slot: tuple, key: str) -> bool:
+        """True if the pattern is uploaded to the instrument at the slot"""
+        with self.__lock:
+            return self.__resident.get(resource_name, {}).get(slot, None) == key
+
+    def set_resident(self, resource_name: str, slot: tuple, key: str):
+        """Marks the pattern as uploaded to the slot (x_channel, y_channel, ...),
+        slots sharing a channel are removed"""
+        with self.__lock:
+            slots = self.__resident.setdefault(resource_name, {})
+            for other in list(slots.keys()):
+                if set(other[:2]) & set(slot[:2]):
+                    del slots[other]
+            slots[slot] = key
+
+    def invalidate(self, resource_name: str = None):
+        """Forgets the resident patterns (of a resource or all), e.g. after the
+        instrument memory was changed or reset"""
+        with self.__lock:
+            if resource_name is None:
+                self.__resident.clear()
+            else:
+                self.__resident.pop(resource_name, None)
+
+    # endregion
+
+
+class TaborRasterScanner:
+    def __init__(
+        self,
+        client: TaborClient,
+        scan: TaborRasterScan,
+        x_channel: int = 1,
+        y_channel: int = 2,
+        segment_id: int = 1,
+        digitizer_trigger: bool = True,
+        cache: TaborScanPatternCache = None,
+        marker: int = None,
+    ) -> None:
+        """Plays a raster scan (hardware timed) with the task tables of the X and Y
+        channels. X plays the line segment once per line task, Y loops a constant
+        level segment per line. Frames repeat until stopped.
+
+        Args:
+            client (TaborClient): The tabor client.
+            scan (TaborRasterScan): The scan.
+            x_channel (int, optional): The X galvo channel. Defaults to 1.
+            y_channel (int, optional): The Y galvo channel. Defaults to 2.
+            segment_id (int, optional): The line segment id, the Y level segments
+                follow (segment_id + 1 + line). Defaults to 1.
+            digitizer_trigger (bool, optional): Trigger the digitizer at each line start
+                (:DIG:TRIG:SOUR TASK<x_channel>). Defaults to True.
+            cache (TaborScanPatternCache, optional): The scan pattern cache. Defaults
+                to None (no cache).
+            marker (int, optional): Output the line sync marker (high during the ramp)
+                on this marker of the X channel. Defaults to None (no marker).
+        """
+        self.client = client
+        self.scan = scan
+        self.x_channel = x_channel
+        self.y_channel = y_channel
+        self.segment_id = segment_id
+        self.digitizer_trigger = digitizer_trigger
+        self.cache = cache
+        self.marker = marker
+        self.t0: float = None
+        """The scan start time (time.monotonic), set by start"""
+
+    def assert_config(self):
+        """Asserts the scan was built with the client device config (sampling rate,
+        granularity and DAC), otherwise the scan timing and pixel mapping do not match
+        the played waveforms."""
+        config = self.client.device_config
+        if config is None:
+            return
+        scan_config = self.scan.config
+        for name in [
+            "freq",
+            "segment_min_length",
+            "segment_min_size_step",
+            "dac_is_16_bit",
+            "min_voltage_out",
+            "max_voltage_out",
+        ]:
+            assert getattr(scan_config, name) == getattr(config, name), ValueError(
+                f"The scan {name} ({getattr(scan_config, name)}) does not match the"
+                f" client device config ({getattr(config, name)}), create the scan"
+                " with config=client.device_config"
+            )
+
+    def level_segment_id(self, line: int) -> int:
+        return self.segment_id + 1 + line
+
+    @property
+    def slot(self) -> tuple:
+        """The instrument slot of the scan (see TaborScanPatternCache.set_resident)"""
+        return (
+            self.x_channel,
+            self.y_channel,
+            self.segment_id,
+            self.digitizer_trigger,
+            self.marker,
+        )
+
+    def upload(self, force: bool = False) -> bool:
+        """Uploads the scan segments and task tables, unless the pattern is already
+        resident on the instrument (by the cache)
+
+        Args:
+            force (bool, optional): Upload even if resident. Defaults to False.
+
+        Returns:
+            bool: True if uploaded.
+        """
+        scan = self.scan
+        self.assert_config()
+        resource_name = self.client.resource_name
+        if self.cache is not None:
+            pattern = self.cache.get(scan)
+            if not force and self.cache.is_resident(
+                resource_name, self.slot, pattern.key
+            ):
+                return False
+        else:
+            pattern = TaborScanPattern.from_scan(scan)
+
+        config = self.client.device_config or scan.config
+        # The Y levels, one level segment per line, in a single transfer.
+        levels = np.repeat(pattern.levels, pattern.level_samples)
+        level_lengths = [pattern.level_samples] * scan.height
+        with self.client.lock:
+            if tabor_get_memory_bank(config.model, self.x_channel) == (
+                tabor_get_memory_bank(config.model, self.y_channel)
+            ):
+                # The channels share the memory bank, define all the segments together
+                self.client.write_segment_table_stream(
+                    self.segment_id,
+                    [len(pattern.line)] + level_lengths,
+                    [pattern.line, levels],
+                    channel=self.x_channel,
+                )
+            else:
+                self.client.write_segment_stream(
+                    self.segment_id,
+                    len(pattern.line),
+                    [pattern.line],
+                    channel=self.x_channel,
+                )
+                self.client.write_segment_table_stream(
+                    self.level_segment_id(0),
+                    level_lengths,
+                    [levels],
+                    channel=self.y_channel,
+                )
+            if self.marker is not None:
+                self.client.write_marker_data(
+                    self.segment_id,
+                    len(pattern.line),
+                    pattern.marker_values,
+                    markers=self.marker,
+                    channel=self.x_channel,
+                )
+                self.client.marker_on(self.x_channel, self.marker)
+
+            self.client.command(
+                *self.__task_table(
+                    self.x_channel,
+                    [self.segment_id] * scan.height,
+                    loops=1,
+                    digitizer_trigger=self.digitizer_trigger,
+                )
+            )
+            self.client.command(
+                *self.__task_table(
+                    self.y_channel,
+                    [self.level_segment_id(i) for i in range(scan.height)],
+                    loops=len(pattern.line) // pattern.level_samples,
+                )
+            )
+
+        if self.cache is not None:
+            self.cache.set_resident(resource_name, self.slot, pattern.key)
+        return True
+
+    def __task_table(
+        self,
+        channel: int,
+        segments: List[int],
+        loops: int,
+        digitizer_trigger: bool = False,
+    ) -> List[str]:
+        cmnd_list = [f":INST:CHAN:SEL {channel}", f":TASK:COMP:LENG {len(segments)}"]
+        for idx, segment in enumerate(segments):
+            cmnd_list += [
+                f":TASK:COMP:SEL {idx + 1}",
+                ":TASK:COMP:TYPE SING",
+                f":TASK:COMP:SEGM {segment}",
+                f":TASK:COMP:LOOP {loops}",
+                f":TASK:COMP:DTR {'ON' if digitizer_trigger else 'OFF'}",
+                # The last task returns to the first (continuous frames)
+                f":TASK:COMP:NEXT1 {(idx + 1) % len(segments) + 1}",
+            ]
+        cmnd_list.append(":TASK:COMP:WRIT 1")
+        return cmnd_list
+
+    def start(self) -> float:
+        """Starts the scan (both channels synchronized)
+
+        Returns:
+            float: The scan start time (time.monotonic).
+        """
+        cmnd_list = []
+        for channel in [self.x_channel, self.y_channel]:
+            cmnd_list += [
+                f":INST:CHAN:SEL {channel}",
+                ":FUNC:MODE TASK",
+                ":FUNC:MODE:TASK 1",
+                ":OUTP ON",
+            ]
+        self.client.command(*cmnd_list)
+        sent = time.monotonic()
+        self.client.command(":TASK:SYNC")
+        self.t0 = (sent + time.monotonic()) / 2
+        return self.t0
+
+    def stop(self):
+        self.client.off(self.x_channel, self.y_channel)
+
+
+class TaborScanImage:
+    def __init__(
+        self,
+        scan: TaborRasterScan,
+        channels: int = 1,
+        t0: float = 0.0,
+    ) -> None:
+        """Assembles scan frames incrementally from counter samples (binned by
+        timestamp) or digitizer line frames. When a frame is completed it is moved
+        to last_image and the frame listeners are called.
+
+        Args:
+            scan (TaborRasterScan): The scan.
+            channels (int, optional): The number of data channels. Defaults to 1.
+            t0 (float, optional): The scan start time, in the timestamps clock (e.g.
+                TaborRasterScanner.start). Defaults to 0.0.
+        """
+        self.scan = scan
+        self.channels = channels
+        self.t0 = t0
+        self.frame = 0
+        """The current frame number"""
+        self.last_image: np.ndarray = None
+        """The last completed image"""
+
+        self.__listeners: List[Callable[[int, np.ndarray], None]] = []
+        self.__sums = np.zeros((scan.height * scan.width, channels))
+        self.__hits = np.zeros(scan.height * scan.width, dtype=np.int64)
+        self.__gate = 0.0
+
+    @property
+    def image(self) -> np.ndarray:
+        """The current (partial) image, (height x width x channels), nan where
+        no data was collected"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            image = self.__sums / self.__hits[:, None]
+        return image.reshape(self.scan.height, self.scan.width, self.channels)
+
+    @property
+    def hits(self) -> np.ndarray:
+        return self.__hits.reshape(self.scan.height, self.scan.width)
+
+    def add_listener(self, listener: Callable[[int, np.ndarray], None]):
+        """Adds a listener, called with (frame, image) when a frame is completed"""
+        self.__listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[int, np.ndarray], None]):
+        if listener in self.__listeners:
+            self.__listeners.remove(listener)
+
+    def complete(self):
+        """Completes the current frame and starts the next"""
+        self.last_image = self.image
+        for listener in self.__listeners:
+            listener(self.frame, self.last_image)
+        self.frame += 1
+        self.__sums[:] = 0
+        self.__hits[:] = 0
+
+    def __accumulate(self, pixels: np.ndarray, values: np.ndarray, frames: np.ndarray):
+        # The samples are ordered by time, split them by frame.
+        bounds = np.flatnonzero(np.diff(frames)) + 1
+        size = len(self.__hits)
+        for pix, vals, frame in zip(
+            np.split(pixels, bounds),
+            np.split(values, bounds),
+            np.split(frames, bounds),
+        ):
+            if len(frame) == 0 or frame[0] < self.frame:
+                continue
+            while self.frame < frame[0]:
+                self.complete()
+            valid = pix >= 0
+            pix, vals = pix[valid], vals[valid]
+            self.__hits += np.bincount(pix, minlength=size)
+            for c in range(self.channels):
+                self.__sums[:, c] += np.bincount(
+                    pix, weights=vals[:, c], minlength=size
+                )
+
+    def add_counter_samples(
+        self,
+        timestamps: np.ndarray,
+        counts: np.ndarray,
+        gate: float = 0.0,
+    ):
+        """Bins counter samples into pixels by the center of their gate window
+
+        Args:
+            timestamps (np.ndarray): The gate start times, (n,).
+            counts (np.ndarray): The counts, (n x channels).
+            gate (float, optional): The gate window (seconds). Defaults to 0.0.
+        """
+        times = np.asarray(timestamps, dtype=np.float64) - self.t0 + gate / 2
+        frames, pixels = self.scan.pixel_index(times)
+        values = np.asarray(counts, dtype=np.float64).reshape(-1, self.channels)
+        self.__accumulate(pixels, values, frames)
+
+    def add_digitizer_lines(
+        self,
+        line: int,
+        data: np.ndarray,
+        sampling_rate: float,
+        channel: int = 0,
+        delay: float = 0.0,
+    ):
+        """Bins digitizer line frames (triggered at the line start) into pixels, the
+        pixel value is the mean of its samples.
+
+        Args:
+            line (int): The scan line number (from the scan start) of the first frame.
+            data (np.ndarray): The frames data, (lines x samples).
+            sampling_rate (float): The digitizer sampling rate.
+            channel (int, optional): The image channel. Defaults to 0.
+            delay (float, optional): The trigger to first sample delay. Defaults to 0.0.
+        """
+        scan = self.scan
+        data = np.asarray(data, dtype=np.float64)
+        times = np.arange(data.shape[-1]) / sampling_rate + delay - scan.flyback_time
+        x = np.floor(times / scan.pixel_time).astype(np.int64)
+        in_line = np.flatnonzero((x >= 0) & (x < scan.width))
+        assert len(in_line) > 0 and np.array_equal(
+            np.unique(x[in_line]), np.arange(scan.width)
+        ), ValueError("The digitizer frames do not cover all the line pixels")
+
+        lo, hi = in_line[0], in_line[-1] + 1
+        starts = np.searchsorted(x[lo:hi], np.arange(scan.width))
+        samples = np.diff(np.r_[starts, hi - lo])
+        pixels = np.add.reduceat(data[:, lo:hi], starts, axis=1) / samples
+
+        for idx in range(len(pixels)):
+            frame, row = divmod(line + idx, scan.height)
+            if frame < self.frame:
+                continue
+            while self.frame < frame:
+                self.complete()
+            offset = row * scan.width
+            self.__sums[offset : offset + scan.width, channel] += pixels[idx]
+            if channel == 0:
+                self.__hits[offset : offset + scan.width] += 1
+
+    def attach(self, acquisition: TaborCounterAcquisition):
+        """Bins the samples of a counter acquisition (t0 must be in time.monotonic)"""
+        acquisition.add_listener(self.__on_counter_samples)
+        self.__gate = acquisition.gate
+        return self
+
+    def detach(self, acquisition: TaborCounterAcquisition):
+        acquisition.remove_listener(self.__on_counter_samples)
+
+    def __on_counter_samples(self, timestamps: np.ndarray, counts: np.ndarray):
+        self.add_counter_samples(timestamps, counts, gate=self.__gate)
@@ -0,0 +1,337 @@
+import json
+import os
+import queue
+import re
+import threading
+from typing import List, Tuple
+
+import numpy as np
+
+from tabor.tabor_client.acquisition import TaborCounterAcquisition
+from tabor.tabor_client.exceptions import TaborClientException
+from tabor.tabor_client.log import log
+
+
+class TaborChunkReader:
+    INDEX_FILE = "index.json"
+
+    def __init__(self, path: str) -> None:
+        """Reads the chunks written by a TaborChunkSink (possibly from another process).
+        Chunks are returned as read only memory maps (zero copy).
+
+        Args:
+            path (str): The sink directory.
+        """
+        self.path = path
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.path, self.INDEX_FILE)
+
+    def read_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {"chunks": []}
+        with open(self.index_path, "r") as raw:
+            return json.load(raw)
+
+    @property
+    def chunks(self) -> List[dict]:
+        """The completed chunks, each {file, first, count, complete}"""
+        return [c for c in self.read_index()["chunks"] if c["complete"]]
+
+    @property
+    def records(self) -> int:
+        """The number of records in the completed chunks"""
+        return sum(c["count"] for c in self.chunks)
+
+    def read_chunk(self, idx: int) -> np.ndarray:
+        """Returns a read only memory map of the (completed) chunk records"""
+        chunk = self.chunks[idx]
+        return np.load(os.path.join(self.path, chunk["file"]), mmap_mode="r")[
+            : chunk["count"]
+        ]
+
+
+class TaborChunkSink(TaborChunkReader):
+    def __init__(
+        self,
+        path: str,
+        dtype: np.dtype,
+        record_shape: Tuple[int] = (),
+        chunk_records: int = 2**16,
+        prefix: str = "chunk",
+        queue_size: int = 256,
+    ) -> None:
+        """Appends records to chunked, memory mapped .npy files (in a directory) with
+        a json index. Records can be written in place (reserve/commit), e.g. a binary
+        read directly into the file,
+
+            frames = sink.reserve(1)[0]
+            digitizer.read_frames(out=frames)
+            sink.commit(1)
+
+        or appended (append) to be written by the background writer thread. Completed
+        chunks are flushed and indexed by the writer thread. A sink should be written
+        either in place or by append, not both. An existing sink directory is
+        appended to (with the same dtype, record_shape and chunk_records, otherwise
+        raises), new chunk files are numbered after the existing ones. Incomplete
+        chunks (e.g. the writer was killed) are recovered up to the records in the
+        last written index.
+
+        Args:
+            path (str): The sink directory.
+            dtype (np.dtype): The record dtype (e.g. TaborDigitizer.frame_dtype).
+            record_shape (Tuple[int], optional): The record shape. Defaults to ().
+            chunk_records (int, optional): The number of records per chunk. Defaults to 2**16.
+            prefix (str, optional): The chunk file prefix. Defaults to "chunk".
+            queue_size (int, optional): The max number of pending appends. Defaults to 256.
+        """
+        super().__init__(path)
+        self.dtype = np.dtype(dtype)
+        self.record_shape = tuple(record_shape)
+        self.chunk_records = chunk_records
+        self.prefix = prefix
+        self.queue_size = queue_size
+        self.error: Exception = None
+        """The last writer error"""
+
+        index = self.read_index()
+        self.__check_index(index)
+        self.__chunks: List[dict] = self.__recover(index["chunks"])
+        self.__next_file = self.__last_file_index() + 1
+        self.__current: np.memmap = None
+        self.__filled = 0
+        self.__lock = threading.RLock()
+        self.__queue: queue.Queue = None
+        self.__thread: threading.Thread = None
+
+    @classmethod
+    def counter_dtype(cls, channels: int) -> np.dtype:
+        """The record dtype of counter samples"""
+        return np.dtype([("timestamp", "<f8"), ("counts", "<i8", (channels,))])
+
+    @property
+    def is_running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    @property
+    def chunks(self) -> List[dict]:
+        with self.__lock:
+            return [dict(c) for c in self.__chunks if c["complete"]]
+
+    @property
+    def written(self) -> int:
+        """The total number of records written"""
+        with self.__lock:
+            return sum(c["count"] for c in self.__chunks)
+
+    def __check_index(self, index: dict):
+        """Checks that an existing sink has the same record layout"""
+        if "dtype" not in index:
+            if any(c["count"] > 0 for c in index["chunks"]):
+                raise TaborClientException(
+                    f"The sink index has records but no record layout ({self.path})"
+                )
+            return
+        expected = {
+            "dtype": str(self.dtype),
+            "record_shape": list(self.record_shape),
+            "chunk_records": self.chunk_records,
+        }
+        for name, value in expected.items():
+            if index.get(name) != value:
+                raise TaborClientException(
+                    f"The sink {name} ({value}) does not match the existing sink"
+                    f" ({index.get(name)}, {self.path})"
+                )
+
+    def __recover(self, chunks: List[dict]) -> List[dict]:
+        recovered = []
+        for chunk in chunks:
+            if not chunk["complete"]:
+                if chunk["count"] == 0 or not os.path.exists(
+                    os.path.join(self.path, chunk["file"])
+                ):
+                    continue
+                log.warning(
+                    f"Recovered incomplete chunk {chunk['file']} ({self.path})"
+                    f" with {chunk['count']} records"
+                )
+                chunk = dict(chunk, complete=True, recovered=True)
+            recovered.append(chunk)
+        return recovered
+
+    def __last_file_index(self) -> int:
+        """The highest chunk file number in the directory or the index, -1 if none"""
+        pattern = re.compile(rf"^{re.escape(self.prefix)}-(\d+)\.npy$")
+        names = [c["file"] for c in self.__chunks]
+        if os.path.isdir(self.path):
+            names += os.listdir(self.path)
+        numbers = [int(m.group(1)) for m in map(pattern.match, names) if m]
+        return max(numbers, default=-1)
+
+    def start(self):
+        if self.is_running:
+            return self
+        os.makedirs(self.path, exist_ok=True)
+        if any(c.get("recovered", False) for c in self.__chunks):
+            self.__write_index()
+        self.__queue = queue.Queue(maxsize=self.queue_size)
+        self.__thread = threading.Thread(
+            target=self.__run,
+            name=f"tabor-sink-{os.path.basename(self.path)}",
+            daemon=True,
+        )
+        self.__thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        """Writes the pending records, closes the current (partial) chunk and
+        stops the writer thread"""
+        if self.is_running:
+            self.__queue.put(None)
+            self.__thread.join(timeout)
+        self.__thread = None
+        with self.__lock:
+            if self.__current is not None:
+                self.__complete(self.__current, self.__chunks[-1])
+                self.__current = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # region Writing
+
+    def reserve(self, count: int) -> np.ndarray:
+        """Returns a writable view of the next records in the current chunk (memory
+        mapped), of up to count records (less at the end of a chunk). The records
+        are added by commit."""
+        with self.__lock:
+            if self.__current is None:
+                self.__next_chunk()
+            count = min(count, self.chunk_records - self.__filled)
+            return self.__current[self.__filled : self.__filled + count]
+
+    def commit(self, count: int):
+        """Commits count records written to the reserved view"""
+        with self.__lock:
+            assert (
+                self.__current is not None
+                and self.__filled + count <= self.chunk_records
+            ), ValueError("Cannot commit more records than reserved")
+            self.__filled += count
+            self.__chunks[-1]["count"] = self.__filled
+            if self.__filled == self.chunk_records:
+                chunk, self.__current = self.__current, None
+                if threading.current_thread() is self.__thread:
+                    self.__complete(chunk, self.__chunks[-1])
+                else:
+                    self.__submit(("complete", chunk, self.__chunks[-1]))
+
+    def append(self, records: np.ndarray = None, **fields: np.ndarray):
+        """Queues records to be written by the writer thread, either a records array
+        or the record fields (e.g. timestamp=..., counts=...), which are written
+        directly into the chunk fields. The arrays must not be changed after the call.
+        """
+        assert records is not None or len(fields) > 0, ValueError(
+            "Either records or fields must be provided"
+        )
+        self.__submit(("append", records, fields))
+
+    def flush(self):
+        """Queues a flush of the current chunk and the index to disk"""
+        self.__submit(("flush",))
+
+    def attach(self, acquisition: TaborCounterAcquisition):
+        """Appends the samples of a counter acquisition (see counter_dtype)"""
+        acquisition.add_listener(self.__on_counter_samples)
+        return self
+
+    def detach(self, acquisition: TaborCounterAcquisition):
+        acquisition.remove_listener(self.__on_counter_samples)
+
+    def __on_counter_samples(self, timestamps: np.ndarray, counts: np.ndarray):
+        self.append(timestamp=timestamps, counts=counts)
+
+    def __submit(self, job: tuple):
+        if self.error is not None:
+            raise TaborClientException(f"Sink writer failed: {self.error}")
+        assert self.is_running, TaborClientException(
+            "Sink writer is not running, call start()"
+        )
+        self.__queue.put(job)
+
+    def __next_chunk(self):
+        entry = {
+            "file": f"{self.prefix}-{self.__next_file:06d}.npy",
+            "first": sum(c["count"] for c in self.__chunks),
+            "count": 0,
+            "complete": False,
+        }
+        self.__current = np.lib.format.open_memmap(
+            os.path.join(self.path, entry["file"]),
+            mode="w+",
+            dtype=self.dtype,
+            shape=(self.chunk_records, *self.record_shape),
+        )
+        self.__filled = 0
+        self.__next_file += 1
+        self.__chunks.append(entry)
+
+    def __complete(self, chunk: np.memmap, entry: dict):
+        chunk.flush()
+        with self.__lock:
+            entry["complete"] = True
+        self.__write_index()
+
+    def __write_index(self):
+        with self.__lock:
+            index = {
+                "dtype": str(self.dtype),
+                "record_shape": list(self.record_shape),
+                "chunk_records": self.chunk_records,
+                "chunks": [dict(c) for c in self.__chunks],
+            }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as raw:
+            json.dump(index, raw, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def __write(self, records: np.ndarray, fields: dict):
+        count = (
+            len(records) if records is not None else len(next(iter(fields.values())))
+        )
+        offset = 0
+        while offset < count:
+            view = self.reserve(count - offset)
+            n = len(view)
+            if records is not None:
+                view[...] = records[offset : offset + n]
+            for name, values in fields.items():
+                view[name] = values[offset : offset + n]
+            self.commit(n)
+            offset += n
+
+    def __run(self):
+        while True:
+            job = self.__queue.get()
+            if job is None:
+                return
+            try:
+                if job[0] == "append":
+                    self.__write(*job[1:])
+                elif job[0] == "complete":
+                    self.__complete(*job[1:])
+                elif job[0] == "flush":
+                    with self.__lock:
+                        if self.__current is not None:
+                            self.__current.flush()
+                    self.__write_index()
+            except Exception as ex:
+                log.error(f"Sink writer failed ({self.path}): {ex}")
+                self.error = ex
+
+    # endregion
@@ -0,0 +1,210 @@
+import threading
+from typing import List
+
+import numpy as np
+
+from tabor.tabor_client.acquisition import TaborCounterAcquisition
+
+
+class TaborCounterStatistics:
+    def __init__(
+        self,
+        channels: int = 1,
+        gate: float = 1e-3,
+        dead_time: float = None,
+        bins: List[float] = None,
+        window: float = 1.0,
+        window_buckets: int = 10,
+    ) -> None:
+        """Online statistics of counter samples (counts per gate window), updated with
+        blocks of samples. Keeps a fixed amount of memory per channel, the raw samples
+        are not kept.
+
+        Args:
+            channels (int, optional): The number of channels. Defaults to 1.
+            gate (float, optional): The counter gate (seconds). Defaults to 1e-3.
+            dead_time (float, optional): The detector dead time (seconds), if set the
+                counts are corrected (non paralyzable) and saturated samples are
+                ignored. Defaults to None.
+            bins (List[float], optional): The histogram bin edges (counts). Defaults
+                to None (no histogram).
+            window (float, optional): The rolling rate window (seconds). Defaults to 1.0.
+            window_buckets (int, optional): The number of buckets in the rolling window,
+                the window moves in steps of window / window_buckets. Defaults to 10.
+        """
+        self.channels = channels
+        self.gate = gate
+        self.dead_time = dead_time
+        self.bins = None if bins is None else np.asarray(bins, dtype=np.float64)
+        self.window = window
+        self.window_buckets = window_buckets
+
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.__lock:
+            self.__count = np.zeros(self.channels, dtype=np.int64)
+            self.__mean = np.zeros(self.channels)
+            self.__m2 = np.zeros(self.channels)
+            self.__total = np.zeros(self.channels)
+            self.__ignored = np.zeros(self.channels, dtype=np.int64)
+            self.__histogram = (
+                None
+                if self.bins is None
+                else np.zeros((self.channels, len(self.bins) - 1), dtype=np.int64)
+            )
+            self.__bucket_ids = np.full(self.window_buckets, -1, dtype=np.int64)
+            self.__bucket_counts = np.zeros((self.window_buckets, self.channels))
+            self.__bucket_time = np.zeros(self.window_buckets)
+            self.__last_bucket = -1
+
+    # region Properties
+
+    @property
+    def count(self) -> np.ndarray:
+        """The number of samples per channel"""
+        return self.__count.copy()
+
+    @property
+    def ignored(self) -> np.ndarray:
+        """The number of saturated (dead time) samples ignored per channel"""
+        return self.__ignored.copy()
+
+    @property
+    def total(self) -> np.ndarray:
+        """The total (corrected) counts per channel"""
+        return self.__total.copy()
+
+    @property
+    def mean(self) -> np.ndarray:
+        """The mean counts per gate"""
+        return self.__mean.copy()
+
+    @property
+    def variance(self) -> np.ndarray:
+        """The (sample) variance of the counts per gate"""
+        with self.__lock:
+            return self.__m2 / np.maximum(self.__count - 1, 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    @property
+    def rate(self) -> np.ndarray:
+        """The mean count rate (counts/sec)"""
+        return self.mean / self.gate
+
+    @property
+    def histogram(self) -> np.ndarray:
+        """The counts histogram (channels x bins), None if no bins"""
+        with self.__lock:
+            return None if self.__histogram is None else self.__histogram.copy()
+
+    @property
+    def window_rate(self) -> np.ndarray:
+        """The count rate (counts/sec) over the last window"""
+        with self.__lock:
+            valid = self.__bucket_ids > self.__last_bucket - self.window_buckets
+            valid &= self.__bucket_ids >= 0
+            elapsed = self.__bucket_time[valid].sum()
+            if elapsed == 0:
+                return np.zeros(self.channels)
+            return self.__bucket_counts[valid].sum(axis=0) / elapsed
+
+    # endregion
+
+    def correct(self, counts: np.ndarray) -> np.ndarray:
+        """Returns the dead time corrected counts, saturated samples are nan"""
+        counts = np.asarray(counts, dtype=np.float64)
+        if self.dead_time is None:
+            return counts
+        live = 1 - counts * (self.dead_time / self.gate)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(live > 0, counts / live, np.nan)
+
+    def update(self, timestamps: np.ndarray, counts: np.ndarray):
+        """Updates the statistics with a block of samples
+
+        Args:
+            timestamps (np.ndarray): The sample timestamps (seconds), (n,).
+            counts (np.ndarray): The counts, (n x channels).
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = self.correct(counts).reshape(-1, self.channels)
+        if len(values) == 0:
+            return
+
+        valid = ~np.isnan(values)
+        block_count = valid.sum(axis=0)
+        zeroed = np.where(valid, values, 0)
+        block_total = zeroed.sum(axis=0)
+        block_mean = block_total / np.maximum(block_count, 1)
+        block_m2 = (np.where(valid, values - block_mean, 0) ** 2).sum(axis=0)
+
+        histogram = None
+        if self.bins is not None:
+            nbins = len(self.bins) - 1
+            idx = np.searchsorted(self.bins, zeroed, side="right") - 1
+            # The last edge is inclusive
+            idx[zeroed == self.bins[-1]] = nbins - 1
+            in_range = valid & (idx >= 0) & (idx < nbins)
+            flat = (idx + np.arange(self.channels) * nbins)[in_range]
+            histogram = np.bincount(flat, minlength=self.channels * nbins)
+            histogram = histogram.reshape(self.channels, nbins)
+
+        # Rolling window buckets, the samples are ordered by time.
+        width = self.window / self.window_buckets
+        ids = np.floor(timestamps / width).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, np.diff(ids) != 0])
+        bucket_ids = ids[starts]
+        bucket_counts = np.add.reduceat(zeroed, starts, axis=0)
+        bucket_time = self.gate * np.diff(np.r_[starts, len(ids)])
+        recent = bucket_ids > bucket_ids[-1] - self.window_buckets
+
+        with self.__lock:
+            # Merge the block (Chan et al.)
+            count = self.__count + block_count
+            delta = block_mean - self.__mean
+            ratio = np.divide(
+                block_count, count, out=np.zeros(self.channels), where=count > 0
+            )
+            self.__mean += delta * ratio
+            self.__m2 += block_m2 + delta**2 * self.__count * ratio
+            self.__count = count
+            self.__total += block_total
+            self.__ignored += len(values) - block_count
+            if histogram is not None:
+                self.__histogram += histogram
+
+            bucket_ids = bucket_ids[recent]
+            slots = bucket_ids % self.window_buckets
+            stale = self.__bucket_ids[slots] != bucket_ids
+            self.__bucket_counts[slots[stale]] = 0
+            self.__bucket_time[slots[stale]] = 0
+            self.__bucket_ids[slots] = bucket_ids
+            self.__bucket_counts[slots] += bucket_counts[recent]
+            self.__bucket_time[slots] += bucket_time[recent]
+            self.__last_bucket = max(self.__last_bucket, bucket_ids[-1])
+
+    def snapshot(self) -> dict:
+        """Returns the current statistics"""
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std,
+            "rate": self.rate,
+            "window_rate": self.window_rate,
+            "total": self.total,
+            "ignored": self.ignored,
+            "histogram": self.histogram,
+        }
+
+    def attach(self, acquisition: TaborCounterAcquisition):
+        """Updates the statistics with the samples of a counter acquisition"""
+        acquisition.add_listener(self.update)
+        return self
+
+    def detach(self, acquisition: TaborCounterAcquisition):
+        acquisition.remove_listener(self.update)
@@ -0,0 +1,142 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from tabor.tabor_client.client import TaborClient
+from tabor.tabor_client.consts import TABOR_API_QUEUE_SIZE, TABOR_API_REQUEST_TIMEOUT
+from tabor.tabor_client.exceptions import (
+    TaborClientWorkerBusyException,
+    TaborClientWorkerTimeoutException,
+)
+from tabor.tabor_client.log import log
+
+
+class TaborClientWorker:
+    def __init__(
+        self,
+        client: TaborClient,
+        queue_size: int = TABOR_API_QUEUE_SIZE,
+        timeout: float = TABOR_API_REQUEST_TIMEOUT,
+    ) -> None:
+        """A single I/O worker for an instrument. Requests are queued (asyncio) and
+        executed one by one on a dedicated thread, so a slow request to one instrument
+        never blocks the requests to another.
+
+        Args:
+            client (TaborClient): The instrument client.
+            queue_size (int, optional): The max number of pending requests, new requests
+                are rejected when the queue is full. Defaults to TABOR_API_QUEUE_SIZE.
+            timeout (float, optional): The default request timeout in seconds (queue wait
+                + execution). Defaults to TABOR_API_REQUEST_TIMEOUT.
+        """
+        self.client = client
+        self.timeout = timeout
+        self.queue_size = queue_size
+
+        self.__queue: asyncio.Queue = None
+        self.__task: asyncio.Task = None
+        self.__executor: ThreadPoolExecutor = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.__task is not None and not self.__task.done()
+
+    @property
+    def pending(self) -> int:
+        """The number of queued requests"""
+        return 0 if self.__queue is None else self.__queue.qsize()
+
+    async def start(self, connect: bool = True):
+        """Starts the worker loop
+
+        Args:
+            connect (bool, optional): Connect the client (as the first request). Defaults to True.
+        """
+        if self.is_running:
+            return self
+
+        self.__queue = asyncio.Queue(maxsize=self.queue_size)
+        self.__executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix=f"tabor-{self.client.resource_name}",
+        )
+        self.__task = asyncio.create_task(self.__run())
+
+        if connect:
+            await self.submit(self.client.connect)
+        return self
+
+    async def stop(self, disconnect: bool = True):
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+            self.__task = None
+
+        if disconnect and self.client.resource is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                self.__executor, self.client.disconnect
+            )
+
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+
+    async def submit(
+        self,
+        func: Callable,
+        *args,
+        timeout: float = None,
+        **kwargs,
+    ) -> Any:
+        """Queues func(*args, **kwargs) to be executed on the instrument thread and
+        waits for the result.
+
+        Args:
+            func (Callable): The function to call (usually a client method).
+            timeout (float, optional): The timeout in seconds. Defaults to the worker timeout.
+
+        Raises:
+            TaborClientWorkerBusyException: The request queue is full.
+            TaborClientWorkerTimeoutException: The request did not complete in time.
+        """
+        assert self.is_running, TaborClientWorkerBusyException(
+            "Worker is not running, call start()"
+        )
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.__queue.put_nowait((future, partial(func, *args, **kwargs)))
+        except asyncio.QueueFull:
+            raise TaborClientWorkerBusyException(
+                f"Too many pending requests for {self.client.resource_name}"
+            )
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise TaborClientWorkerTimeoutException(
+                f"Request to {self.client.resource_name} timed out after {timeout} [sec]"
+            )
+
+    async def __run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            future, call = await self.__queue.get()
+            if future.done():
+                # Timed out (cancelled) while in the queue.
+                continue
+            try:
+                rslt = await loop.run_in_executor(self.__executor, call)
+                if not future.done():
+                    future.set_result(rslt)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                if not future.done():
+                    future.set_exception(ex)
+                else:
+                    log.error(f"Request to {self.client.resource_name} failed: {ex}")
@@ -1,11 +1,11 @@
 # %% Define client
 from typing import List, Union
 from tabor.tabor_client import TaborClient, TaborFunctionSegment
+from tabor.tabor_client.config import TaborDefaultDeviceConfig, TaborP9082DeviceConfig
+from tabor.tabor_client.data import tabor_pack_marker_values
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 import time
-import re
 
 # host = "134.74.27.64"
 host = "134.74.27.16"
@@ -58,44 +58,13 @@ def marker_values_to_binary_data(
     channel: int = 1,
     use_8_bits: bool = True,
 ):
-    assert channel > 0 and channel < 5, ValueError(
-        f"Channel {channel} out of range, 1-4"
-    )
-
-    def to_channel_bits(val):
-        # Use bit shift to move the bits to the correct
-        # value.
-        # If was channel = 2, then starting with 1, e.g
-        # 1<<1 = 0001 --> 0010
-        # 1<<2 = 0001 --> 0100 .. etc
-        return 1 << channel - 1 if val > 0 else 0
-
-    idx = 0
-    data = []
-    while idx < len(vals):
-        num = to_channel_bits(vals[idx])
-        idx += 1
-        if use_8_bits:
-            if idx >= len(vals):
-                # Not enough to compose the next
-                # 8 bit.
-                # Skip (should error)
-                break
-            # Shift by 4
-            # 0010 --> 00100000
-            
-            # Do a or operation, join two, e.g.
-            # 0100 |
-            # 0001 =
-            # 0101
-            num = to_channel_bits(vals[idx]) << 4 | num
-            idx += 1
-
-        data.append(num)
-
-    # This is an 8 bit operation in the case where.
-    # we have the 8 bits for the values.
-    return bytes(data)
+    # Packs the marker bits (vectorized), in 8 bit mode two values per byte.
+    config = TaborP9082DeviceConfig() if use_8_bits else TaborDefaultDeviceConfig()
+    # A last value that does not fill a byte is skipped (should error)
+    vals = vals[: len(vals) - len(vals) % config.markers_per_byte]
+    return tabor_pack_marker_values(
+        vals, markers=channel, device_config=config
+    ).tobytes()
 
 
 # Should print all channel 1 options. Notice that
@@ -121,4 +90,7 @@ client.command("*CLS")
 # Choose the write method for bytes
 client.write_binary(":MARK:DATA", data, "b")
 
+# %% Upload marker data, aligned to segment 1 (per sample values)
+client.write_marker_data(1, 1024, [1] * 512 + [0] * 512, markers=1, channel=1)
+
 # %%
@@ -0,0 +1,86 @@
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from tabor.tabor_client.exceptions import TaborClientException
+from tabor.tabor_client.sink import TaborChunkReader, TaborChunkSink
+
+
+def wait_for(predicate, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert predicate()
+
+
+def test_reopen_recovers_incomplete_chunk(tmp_path):
+    path = str(tmp_path / "counts")
+    dtype = TaborChunkSink.counter_dtype(1)
+
+    # A writer that is killed after a flush, with its chunk incomplete
+    sink = TaborChunkSink(path, dtype, chunk_records=100).start()
+    sink.append(timestamp=np.arange(30.0), counts=np.arange(30)[:, None])
+    sink.flush()
+    wait_for(lambda: TaborChunkSink(path, dtype, chunk_records=100).written == 30)
+
+    reopened = TaborChunkSink(path, dtype, chunk_records=100).start()
+    reopened.append(timestamp=np.arange(30.0, 40.0), counts=np.arange(30, 40)[:, None])
+    reopened.stop()
+
+    reader = TaborChunkReader(path)
+    assert [c["file"] for c in reader.chunks] == [
+        "chunk-000000.npy",
+        "chunk-000001.npy",
+    ]
+    assert reader.records == 40
+    timestamps = np.concatenate(
+        [reader.read_chunk(i)["timestamp"] for i in range(len(reader.chunks))]
+    )
+    assert np.array_equal(timestamps, np.arange(40.0))
+
+
+def test_reopen_does_not_overwrite_files(tmp_path):
+    path = str(tmp_path / "counts")
+    dtype = TaborChunkSink.counter_dtype(1)
+    os.makedirs(path)
+    # A chunk file that was created but never indexed
+    np.save(os.path.join(path, "chunk-000000.npy"), np.zeros(5, dtype=dtype))
+
+    with TaborChunkSink(path, dtype, chunk_records=10) as sink:
+        sink.append(timestamp=np.arange(3.0), counts=np.ones((3, 1), dtype=np.int64))
+
+    assert [c["file"] for c in TaborChunkReader(path).chunks] == ["chunk-000001.npy"]
+    assert len(np.load(os.path.join(path, "chunk-000000.npy"))) == 5
+
+
+def test_reopen_checks_record_layout(tmp_path):
+    path = str(tmp_path / "counts")
+    dtype = TaborChunkSink.counter_dtype(1)
+    with TaborChunkSink(path, dtype, chunk_records=10) as sink:
+        sink.append(timestamp=np.arange(3.0), counts=np.ones((3, 1), dtype=np.int64))
+
+    TaborChunkSink(path, dtype, chunk_records=10)
+    for kwargs in [
+        dict(dtype=TaborChunkSink.counter_dtype(2), chunk_records=10),
+        dict(dtype=dtype, chunk_records=20),
+        dict(dtype=dtype, record_shape=(2,), chunk_records=10),
+    ]:
+        with pytest.raises(TaborClientException):
+            TaborChunkSink(path, **kwargs)
+
+    # An index with records but without the record layout
+    reader = TaborChunkReader(path)
+    index = {"chunks": reader.read_index()["chunks"]}
+    with open(reader.index_path, "w") as raw:
+        json.dump(index, raw)
+    with pytest.raises(TaborClientException):
+        TaborChunkSink(path, dtype, chunk_records=10)
+
+    # A new sink (no index) or an empty one
+    TaborChunkSink(str(tmp_path / "new"), dtype)
+    with open(reader.index_path, "w") as raw:
+        json.dump({"chunks": []}, raw)
+    TaborChunkSink(path, dtype)
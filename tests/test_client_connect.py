@@ -0,0 +1,118 @@
+from typing import Dict, List
+
+from tabor.tabor_client.client import TaborClient
+from tabor.tabor_client.profile import TaborDeviceProfile, TaborDeviceProfileCache
+
+IDN = "Tabor Electronics,P9484M,000000000001,1.118.0"
+
+
+class FakeResource:
+    """Answers composed queries from a response table (by query). Unsupported
+    requests set the error read by :SYST:ERR?"""
+
+    def __init__(self, responses: Dict[str, str], unsupported: List[str] = ()) -> None:
+        self.responses = responses
+        self.unsupported = list(unsupported)
+        self.queries = []
+
+    def close(self):
+        pass
+
+    def write(self, command: str):
+        self.queries.append(command)
+
+    def query(self, query: str) -> str:
+        self.queries.append(query)
+        rsp = []
+        error = '0,"No error"'
+        for part in query.split(";"):
+            part = part.strip()
+            if part == ":SYST:ERR?":
+                rsp.append(error)
+            elif part in self.unsupported:
+                error = '-113,"Undefined header"'
+            elif "?" in part:
+                rsp.append(self.responses.get(part, "0"))
+        return ";".join(rsp)
+
+
+def make_client(
+    monkeypatch,
+    responses: Dict[str, str],
+    unsupported: List[str] = (),
+    **kwargs,
+) -> TaborClient:
+    client = TaborClient("fake", **kwargs)
+    resource = FakeResource(responses, unsupported)
+    monkeypatch.setattr(
+        client.resource_manager, "open_resource", lambda *args, **kwargs: resource
+    )
+    return client
+
+
+def device_responses(dac_mode: str = "M0") -> Dict[str, str]:
+    responses = dict(
+        zip(
+            TaborDeviceProfile.PROBE_QUERIES,
+            ["P9484M", "G2,SEQ", dac_mode, "2147483648", "1e9", "9e9"],
+        )
+    )
+    return {"*IDN?": IDN, ":FREQ:RAST?": "2.5e9", ":INST:CHAN?": "1", **responses}
+
+
+def test_profile_cache_is_opt_in(monkeypatch):
+    client = make_client(monkeypatch, device_responses())
+    assert client.profile_cache is None
+    client.connect()
+    assert client.profile.max_freq == 9e9
+    assert client.device_config.bank_memory == {1: 2147483648, 3: 2147483648}
+
+
+def test_memory_probe_restores_channel(monkeypatch):
+    client = make_client(monkeypatch, {**device_responses(), ":INST:CHAN?": "4"})
+    client.connect()
+    assert client.device_config.bank_memory == {1: 2147483648, 3: 2147483648}
+    memory_query = next(q for q in client.resource.queries if ":INST:CHAN 3" in q)
+    parts = memory_query.split(";")
+    assert parts[parts.index(":INST:CHAN 3") + 2] == ":INST:CHAN 4"
+
+
+def test_cached_profile_rereads_dac_mode(monkeypatch, tmp_path):
+    cache = TaborDeviceProfileCache(str(tmp_path / "profiles.json"))
+    make_client(monkeypatch, device_responses("M0"), profile_cache=cache).connect()
+    assert cache.get(IDN).dac_is_16_bit
+
+    # The DAC mode was changed on the device since the profile was cached
+    client = make_client(monkeypatch, device_responses("M1"), profile_cache=cache)
+    client.connect()
+    assert not client.profile.dac_is_16_bit
+    assert client.device_config.freq == 9e9
+    assert not TaborDeviceProfileCache(cache.path).get(IDN).dac_is_16_bit
+
+
+def test_probe_query_form():
+    assert ":FREQ:RAST? MIN" in TaborDeviceProfile.PROBE_QUERIES
+    assert ":FREQ:RAST? MAX" in TaborDeviceProfile.PROBE_QUERIES
+
+
+def test_failed_probe_uses_model_defaults(monkeypatch):
+    client = make_client(monkeypatch, device_responses(), unsupported=["*OPT?"])
+    client.connect()
+    assert client.profile.model == "P9484M"
+    assert not client.profile.is_complete
+    assert client.device_config.bank_memory is None
+
+
+def test_failed_memory_probe_uses_model_defaults(monkeypatch, tmp_path):
+    cache = TaborDeviceProfileCache(str(tmp_path / "profiles.json"))
+    client = make_client(
+        monkeypatch,
+        device_responses("M1"),
+        unsupported=[":INST:CHAN 1"],
+        profile_cache=cache,
+    )
+    client.connect()
+    assert client.profile.model == "P9484M"
+    assert not client.profile.dac_is_16_bit
+    assert client.device_config.bank_memory is None
+    assert cache.get(IDN) is None
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tabor.tabor_client import api
+from tabor.tabor_client.broadcast import TaborCounterBroadcaster
+from tabor.tabor_client.client import TaborClient
+from tabor.tabor_client.exceptions import TaborClientException
+
+
+class FakeClient:
+    """Counts 10, 20 and 30 on CH1-3, reads with the TaborClient counter parsing"""
+
+    resource_name = "fake"
+    counter_read = TaborClient.counter_read
+    parse_counter_response = TaborClient.parse_counter_response
+
+    def __init__(self) -> None:
+        self.prepared = []
+
+    def counter_prepare(self, dt, *channels, trigger_level=0.1):
+        self.prepared.append(channels)
+
+    def counter_trigger(self):
+        pass
+
+    def query(self, query: str) -> str:
+        return "10,20,30"
+
+
+class FakeWorker:
+    def __init__(self) -> None:
+        self.client = FakeClient()
+
+    async def submit(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+
+def test_counter_stream(monkeypatch):
+    worker = FakeWorker()
+
+    async def get_worker(hostname, port=5025):
+        return worker
+
+    monkeypatch.setattr(api, "get_worker", get_worker)
+    api.ACTIVE_COUNTERS.clear()
+
+    with TestClient(api.api) as client:
+        # The default channel (CH1)
+        with client.websocket_connect(
+            "/counter/stream?hostname=fake&dt=0.01"
+        ) as websocket:
+            assert websocket.receive_json()["channels"] == [1]
+            _, counts = TaborCounterBroadcaster.from_frame(websocket.receive_bytes())
+            assert counts.tolist() == [10]
+        assert worker.client.prepared[0] == (1,)
+
+    api.ACTIVE_COUNTERS.clear()
+    with TestClient(api.api) as client:
+        with client.websocket_connect(
+            "/counter/stream?hostname=fake&dt=0.01&channels=1,3"
+        ) as websocket:
+            assert websocket.receive_json()["channels"] == [1, 3]
+            _, counts = TaborCounterBroadcaster.from_frame(websocket.receive_bytes())
+            assert counts.tolist() == [10, 30]
+        assert worker.client.prepared[-1] == (1, 3)
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.sent = []
+        self.disconnected = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+
+def test_counter_stream_disconnect(monkeypatch):
+    """The stream ends on disconnect, even when no frames are being sent"""
+    worker = FakeWorker()
+
+    async def get_worker(hostname, port=5025):
+        return worker
+
+    monkeypatch.setattr(api, "get_worker", get_worker)
+    api.ACTIVE_COUNTERS.clear()
+
+    async def run():
+        websocket = FakeWebSocket()
+        stream = asyncio.create_task(
+            api.tabor_client_counter_stream(websocket, "fake", dt=10, buffer=1)
+        )
+        await asyncio.sleep(0.1)
+        broadcaster = api.ACTIVE_COUNTERS["fake:5025"]
+        assert len(broadcaster.subscribers) == 1
+        websocket.disconnected.set()
+        await asyncio.wait_for(stream, 1)
+        assert len(broadcaster.subscribers) == 0
+        await broadcaster.stop()
+
+    asyncio.run(run())
+
+
+def test_parse_counter_response_formats():
+    for rsp in ["10,20,30", "10 20 30\n", "10, 20,\t30\r\n"]:
+        assert TaborClient.parse_counter_response(rsp).tolist() == [10, 20, 30]
+
+    counts = TaborClient.parse_counter_response(["1,2\n", "3 4"], reads=2)
+    assert counts.tolist() == [[1, 2], [3, 4]]
+
+    for rsp in ["", "10,x,30", "10,,", "1,2,3"]:
+        with pytest.raises(TaborClientException):
+            TaborClient.parse_counter_response(rsp, reads=2 if rsp == "1,2,3" else None)
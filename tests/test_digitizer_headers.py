@@ -0,0 +1,44 @@
+import struct
+
+import numpy as np
+
+from tabor.tabor_client.digitizer import TaborDigitizer
+
+
+def make_header(trigger_pos, gate_address, min_level, max_level, timestamp) -> bytes:
+    header = struct.pack(
+        "<IIiiQ", trigger_pos, gate_address, min_level, max_level, timestamp
+    )
+    return header + bytes(range(TaborDigitizer.FRAME_HEADER_SIZE - len(header)))
+
+
+def test_parse_header():
+    raw = make_header(96, 4096, -1200, 1850, 0x0123456789ABCDEF)
+    assert len(raw) == TaborDigitizer.FRAME_HEADER_SIZE
+    headers = np.frombuffer(raw, dtype=TaborDigitizer.FRAME_HEADER_DTYPE)
+    parsed = TaborDigitizer.parse_headers(headers)
+    assert parsed["trigger_pos"].tolist() == [96]
+    assert parsed["gate_address"].tolist() == [4096]
+    assert parsed["min_level"].tolist() == [-1200]
+    assert parsed["max_level"].tolist() == [1850]
+    assert parsed["timestamp"].tolist() == [0x0123456789ABCDEF]
+
+
+def test_parse_frame_headers():
+    """Headers that follow the frame data (:DIG:DATA:TYPE BOTH)"""
+    samples = 48
+    frame_dtype = np.dtype(
+        [("data", "<u2", (samples,)), ("header", TaborDigitizer.FRAME_HEADER_DTYPE)]
+    )
+    raw = b"".join(
+        np.full(samples, k, dtype="<u2").tobytes()
+        + make_header(k, 0, 100 + k, 2000 + k, 1000 * k)
+        for k in range(3)
+    )
+    frames = np.frombuffer(raw, dtype=frame_dtype)
+    parsed = TaborDigitizer.parse_headers(frames["header"])
+    assert np.array_equal(frames["data"][:, 0], [0, 1, 2])
+    assert parsed["trigger_pos"].tolist() == [0, 1, 2]
+    assert parsed["min_level"].tolist() == [100, 101, 102]
+    assert parsed["max_level"].tolist() == [2000, 2001, 2002]
+    assert parsed["timestamp"].tolist() == [0, 1000, 2000]
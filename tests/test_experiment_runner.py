@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+from experiment_control.exceptions import (
+    ExperimentException,
+    ExperimentTimeoutException,
+)
+from experiment_control.interfaces import DeviceInterface
+from experiment_control.runner import ExperimentRunner
+
+
+class SleepDevice(DeviceInterface):
+    def __init__(self, prepare: float = 0, execute: float = 0) -> None:
+        self.prepare = prepare
+        self.execute = execute
+
+    def on_prepare(self, sequence):
+        time.sleep(self.prepare)
+
+    def on_execute(self):
+        time.sleep(self.execute)
+
+
+def test_prepare_timeout():
+    runner = ExperimentRunner(
+        {"fast": SleepDevice(), "slow": SleepDevice(prepare=2)}, timeout=0.2
+    )
+    start = time.monotonic()
+    with pytest.raises(ExperimentException) as info:
+        runner.prepare(None)
+    assert time.monotonic() - start < 1
+    report = info.value.report
+    assert report.prepare_end is not None
+    assert list(report.errors) == ["slow"]
+    assert isinstance(report.errors["slow"], ExperimentTimeoutException)
+
+
+def test_execute_timeout():
+    runner = ExperimentRunner(
+        {"fast": SleepDevice(), "slow": SleepDevice(execute=2)}, timeout=0.2
+    )
+    runner.prepare(None)
+    with pytest.raises(ExperimentException) as info:
+        runner.execute()
+    assert list(info.value.report.errors) == ["slow"]
+    assert isinstance(info.value.report.errors["slow"], ExperimentTimeoutException)
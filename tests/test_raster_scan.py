@@ -0,0 +1,75 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+from tabor.tabor_client.client import TaborClient
+from tabor.tabor_client.config import TaborDefaultDeviceConfig, TaborP9082DeviceConfig
+from tabor.tabor_client.scan import TaborRasterScan, TaborRasterScanner
+
+
+class RecordingResource:
+    """Records the written commands and binary data, answers every query with no
+    errors"""
+
+    def __init__(self) -> None:
+        self.written: List[bytes] = []
+
+    def close(self):
+        pass
+
+    def write(self, command: str):
+        self.written.append(command.encode())
+
+    def write_raw(self, data):
+        self.written.append(bytes(data))
+
+    def write_binary_values(self, message: str, values, datatype="f"):
+        self.written.append(message.encode())
+
+    def read(self) -> str:
+        return "1"
+
+    def query(self, query: str) -> str:
+        rsp = []
+        for part in query.split(";"):
+            if part.strip() == ":SYST:ERR?":
+                rsp.append('0,"No error"')
+            elif "?" in part:
+                rsp.append("Tabor Electronics,P9484M,0,1" if "IDN" in part else "0")
+        return ";".join(rsp)
+
+    def commands(self, prefix: str) -> List[bytes]:
+        return [w for w in self.written if w.startswith(prefix.encode())]
+
+
+def make_client(monkeypatch, config) -> (TaborClient, RecordingResource):
+    resource = RecordingResource()
+    client = TaborClient("fake", device_config=config)
+    monkeypatch.setattr(
+        client.resource_manager, "open_resource", lambda *args, **kwargs: resource
+    )
+    return client.connect(), resource
+
+
+def test_scan_config_must_match_client(monkeypatch):
+    client, _ = make_client(monkeypatch, TaborP9082DeviceConfig())
+    scan = TaborRasterScan(64, 32, pixel_time=2e-6)
+    with pytest.raises(AssertionError):
+        TaborRasterScanner(client, scan).upload()
+
+    scan = TaborRasterScan(64, 32, pixel_time=2e-6, config=client.device_config)
+    assert TaborRasterScanner(client, scan).upload()
+
+
+def test_levels_upload_in_one_transfer(monkeypatch):
+    config = TaborDefaultDeviceConfig()
+    client, resource = make_client(monkeypatch, config)
+    scan = TaborRasterScan(64, 32, pixel_time=2e-6, config=config)
+    TaborRasterScanner(client, scan, x_channel=1, y_channel=3).upload()
+
+    # The level segments are defined by one table and written in one block
+    assert len(resource.commands("*OPC?;:TRAC:SEGM 2,")) == 1
+    headers = resource.commands(":TRAC:MEM")
+    size = scan.height * scan.level_samples * 2
+    assert headers == [f":TRAC:MEM 0,#{len(str(size))}{size}".encode()]
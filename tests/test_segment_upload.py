@@ -0,0 +1,108 @@
+import asyncio
+import io
+from typing import List
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from tabor.tabor_client import api
+from tabor.tabor_client.client import TaborClient
+from tabor.tabor_client.config import TaborDefaultDeviceConfig
+
+
+class RecordingResource:
+    """Records the written binary data, answers every query with no errors"""
+
+    def __init__(self) -> None:
+        self.written: List[bytes] = []
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def write(self, command: str):
+        self.written.append(command.encode())
+
+    def write_raw(self, data):
+        self.written.append(bytes(data))
+
+    def query(self, query: str) -> str:
+        rsp = []
+        for part in query.split(";"):
+            if part.strip() == ":SYST:ERR?":
+                rsp.append('0,"No error"')
+            elif "?" in part:
+                rsp.append("Tabor Electronics,P9484M,0,1" if "IDN" in part else "0")
+        return ";".join(rsp)
+
+
+class FakeWorker:
+    """Runs the submitted calls on a thread, like the instrument worker"""
+
+    def __init__(self, client: TaborClient) -> None:
+        self.client = client
+
+    async def submit(self, func, *args, timeout: float = None, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+
+def make_client(monkeypatch, chunk_size: int) -> (TaborClient, List[RecordingResource]):
+    resources = []
+
+    def open_resource(*args, **kwargs):
+        resources.append(RecordingResource())
+        return resources[-1]
+
+    client = TaborClient(
+        "fake", device_config=TaborDefaultDeviceConfig(), write_bytes_chunk=chunk_size
+    )
+    monkeypatch.setattr(client.resource_manager, "open_resource", open_resource)
+    client.connect()
+    del resources[:-1]
+    return client, resources
+
+
+def test_truncated_body(monkeypatch):
+    client, resources = make_client(monkeypatch, chunk_size=1024)
+    config = client.device_config
+    num_samples = config.segment_min_length * 4
+
+    async def get_worker(hostname: str = None, port: int = 5025):
+        return FakeWorker(client)
+
+    monkeypatch.setattr(api, "get_worker", get_worker)
+
+    buff = io.BytesIO()
+    np.save(buff, np.zeros(num_samples, dtype=np.uint16))
+    body = buff.getvalue()
+    truncated = body[: len(body) - 100]
+
+    rsp = TestClient(api.api).post(
+        "/segment",
+        params=dict(
+            hostname="fake", channel=1, segment_id=1, format="npy", upload_id="cut"
+        ),
+        content=truncated,
+    )
+    assert rsp.status_code == 400
+
+    record = api.ACTIVE_UPLOADS["cut"]
+    assert record["done"]
+    assert "ended after" in record["error"]
+
+    # The blocks were sent, so the session was reopened before the next command
+    assert len(resources) == 2
+    assert resources[0].closed
+
+
+def test_failure_before_header_keeps_session(monkeypatch):
+    client, resources = make_client(monkeypatch, chunk_size=1024)
+
+    def chunks():
+        raise ValueError("no data")
+        yield b""
+
+    with pytest.raises(ValueError):
+        client.write_binary_chunks(":TRAC:DATA", chunks())
+    assert len(resources) == 1
@@ -0,0 +1,66 @@
+import numpy as np
+
+from experiment_control.compiler import SequenceCompiler
+from experiment_control.sequence import Sequence
+from tabor.tabor_client.config import TaborDefaultDeviceConfig
+
+
+def make_compiler() -> SequenceCompiler:
+    config = TaborDefaultDeviceConfig()
+    config.freq = 1e6
+    return SequenceCompiler({"awg": config}, max_segment_samples=2**10)
+
+
+def assert_same_output(sequence: Sequence, compiled):
+    fresh = make_compiler().compile(sequence)
+    for name, channel in fresh.devices["awg"].channels.items():
+        assert np.array_equal(
+            compiled.devices["awg"].channels[name].expand(), channel.expand()
+        ), f"Recompiled output of {name} differs from a full compile"
+
+
+def test_recompile_delete_next_to_read():
+    """Deleting a write must dirty up to the next write, not to a read in between"""
+    sequence = Sequence(frequency=1e6)
+    sequence.add_channel("x", "awg", 1)
+    sequence.write("x", np.linspace(0, 1, 5000))
+    channel = sequence.channels["x"]
+    channel.write_values([6e-3, 12e-3], [0.5, -0.5])
+    channel.read_values([8e-3], 100)
+
+    compiler = make_compiler()
+    compiled = compiler.compile(sequence)
+    channel.delete_events(5.9e-3, 6.1e-3)
+    recompiled, _ = compiler.recompile(sequence, compiled)
+    assert_same_output(sequence, recompiled)
+
+
+def test_recompile_edit():
+    sequence = Sequence(frequency=1e6)
+    sequence.add_channel("x", "awg", 1)
+    sequence.add_channel("y", "awg", 2)
+    for k in range(5):
+        sequence.goto((k * 5 + 1) * 1e-3)
+        sequence.write(["x", "y"], np.sin(np.arange(2000) / (10 + k)))
+
+    compiler = make_compiler()
+    compiled = compiler.compile(sequence)
+    sequence.goto(10e-3)
+    sequence.delete("x", 1e-3)
+    sequence.write("x", np.cos(np.arange(2000) / 7))
+    recompiled, plan = compiler.recompile(sequence, compiled)
+    assert_same_output(sequence, recompiled)
+    assert plan.devices["awg"]["y"].is_empty
+
+
+def test_recompile_delete_channel_events():
+    sequence = Sequence(frequency=1e6)
+    sequence.add_channel("x", "awg", 1)
+    sequence.add_channel("y", "awg", 2)
+    sequence.write(["x", "y"], np.linspace(-1, 1, 3000))
+
+    compiler = make_compiler()
+    compiled = compiler.compile(sequence)
+    sequence.channels["y"].delete_events(0, 1)
+    recompiled, _ = compiler.recompile(sequence, compiled)
+    assert_same_output(sequence, recompiled)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from experiment_control.compiler import SequenceCompiler
+from experiment_control.devices.SimulatedTaborDevice import SimulatedTaborDevice
+from experiment_control.sequence import Sequence
+from experiment_control.validation import SequenceValidator
+from tabor.tabor_client.config import TaborDefaultDeviceConfig
+
+
+def test_memory_per_bank():
+    """Channels 1 and 2 share the first memory bank, channel 3 uses the second"""
+    config = TaborDefaultDeviceConfig()
+    config.freq = 1e6
+    sequence = Sequence(frequency=1e6)
+    for channel in [1, 2, 3]:
+        sequence.add_channel(f"ch{channel}", "awg", channel)
+    sequence.write(["ch1", "ch2", "ch3"], np.sin(np.arange(2**14) / 10))
+
+    compiled = SequenceCompiler({"awg": config}).compile(sequence)
+    channels = compiled.devices["awg"].channels
+    nbytes = max(c.nbytes for c in channels.values())
+
+    # Each channel fits a bank, and all fit the total memory, but not two per bank
+    config.bank_memory = {1: int(nbytes * 1.5), 3: int(nbytes * 1.5)}
+    report = SequenceValidator({"awg": config}).validate(sequence, compiled)
+    violations = report.by_kind().get("memory", [])
+    assert len(violations) == 1
+    assert "channel 1" in violations[0].message
+
+    config.bank_memory = {1: nbytes * 2, 3: nbytes}
+    report = SequenceValidator({"awg": config}).validate(sequence, compiled)
+    assert "memory" not in report.by_kind()
+
+
+def test_simulated_device_memory_per_bank():
+    """The simulated device checks the memory of each bank, like the validator"""
+    config = TaborDefaultDeviceConfig()
+    config.freq = 1e6
+    sequence = Sequence(frequency=1e6)
+    for channel in [1, 2, 3]:
+        sequence.add_channel(f"ch{channel}", "awg", channel)
+    sequence.write(["ch1", "ch2", "ch3"], np.sin(np.arange(2**14) / 10))
+
+    compiled = SequenceCompiler({"awg": config}).compile(sequence)
+    channels = compiled.devices["awg"].channels
+    nbytes = max(c.nbytes for c in channels.values())
+
+    # Channels 1 and 2 share the first bank, the total memory would fit
+    config.bank_memory = {1: int(nbytes * 1.5), 3: int(nbytes * 1.5)}
+    device = SimulatedTaborDevice("awg", config=config, realtime=False)
+    with pytest.raises(AssertionError, match="channel 1"):
+        device.on_prepare(compiled)
+
+    config.bank_memory = {1: nbytes * 2, 3: nbytes}
+    device = SimulatedTaborDevice("awg", config=config, realtime=False)
+    device.on_prepare(compiled)
+    assert device.segment_banks == {
+        segment_id: config.memory_bank(channel.physical_address)
+        for channel in channels.values()
+        for segment_id in channel.segments
+    }